@@ -0,0 +1,725 @@
+"""
+Backend micro-benchmarks
+Run from the backend directory: python benchmarks.py [name ...]
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from catalog_cache import ComponentCatalog
+from repository import FirestoreRepository
+from search_index import ComponentSearchIndex
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 in milliseconds"""
+    ordered = sorted(samples)
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": statistics.fmean(ordered) * 1000,
+    }
+
+
+def report(label: str, samples: List[float]) -> None:
+    stats = percentiles(samples)
+    print(f"{label:<40} " + " ".join(f"{k}={v:8.2f}ms" for k, v in stats.items()))
+
+
+# Slow synchronous client used to simulate Firestore round trips
+
+class _SlowSnapshot:
+    def __init__(self, doc_id, latency, data=None):
+        time.sleep(latency)
+        self.id = doc_id
+        self.exists = True
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data else {"name": self.id}
+
+
+class _SlowDocument:
+    def __init__(self, doc_id, latency):
+        self.id = doc_id
+        self.doc_id = doc_id
+        self.latency = latency
+
+    def get(self):
+        return _SlowSnapshot(self.doc_id, self.latency)
+
+    def set(self, data):
+        time.sleep(self.latency)
+
+    def update(self, data):
+        time.sleep(self.latency)
+
+    def delete(self, option=None):
+        time.sleep(self.latency)
+
+
+class _SlowBatch:
+    def __init__(self, latency):
+        self.latency = latency
+        self.operations = 0
+
+    def set(self, ref, data):
+        self.operations += 1
+
+    update = set
+
+    def delete(self, ref):
+        self.operations += 1
+
+    def commit(self):
+        # One round trip plus a small per-operation cost
+        time.sleep(self.latency + self.operations * 0.00002)
+
+
+class _SlowCollection:
+    def __init__(self, client):
+        self.client = client
+        self.latency = client.latency
+
+    def document(self, doc_id):
+        self.client.reads += 1
+        return _SlowDocument(doc_id, self.latency)
+
+    def stream(self):
+        self.client.reads += 1
+        for i in range(self.client.size):
+            yield _SlowSnapshot(f"component-{i}", 0, self.client.factory(i) if self.client.factory else None)
+        time.sleep(self.latency)
+
+    def limit(self, count):
+        return self
+
+
+class SlowClient:
+    def __init__(self, latency: float = 0.02, size: int = 200, factory: Callable = None):
+        self.latency = latency
+        self.size = size
+        self.factory = factory
+        self.reads = 0
+
+    def collection(self, name):
+        return _SlowCollection(self)
+
+    def batch(self):
+        return _SlowBatch(self.latency)
+
+    def write_option(self, **kwargs):
+        return kwargs
+
+    def get_all(self, refs):
+        time.sleep(self.latency)
+        return [_SlowSnapshot(ref.id, 0) for ref in refs]
+
+
+async def _probe_latency(load: Callable, concurrency: int, probes: int = 50) -> List[float]:
+    """Latency of a loop-only request while `concurrency` Firestore calls are in flight"""
+    samples = []
+
+    async def probe():
+        for _ in range(probes):
+            start = time.perf_counter()
+            await asyncio.sleep(0)
+            samples.append(time.perf_counter() - start)
+            await asyncio.sleep(0.001)
+
+    await asyncio.gather(probe(), *(load(i) for i in range(concurrency)))
+    return samples
+
+
+async def bench_event_loop(latency: float = 0.02) -> None:
+    """Compare loop responsiveness for blocking calls vs the repository executor"""
+    client = SlowClient(latency)
+    repo = FirestoreRepository(client)
+
+    async def blocking(i):
+        client.collection('components').document(str(i)).get()
+
+    async def offloaded(i):
+        await repo.get('components', str(i))
+
+    for concurrency in (1, 8, 32, 128):
+        report(f"blocking    c={concurrency}", await _probe_latency(blocking, concurrency))
+        report(f"repository  c={concurrency}", await _probe_latency(offloaded, concurrency))
+    repo.shutdown()
+
+
+async def bench_catalog(latency: float = 0.02, rounds: int = 2000, reload_size: int = 100_000, max_stall: float = 0.5) -> None:
+    """Catalog reads served from the in-process cache vs Firestore, and loop stalls during a reload"""
+    client = SlowClient(latency)
+    repo = FirestoreRepository(client)
+    catalog = ComponentCatalog(repo)
+
+    uncached = []
+    for _ in range(20):
+        start = time.perf_counter()
+        await repo.query('components')
+        uncached.append(time.perf_counter() - start)
+    report("firestore query", uncached)
+
+    await catalog.all()
+    client.reads = 0
+    cached = []
+    for i in range(rounds):
+        start = time.perf_counter()
+        await catalog.get(f"component-{i % client.size}")
+        cached.append(time.perf_counter() - start)
+    report("catalog cache get", cached)
+    print(f"firestore reads during cached phase: {client.reads}  stats: {catalog.stats()}")
+    repo.shutdown()
+
+    # A TTL reload rebuilds both catalog indexes; neither build may run on the loop.
+    # The builder thread still shares the GIL, so GC passes in it show up as short stalls
+    from memory_store import MemoryFirestore
+    store = MemoryFirestore(latency=0, jitter=0)
+    for component in synthetic_components(reload_size):
+        store.collection('components').document(component['id']).set(component)
+    repo = FirestoreRepository(store)
+    catalog = ComponentCatalog(repo)
+    reload = asyncio.create_task(catalog.all())
+    stall = 0.0
+    while not reload.done():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        stall = max(stall, time.perf_counter() - start)
+    await reload
+    print(f"reload of {reload_size} components: worst loop stall {stall * 1000:.1f}ms")
+    repo.shutdown()
+    if stall > max_stall:
+        raise SystemExit(f"catalog reload blocked the event loop for {stall * 1000:.0f}ms")
+
+
+_WORDS = [
+    "arduino", "esp32", "sensor", "servo", "motor", "display", "oled", "relay",
+    "ultrasonic", "temperature", "humidity", "stepper", "driver", "module", "led",
+    "wifi", "bluetooth", "battery", "buzzer", "camera", "gps", "lidar", "pump",
+]
+_CATEGORIES = ["Microcontrollers", "Sensors", "Actuators", "Displays", "Power", "Communication"]
+
+
+def synthetic_components(count: int, seed: int = 7) -> List[Dict]:
+    """Deterministic fake catalog for benchmarks"""
+    rng = random.Random(seed)
+    components = []
+    for i in range(count):
+        words = rng.sample(_WORDS, 4)
+        components.append({
+            "id": f"component-{i}",
+            "name": f"{words[0].title()} {words[1].title()} {rng.choice('ABCDEFGH')}{rng.randint(100, 99999)}",
+            "description": f"A {words[2]} {words[3]} board for prototyping.",
+            "category": rng.choice(_CATEGORIES),
+            "price_range": "$5-10",
+            "availability": "Available",
+            "specifications": {"operating_voltage": f"{rng.choice([3.3, 5, 12])}V"},
+        })
+    return components
+
+
+def _linear_search(components, term, limit):
+    term = term.lower()
+    return [
+        comp for comp in components
+        if term in comp['name'].lower()
+        or term in comp['description'].lower()
+        or term in comp['category'].lower()
+    ][:limit]
+
+
+async def bench_search(count: int = 100_000, limit: int = 20) -> None:
+    """Inverted index vs linear substring scan over a synthetic catalog"""
+    components = synthetic_components(count)
+    start = time.perf_counter()
+    index = ComponentSearchIndex(components)
+    print(f"index build for {count} components: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    queries = ["lidar", "gps camera", "oled disp", "stepper c4821", "a12"]
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query, limit=limit)
+    print(f"first pass (sorts impact lists): {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    linear, indexed = [], []
+    for query in queries * 5:
+        start = time.perf_counter()
+        _linear_search(components, query, limit)
+        linear.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        index.search(query, limit=limit)
+        indexed.append(time.perf_counter() - start)
+    report("linear scan", linear)
+    report("inverted index", indexed)
+
+    start = time.perf_counter()
+    for component in components[:1000]:
+        index.add(dict(component, name=component['name'] + " v2"))
+    print(f"incremental re-index of 1000 components: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+def synthetic_project(i: int) -> Dict:
+    return {
+        "title": f"Project {i}",
+        "category": "IoT",
+        "tags": ["sensor", "wifi"],
+        "difficulty": "beginner",
+        "status": "saved",
+        "dateSaved": "2024-01-01T00:00:00",
+        "instructions": "Wire the sensor, flash the firmware and log readings. " * 4,
+        "requirements": ["ESP32", "DHT22", "Jumper wires"],
+        "notes": "",
+        "user_id": "bench-user",
+    }
+
+
+async def _streamed_peak(count: int) -> Tuple[int, int, float, float]:
+    """Peak traced heap, bytes written, total and first-byte seconds for one streamed response"""
+    import tracemalloc
+
+    from main import Project
+    from streaming import NDJSON_MEDIA_TYPE, stream_documents
+
+    repo = FirestoreRepository(SlowClient(latency=0, size=count, factory=synthetic_project))
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = stream_documents(repo.stream('projects'), Project, NDJSON_MEDIA_TYPE)
+    written = 0
+    first_byte = None
+    async for chunk in response.body_iterator:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        written += len(chunk)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    repo.shutdown()
+    return peak, written, elapsed, first_byte
+
+
+async def bench_stream(count: int = 50_000, baseline: int = 10_000, growth: float = 1.5) -> None:
+    """Peak Python heap for buffered vs streamed list responses
+
+    Fails if the streamed peak for `count` documents exceeds `growth` times the
+    peak for `baseline` documents, i.e. if streaming memory scales with result size.
+    """
+    import json
+    import tracemalloc
+
+    from main import Project
+
+    repo = FirestoreRepository(SlowClient(latency=0, size=count, factory=synthetic_project))
+    tracemalloc.start()
+    start = time.perf_counter()
+    docs = await repo.query('projects')
+    body = json.dumps([Project.model_validate(doc).model_dump(mode="json") for doc in docs])
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    repo.shutdown()
+    print(f"buffered  {count} docs: peak={peak / 2**20:7.1f}MiB bytes={len(body)} time={elapsed:.2f}s")
+    del docs, body
+
+    peaks = {}
+    for size in (baseline, count):
+        peak, written, elapsed, first_byte = await _streamed_peak(size)
+        peaks[size] = peak
+        print(f"streamed  {size} docs: peak={peak / 2**20:7.1f}MiB bytes={written} time={elapsed:.2f}s first_byte={first_byte * 1000:.1f}ms")
+    if peaks[count] > peaks[baseline] * growth:
+        raise SystemExit(
+            f"streamed peak grew with result size: {peaks[count] / 2**20:.1f}MiB for {count} docs "
+            f"vs {peaks[baseline] / 2**20:.1f}MiB for {baseline} (bound {growth}x)"
+        )
+
+
+async def bench_generate(burst: int = 200) -> None:
+    """Burst load against the stub provider through the bounded generation service"""
+    from generation import GenerationOverloaded, GenerationService, StubProvider
+    from main import GenerateProjectRequest
+
+    service = GenerationService(StubProvider(latency=0.1), max_concurrency=16, queue_timeout=0.5)
+    await service.start()
+    latencies = []
+
+    async def call(i):
+        start = time.perf_counter()
+        try:
+            await service.generate(GenerateProjectRequest(components=[f"part-{i}"]))
+            latencies.append(time.perf_counter() - start)
+        except GenerationOverloaded:
+            pass
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call(i) for i in range(burst)))
+    report(f"generate burst={burst} served={len(latencies)}", latencies)
+    print(f"shed={service.rejected} wall={time.perf_counter() - start:.2f}s")
+    await service.close()
+
+
+async def bench_bulk(count: int = 1000, latency: float = 0.005) -> None:
+    """Sequential single-document writes vs chunked WriteBatch commits"""
+    repo = FirestoreRepository(SlowClient(latency))
+    docs = [(f"component-{i}", {"name": f"Part {i}"}) for i in range(count)]
+
+    start = time.perf_counter()
+    for doc_id, data in docs:
+        await repo.set('components', doc_id, data)
+    single = time.perf_counter() - start
+    print(f"single set x{count}: {single:.2f}s  {count / single:8.0f} docs/s")
+
+    start = time.perf_counter()
+    errors = await repo.commit([('set', 'components', doc_id, data) for doc_id, data in docs])
+    bulk = time.perf_counter() - start
+    print(f"batched commit x{count}: {bulk:.3f}s  {count / bulk:8.0f} docs/s  errors={sum(1 for e in errors if e)}")
+
+    start = time.perf_counter()
+    for doc_id, _ in docs[:200]:
+        await repo.get('components', doc_id)
+    single = time.perf_counter() - start
+    start = time.perf_counter()
+    await repo.get_many('components', [doc_id for doc_id, _ in docs[:200]])
+    print(f"get x200: {single:.3f}s  get_all x200: {time.perf_counter() - start:.3f}s")
+    repo.shutdown()
+
+
+async def bench_writes(rounds: int = 50, latency: float = 0.01) -> None:
+    """Read-check-write-read handlers vs single round-trip update and delete"""
+    repo = FirestoreRepository(SlowClient(latency))
+    data = {"name": "Servo"}
+
+    async def update_with_reads():
+        if await repo.get('components', 'servo') is None:
+            return None
+        await repo.update('components', 'servo', data)
+        return await repo.get('components', 'servo')
+
+    async def delete_with_read():
+        if await repo.get('components', 'servo') is None:
+            return False
+        return await repo.delete('components', 'servo')
+
+    for label, call in (
+        ("update get+update+get", update_with_reads),
+        ("update precondition", lambda: repo.update('components', 'servo', data)),
+        ("delete get+delete", delete_with_read),
+        ("delete precondition", lambda: repo.delete('components', 'servo')),
+    ):
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await call()
+            samples.append(time.perf_counter() - start)
+        report(label, samples)
+    repo.shutdown()
+
+
+async def bench_serialize(count: int = 1000, rounds: int = 20) -> None:
+    """Serialization time and wire size for a component list, before and after"""
+    import json
+
+    from compression import brotli, compress, orjson
+    from main import Component
+    from spec_registry import ALL_SPEC_KEYS
+
+    components = synthetic_components(count)
+    empty_spec = dict.fromkeys(sorted(ALL_SPEC_KEYS))
+
+    def before():
+        # Every spec field of the former 52-field model serialized, stdlib json
+        payload = []
+        for comp in components:
+            data = Component.model_validate(comp).model_dump(mode="json")
+            data["specifications"] = {**empty_spec, **data["specifications"]}
+            payload.append(data)
+        return json.dumps(payload).encode()
+
+    def after():
+        payload = [Component.model_validate(comp).model_dump(mode="json") for comp in components]
+        if orjson is not None:
+            return orjson.dumps(payload)
+        return json.dumps(payload, separators=(",", ":")).encode()
+
+    for label, render in (("before (stdlib, full spec)", before), ("after (orjson, sparse spec)", after)):
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            body = render()
+            samples.append(time.perf_counter() - start)
+        report(label, samples)
+        sizes = f"identity={len(body)} gzip={len(compress(body, 'gzip'))}"
+        if brotli is not None:
+            sizes += f" br={len(compress(body, 'br'))}"
+        print(f"  bytes {sizes}")
+
+
+async def bench_specs(count: int = 100_000) -> None:
+    """Validation time and retained memory: wide optional-field spec model vs sparse mapping"""
+    import gc
+    import tracemalloc
+    from typing import Optional
+
+    from pydantic import BaseModel, create_model
+
+    from main import Component
+    from spec_registry import ALL_SPEC_KEYS
+
+    WideSpec = create_model("WideSpec", **{key: (Optional[str], None) for key in sorted(ALL_SPEC_KEYS)})
+    WideComponent = create_model("WideComponent", __base__=BaseModel, **{
+        name: (field.annotation, field.default) for name, field in Component.model_fields.items()
+        if name != "specifications"
+    }, specifications=(Optional[WideSpec], None))
+
+    rng = random.Random(3)
+    keys = sorted(ALL_SPEC_KEYS)
+    components = synthetic_components(count)
+    for comp in components:
+        comp["specifications"] = {key: f"{rng.randint(1, 99)}V" for key in rng.sample(keys, 5)}
+
+    for label, model in (("wide spec model", WideComponent), ("sparse spec mapping", Component)):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        validated = [model.model_validate(comp) for comp in components]
+        elapsed = time.perf_counter() - start
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:<22} validate={elapsed:.2f}s  retained={retained / 2**20:7.1f}MiB  per-component={retained / count:6.0f}B")
+        del validated
+
+
+async def bench_startup(rounds: int = 5, latency: float = 0.01, max_round_trips: int = 5) -> None:
+    """Cold import of main and startup against a store with round-trip latency
+
+    Fails if importing main loads firebase_admin, gRPC or google.cloud.firestore,
+    or startup makes more than `max_round_trips` store round trips.
+    """
+    import os
+    import subprocess
+
+    env = {**os.environ, "DATA_BACKEND": "memory", "MEMORY_STORE_LATENCY": str(latency)}
+    eager_modules = ("firebase_admin", "grpc", "google.cloud.firestore")
+    startup = (
+        f"EAGER = {eager_modules!r}; "
+        "import asyncio, sys, time; t = time.perf_counter(); import main; "
+        "i = time.perf_counter() - t; eager = ','.join(m for m in EAGER if m in sys.modules) or '-'; t = time.perf_counter(); "
+        "asyncio.run(main.app.router.startup()); "
+        "print(eager, i, time.perf_counter() - t, main.repo.client.round_trips)"
+    )
+    imports, startups, round_trips = [], [], []
+    for _ in range(rounds):
+        output = subprocess.run(
+            [sys.executable, "-c", startup], env=env, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        if output[-4] != "-":
+            raise SystemExit(f"import main loaded {output[-4]}; these should only be imported when the client is created")
+        imports.append(float(output[-3]))
+        startups.append(float(output[-2]))
+        round_trips.append(int(output[-1]))
+    report("import main", imports)
+    report(f"startup (store latency {latency * 1000:.0f}ms)", startups)
+    print(f"store round trips during startup: {max(round_trips)}")
+    if max(round_trips) > max_round_trips:
+        raise SystemExit(f"startup made {max(round_trips)} store round trips, expected at most {max_round_trips}")
+
+
+async def bench_write_behind(projects: int = 50, edits: int = 6, latency: float = 0.01) -> None:
+    """Status/notes edit bursts written through vs buffered and coalesced"""
+    from memory_store import MemoryFirestore
+    from write_behind import WriteBehindBuffer
+
+    for label, enabled in (("write-through", False), ("write-behind", True)):
+        store = MemoryFirestore()
+        repo = FirestoreRepository(store)
+        for i in range(projects):
+            store.collection("projects").document(f"p{i}").set(synthetic_project(i))
+        store.latency = latency
+        buffer = WriteBehindBuffer(repo, "projects", enabled=enabled, interval=0.5)
+        buffer.start()
+        samples = []
+
+        async def edit(i):
+            for n in range(edits):
+                start = time.perf_counter()
+                await buffer.update(f"p{i}", {"status": ("saved", "in-progress", "completed")[n % 3], "notes": f"edit {n}"})
+                samples.append(time.perf_counter() - start)
+
+        before = store.round_trips
+        await asyncio.gather(*(edit(i) for i in range(projects)))
+        await buffer.close()
+        report(f"{label} update", samples)
+        print(f"  store round trips={store.round_trips - before}")
+        repo.shutdown()
+
+
+async def bench_sqlite(projects: int = 5000, users: int = 50, rounds: int = 200, latency: float = 0.01) -> None:
+    """Firestore path (in-memory stand-in with round-trip latency) vs local SQLite in WAL mode"""
+    import tempfile
+    from memory_store import MemoryFirestore
+    from sqlite_store import SQLiteRepository
+
+    docs = [(f"p{i}", dict(synthetic_project(i), user_id=f"user-{i % users}")) for i in range(projects)]
+    with tempfile.TemporaryDirectory() as directory:
+        store = MemoryFirestore()
+        backends = (
+            ("firestore", FirestoreRepository(store)),
+            ("sqlite", SQLiteRepository(os.path.join(directory, "bench.db"))),
+        )
+        for label, repo in backends:
+            await repo.connect()
+            await repo.commit([('set', 'projects', doc_id, data) for doc_id, data in docs])
+            store.latency = latency
+            rng = random.Random(3)
+            cases = {
+                "get": lambda: repo.get('projects', f"p{rng.randrange(projects)}"),
+                "page by user_id": lambda: repo.page('projects', [('user_id', '==', f"user-{rng.randrange(users)}")], limit=50),
+                "query by status": lambda: repo.query('projects', [('status', '==', 'saved')], limit=100),
+                "update": lambda: repo.update('projects', f"p{rng.randrange(projects)}", {"status": "in-progress"}),
+                "set": lambda: repo.set('projects', f"new-{rng.random()}", synthetic_project(0)),
+            }
+            for case, call in cases.items():
+                samples = []
+                for _ in range(rounds):
+                    start = time.perf_counter()
+                    await call()
+                    samples.append(time.perf_counter() - start)
+                report(f"{label} {case}", samples)
+
+            async def concurrent_reads():
+                await asyncio.gather(*(repo.get('projects', f"p{i}") for i in range(rounds)))
+
+            start = time.perf_counter()
+            await concurrent_reads()
+            print(f"{label}: {rounds} concurrent gets in {(time.perf_counter() - start) * 1000:.1f}ms")
+            repo.shutdown()
+
+
+def synthetic_templates(components: List[Dict], count: int, seed: int = 7) -> List[Dict]:
+    """Deterministic fake project templates over a synthetic catalog"""
+    from project_templates import SKILL_LEVELS, TIME_BUDGETS, slot
+
+    rng = random.Random(seed)
+    ids = [component["id"] for component in components]
+    return [{
+        "id": f"template-{i}",
+        "title": f"Template {i}",
+        "description": "Synthetic template",
+        "category": rng.choice(["IoT", "Robotics", "Home", "Energy"]),
+        "difficulty": rng.choice(SKILL_LEVELS),
+        "time": rng.choice(TIME_BUDGETS),
+        "required": [slot(f"part {n}", *rng.sample(ids, 3)) for n in range(rng.randint(2, 4))],
+        "optional": [slot("extra", *rng.sample(ids, 5))],
+        "instructions": [],
+    } for i in range(count)]
+
+
+def _scan_templates(templates, owned, limit):
+    owned = set(owned)
+    scored = []
+    for template in templates:
+        required = sum(1 for spec in template["required"] if owned & set(spec["ids"])) / len(template["required"])
+        optional = sum(1 for spec in template["optional"] if owned & set(spec["ids"])) / len(template["optional"])
+        scored.append((-(3 * required + optional), template["id"]))
+    return sorted(scored)[:limit]
+
+
+async def bench_templates(components: int = 500, templates: int = 5000, queries: int = 200, max_p50: float = 1.0) -> None:
+    """Template suggestions: scan of every template vs the bitset compatibility index
+
+    Fails if ranking takes `max_p50` milliseconds or more at the median.
+    """
+    from project_templates import CompatibilityIndex
+
+    catalog = synthetic_components(components)
+    template_list = synthetic_templates(catalog, templates)
+    start = time.perf_counter()
+    index = CompatibilityIndex(template_list)
+    index.rebuild(catalog, "v1")
+    print(f"index build for {templates} templates x {components} components: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    rng = random.Random(1)
+    requests = [rng.sample(catalog, 5) for _ in range(queries)]
+    scan, indexed = [], []
+    for owned in requests:
+        start = time.perf_counter()
+        _scan_templates(template_list, [component["id"] for component in owned], 3)
+        scan.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        index.rank([component["name"] for component in owned], "intermediate", "5-10h", ["IoT"])
+        indexed.append(time.perf_counter() - start)
+    report("scan all templates", scan)
+    report("compatibility index", indexed)
+    p50 = percentiles(indexed)["p50"]
+    if p50 >= max_p50:
+        raise SystemExit(f"template ranking took {p50:.2f}ms p50, expected under {max_p50:.2f}ms")
+
+
+async def bench_similarity(count: int = 100_000, queries: int = 50, batch: int = 32) -> None:
+    """Related components: dense cosine over every dimension vs the query's own dimensions"""
+    import numpy as np
+    from similarity import component_index
+
+    components = synthetic_components(count)
+    start = time.perf_counter()
+    index = component_index()
+    index.rebuild(components)
+    print(f"index build for {count} components: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    # The same vectors, one row per document
+    dense = np.ascontiguousarray(index._matrix[:, :count].T)
+    rng = random.Random(1)
+    rows = [rng.randrange(count) for _ in range(queries)]
+    full, sparse = [], []
+    for row in rows:
+        start = time.perf_counter()
+        scores = dense @ dense[row]
+        np.argpartition(-scores, 10)[:11]
+        full.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        index.similar(components[row]["id"], 10)
+        sparse.append(time.perf_counter() - start)
+    report("dense cosine, all dimensions", full)
+    report("similarity index", sparse)
+
+    ids = [component["id"] for component in rng.sample(components, batch)]
+    start = time.perf_counter()
+    index.similar_many(ids, 10)
+    print(f"batch of {batch} queries: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    start = time.perf_counter()
+    for component in components[:1000]:
+        index.add(dict(component, name=component['name'] + " v2"))
+    print(f"incremental re-index of 1000 components: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+BENCHMARKS = {
+    "event_loop": bench_event_loop,
+    "catalog": bench_catalog,
+    "search": bench_search,
+    "stream": bench_stream,
+    "generate": bench_generate,
+    "bulk": bench_bulk,
+    "writes": bench_writes,
+    "serialize": bench_serialize,
+    "specs": bench_specs,
+    "startup": bench_startup,
+    "write_behind": bench_write_behind,
+    "templates": bench_templates,
+    "sqlite": bench_sqlite,
+    "similarity": bench_similarity,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name}")
+        asyncio.run(BENCHMARKS[name]())
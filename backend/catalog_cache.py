@@ -0,0 +1,266 @@
+"""
+In-process cache for the components catalog
+The catalog is small and rarely written, so it is held in memory and refreshed
+on a TTL, on local writes, and optionally from a Firestore snapshot listener
+or from changes other workers publish through the shared-state backend.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from repository import FirestoreRepository, doc_to_dict
+from search_index import ComponentSearchIndex
+from similarity import VectorBuilder, component_index
+from http_cache import compute_etag
+from shared_state import SharedState
+
+COMPONENT_CACHE_TTL = float(os.environ.get("COMPONENT_CACHE_TTL", "300"))
+COMPONENT_CACHE_LISTEN = os.environ.get("COMPONENT_CACHE_LISTEN", "0") == "1"
+
+# Shared-state channel carrying catalog changes between workers
+CATALOG_CHANNEL = "catalog"
+
+
+class ComponentCatalog:
+    """Memory-resident copy of the `components` collection"""
+
+    collection = 'components'
+
+    def __init__(self, repo: FirestoreRepository, ttl: float = COMPONENT_CACHE_TTL):
+        self.repo = repo
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self.index = ComponentSearchIndex()
+        # Feature vectors behind related-component lookups
+        self.related_index = component_index()
+        # ETag of the whole catalog, recomputed lazily after a change
+        self._etag: Optional[str] = None
+        self._loaded_at: Optional[float] = None
+        self._mutex = threading.Lock()
+        self._reload_lock = asyncio.Lock()
+        # Writes that arrive while a reload builds its indexes, replayed after the swap
+        self._pending: Optional[List[Tuple[str, Any]]] = None
+        self._watch = None
+        self.shared: Optional[SharedState] = None
+        self._refreshes = set()
+
+    @property
+    def listening(self) -> bool:
+        return self._watch is not None
+
+    def is_fresh(self) -> bool:
+        if self._loaded_at is None:
+            return False
+        # A live snapshot listener keeps the cache current without a TTL
+        if self.listening:
+            return True
+        return time.monotonic() - self._loaded_at < self.ttl
+
+    async def _ensure_loaded(self) -> None:
+        if self.is_fresh():
+            self.hits += 1
+            return
+        self.misses += 1
+        async with self._reload_lock:
+            # Another request may have reloaded while we were waiting
+            if self.is_fresh():
+                return
+            with self._mutex:
+                self._pending = []
+            self.related_index.start_load()
+            try:
+                docs = await self.repo.query(self.collection)
+                # Both indexes are built off the event loop; only the swap takes the lock
+                build = await asyncio.to_thread(self._build, docs)
+            except BaseException:
+                with self._mutex:
+                    self._pending = None
+                self.related_index.cancel_load()
+                raise
+            self._install(build)
+
+    def _build(self, docs: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], ComponentSearchIndex, VectorBuilder]:
+        """A fresh catalog snapshot and its indexes, built without touching the live ones"""
+        items = {doc['id']: doc for doc in docs}
+        index = ComponentSearchIndex(items.values())
+        vectors = self.related_index.builder()
+        for doc in items.values():
+            vectors.add(doc)
+        vectors.finish()
+        return items, index, vectors
+
+    def _install(self, build: Tuple[Dict[str, Dict[str, Any]], ComponentSearchIndex, VectorBuilder]) -> None:
+        items, index, vectors = build
+        with self._mutex:
+            pending, self._pending = self._pending or [], None
+            self._items = items
+            self.index = index
+            # Replays the related-index writes it queued since start_load
+            self.related_index.install(vectors)
+            for op, value in pending:
+                if op == 'store':
+                    self._items[value['id']] = value
+                    self.index.add(value)
+                else:
+                    self._items.pop(value, None)
+                    self.index.remove(value)
+            self._etag = None
+            self._loaded_at = time.monotonic()
+            self.reloads += 1
+
+    def _replace(self, docs: List[Dict[str, Any]]) -> None:
+        self._install(self._build(docs))
+
+    async def all(self) -> List[Dict[str, Any]]:
+        """Every component in the catalog"""
+        await self._ensure_loaded()
+        return list(self._items.values())
+
+    async def search(self, query: str, limit: Optional[int] = None, predicate=None) -> List[Dict[str, Any]]:
+        """Ranked full-text search over the whole catalog"""
+        await self._ensure_loaded()
+        with self._mutex:
+            return self.index.search(query, limit=limit, predicate=predicate)
+
+    async def get(self, component_id: str) -> Optional[Dict[str, Any]]:
+        """A single component, or None if it is not in the catalog"""
+        await self._ensure_loaded()
+        return self._items.get(component_id)
+
+    async def get_many(self, component_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Components found in one catalog snapshot, keyed by id"""
+        await self._ensure_loaded()
+        with self._mutex:
+            return {component_id: self._items[component_id] for component_id in component_ids if component_id in self._items}
+
+    async def related(self, component_id: str, limit: int = 10) -> Optional[List[Tuple[Dict[str, Any], float]]]:
+        """Most similar components with their cosine scores, or None if the id is unknown"""
+        await self._ensure_loaded()
+        if component_id not in self._items:
+            return None
+        neighbours = self.related_index.similar(component_id, limit)
+        return [(self._items[doc_id], score) for doc_id, score in neighbours if doc_id in self._items]
+
+    async def etag(self) -> str:
+        """Content-derived ETag for the current catalog"""
+        await self._ensure_loaded()
+        etag = self._etag
+        if etag is None:
+            with self._mutex:
+                docs = sorted(self._items.values(), key=lambda doc: doc['id'])
+            etag = self._etag = compute_etag(docs)
+        return etag
+
+    # Change-driven invalidation
+
+    def store(self, component: Dict[str, Any], announce: bool = True) -> None:
+        """Write-through a created or updated component"""
+        if announce:
+            self._announce('store', component['id'])
+        with self._mutex:
+            if self._pending is not None:
+                self._pending.append(('store', component))
+            elif self._loaded_at is None:
+                return
+            self._items[component['id']] = component
+            self.index.add(component)
+            self.related_index.add(component, announce=False)
+            self._etag = None
+
+    def evict(self, component_id: str, announce: bool = True) -> None:
+        """Drop a deleted component"""
+        if announce:
+            self._announce('evict', component_id)
+        with self._mutex:
+            if self._pending is not None:
+                self._pending.append(('evict', component_id))
+            self._items.pop(component_id, None)
+            self.index.remove(component_id)
+            self.related_index.remove(component_id, announce=False)
+            self._etag = None
+
+    def invalidate(self, announce: bool = True) -> None:
+        """Force a full reload on the next read"""
+        if announce:
+            self._announce('reload')
+        with self._mutex:
+            self._loaded_at = None
+
+    # Shared state between workers
+
+    def attach(self, shared: SharedState) -> None:
+        """Exchange catalog changes with other workers through a shared-state backend"""
+        self.shared = shared
+        shared.subscribe(CATALOG_CHANNEL, self._on_remote_change)
+
+    def _announce(self, op: str, component_id: Optional[str] = None) -> None:
+        # A snapshot listener already delivers every change to every worker
+        if self.shared is not None and not self.listening:
+            self.shared.publish(CATALOG_CHANNEL, {'op': op, 'id': component_id})
+
+    def _on_remote_change(self, change: Dict[str, Any]) -> None:
+        if change['op'] == 'evict':
+            self.evict(change['id'], announce=False)
+        elif change['op'] == 'store':
+            task = asyncio.get_running_loop().create_task(self.refresh(change['id']))
+            self._refreshes.add(task)
+            task.add_done_callback(self._refreshes.discard)
+        else:
+            self.invalidate(announce=False)
+
+    async def refresh(self, component_id: str) -> None:
+        """Re-read one component after another worker wrote it"""
+        try:
+            doc = await self.repo.get(self.collection, component_id)
+        except Exception as e:
+            print(f"Catalog refresh of {component_id} failed: {e}")
+            self.invalidate(announce=False)
+            return
+        if doc is None:
+            self.evict(component_id, announce=False)
+        else:
+            self.store(doc, announce=False)
+
+    # Cross-worker freshness
+
+    def _on_snapshot(self, docs, changes, read_time) -> None:
+        if self._loaded_at is None:
+            self._replace([doc_to_dict(doc) for doc in docs])
+            return
+        for change in changes:
+            if change.type.name == 'REMOVED':
+                self.evict(change.document.id, announce=False)
+            else:
+                self.store(doc_to_dict(change.document), announce=False)
+
+    def start_listener(self) -> None:
+        """Subscribe to Firestore changes so every worker sees remote writes"""
+        if self._watch is not None or not self.repo.available:
+            return
+        if not self.repo.supports_listeners:
+            print("Catalog listener needs Firestore; relying on the TTL and shared-state changes")
+            return
+        self._watch = self.repo.collection(self.collection).on_snapshot(self._on_snapshot)
+
+    def stop_listener(self) -> None:
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "reloads": self.reloads,
+            "ttl": self.ttl,
+            "listening": self.listening,
+        }
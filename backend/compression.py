@@ -0,0 +1,147 @@
+"""
+Response compression and fast JSON serialization
+orjson and brotli are optional: without them responses fall back to the
+standard JSONResponse and gzip.
+
+Each content coding is its own representation: ETags of responses negotiated
+to gzip or br carry a "-gzip"/"-br" suffix, every compressible response varies
+on Accept-Encoding, and If-None-Match is translated back to the application's
+unsuffixed tags for the coding being negotiated, so a cache can never
+revalidate one coding with another's validator.
+"""
+
+import gzip
+import os
+from typing import List, Tuple
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    orjson = None
+    FastJSONResponse = JSONResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+ENCODINGS = ("br", "gzip")
+
+# Streams are left alone so events are not held back in a compressor buffer
+UNCOMPRESSED_MEDIA_TYPES = ("text/event-stream", "application/x-ndjson")
+
+
+def _parse_accept_encoding(header: str) -> List[Tuple[str, float]]:
+    encodings = []
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings.append((name.strip().lower(), quality))
+    return encodings
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """Best supported coding for an Accept-Encoding header, or '' for identity"""
+    accepted = {name: quality for name, quality in _parse_accept_encoding(accept_encoding) if quality > 0}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return ""
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag of the `encoding` representation: '"abc"' -> '"abc-gzip"'"""
+    if not encoding or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def representation_tags(if_none_match: str, encoding: str) -> str:
+    """If-None-Match as the application sees it: tags of this coding, unsuffixed; others dropped"""
+    if if_none_match.strip() == "*":
+        return if_none_match
+    kept = []
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        coding = next((name for name in ENCODINGS if tag.endswith(f'-{name}"')), "")
+        if coding == encoding:
+            kept.append(f'{tag[:-len(coding) - 2]}"' if coding else tag)
+    return ", ".join(kept)
+
+
+class CompressionMiddleware:
+    """Compress complete response bodies above a size threshold with br or gzip"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            # Rewrite in place: the router records the matched route on this same scope object
+            headers = [(name, value) for name, value in scope["headers"] if name != b"if-none-match"]
+            headers.append((b"if-none-match", representation_tags(if_none_match, encoding).encode()))
+            scope["headers"] = headers
+
+        start_message: Message = {}
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Hold the start until we know whether the body is worth compressing
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or not start_message:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            negotiable = (
+                "content-encoding" not in headers
+                and not headers.get("content-type", "").startswith(UNCOMPRESSED_MEDIA_TYPES)
+            )
+            if negotiable:
+                # Also on identity responses and 304s, so caches key every coding separately
+                headers.add_vary_header("Accept-Encoding")
+                if encoding and "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+            if negotiable and encoding and not message.get("more_body", False) and len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                message = {**message, "body": body}
+            await send(start_message)
+            start_message = {}
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
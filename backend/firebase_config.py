@@ -1,42 +1,111 @@
 """
 Firebase configuration and initialization
-TODO: Replace with your actual Firebase configuration
+The Firestore client is created lazily, once per process, the first time it is
+needed, so importing the app stays cheap and worker cold starts are fast.
+Credentials come from the environment (or a .env file):
+
+    FIREBASE_CREDENTIALS=/path/to/service-account.json
+    or FIREBASE_PROJECT_ID, FIREBASE_PRIVATE_KEY_ID, FIREBASE_PRIVATE_KEY,
+       FIREBASE_CLIENT_EMAIL, FIREBASE_CLIENT_ID, FIREBASE_CLIENT_CERT_URL
+
+DATA_BACKEND=memory swaps Firestore for the in-memory stand-in, and
+DATA_BACKEND=sqlite serves everything from a local SQLite file (SQLITE_PATH).
+When Firebase cannot be initialized the app falls back to that SQLite file
+unless SQLITE_FALLBACK=false.
 """
 
-import os
-from firebase_admin import credentials, firestore, initialize_app
-import firebase_admin
+import threading
+from typing import Any, Dict, Optional
+
 from decouple import config
 
-# Firebase Service Account Configuration
-# TODO: Replace these with your actual Firebase service account details
-FIREBASE_CONFIG = {
-    "type": "service_account",
-    "project_id": config("FIREBASE_PROJECT_ID", default="your-project-id"),
-    "private_key_id": config("FIREBASE_PRIVATE_KEY_ID", default="your-private-key-id"),
-    "private_key": config("FIREBASE_PRIVATE_KEY", default="your-private-key").replace('\\n', '\n'),
-    "client_email": config("FIREBASE_CLIENT_EMAIL", default="your-client-email"),
-    "client_id": config("FIREBASE_CLIENT_ID", default="your-client-id"),
-    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-    "token_uri": "https://oauth2.googleapis.com/token",
-    "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-    "client_x509_cert_url": config("FIREBASE_CLIENT_CERT_URL", default="your-client-cert-url")
-}
+# "firestore", "memory" for the in-process stand-in used in benchmarks, or "sqlite" for local storage
+DATA_BACKEND = config("DATA_BACKEND", default="firestore")
+# Serve from local SQLite instead of failing project routes when Firebase is not configured
+SQLITE_FALLBACK = config("SQLITE_FALLBACK", default=True, cast=bool)
+
+_client: Optional[Any] = None
+_initialized = False
+_lock = threading.Lock()
+
+
+def firebase_credentials_config() -> Dict[str, Any]:
+    """Service account fields read from the environment"""
+    return {
+        "type": "service_account",
+        "project_id": config("FIREBASE_PROJECT_ID", default=""),
+        "private_key_id": config("FIREBASE_PRIVATE_KEY_ID", default=""),
+        "private_key": config("FIREBASE_PRIVATE_KEY", default="").replace('\\n', '\n'),
+        "client_email": config("FIREBASE_CLIENT_EMAIL", default=""),
+        "client_id": config("FIREBASE_CLIENT_ID", default=""),
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+        "client_x509_cert_url": config("FIREBASE_CLIENT_CERT_URL", default=""),
+    }
+
 
 def initialize_firebase():
-    """Initialize Firebase Admin SDK"""
+    """Initialize Firebase Admin SDK and return a Firestore client, or None on failure"""
+    # Imported here: firebase_admin and gRPC account for most of the app's import time
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
     try:
-        # Check if Firebase is already initialized
         if not firebase_admin._apps:
-            cred = credentials.Certificate(FIREBASE_CONFIG)
-            initialize_app(cred)
+            path = config("FIREBASE_CREDENTIALS", default="")
+            cred = credentials.Certificate(path or firebase_credentials_config())
+            firebase_admin.initialize_app(cred)
             print("Firebase initialized successfully")
         return firestore.client()
     except Exception as e:
-        print(f"Error initializing Firebase: {e}")
-        # For development, you can return None and handle gracefully
+        print(f"Firebase initialization failed: {e}")
+        print("Running in development mode without Firebase")
         return None
 
+
+def create_client():
+    """Build a new client for the configured DATA_BACKEND"""
+    if DATA_BACKEND == "memory":
+        from memory_store import MemoryFirestore
+        print("Using in-memory Firestore stand-in")
+        return MemoryFirestore()
+    return initialize_firebase()
+
+
+def create_sqlite_repository(reason: str = "Using"):
+    """SQLite-backed data access layer at SQLITE_PATH"""
+    from sqlite_store import SQLITE_PATH, SQLiteRepository
+    path = config("SQLITE_PATH", default=SQLITE_PATH)
+    print(f"{reason} local SQLite storage at {path}")
+    return SQLiteRepository(path)
+
+
+def create_repository():
+    """Data access layer for the configured DATA_BACKEND"""
+    if DATA_BACKEND == "sqlite":
+        return create_sqlite_repository()
+    from repository import FirestoreRepository
+    fallback = None
+    if DATA_BACKEND == "firestore" and SQLITE_FALLBACK:
+        fallback = lambda: create_sqlite_repository("Firebase unavailable; falling back to")
+    return FirestoreRepository(client_factory=get_firestore_client, fallback=fallback)
+
+
 def get_firestore_client():
-    """Get Firestore client instance"""
-    return initialize_firebase()
\ No newline at end of file
+    """Process-wide client, created on first use; None when Firebase is unavailable"""
+    global _client, _initialized
+    if not _initialized:
+        with _lock:
+            if not _initialized:
+                _client = create_client()
+                _initialized = True
+    return _client
+
+
+def reset_firestore_client() -> None:
+    """Forget the cached client, e.g. after fork or in tests"""
+    global _client, _initialized
+    with _lock:
+        _client = None
+        _initialized = False
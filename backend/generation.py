@@ -0,0 +1,518 @@
+"""
+Project idea generation backends
+Providers share one pooled httpx.AsyncClient created at startup. The service
+bounds in-flight upstream calls with a semaphore, applies per-request timeouts
+and retries transient failures with jittered backoff. Providers can also stream,
+yielding ("partial", text) deltas and ("idea", dict) once each idea is complete.
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from project_templates import CompatibilityIndex
+
+GENERATION_PROVIDER = os.environ.get("GENERATION_PROVIDER", "templates")
+GENERATION_MODEL = os.environ.get("GENERATION_MODEL", "")
+GENERATION_MAX_CONCURRENCY = int(os.environ.get("GENERATION_MAX_CONCURRENCY", "8"))
+# How long a request may wait for a free upstream slot before it is shed
+GENERATION_QUEUE_TIMEOUT = float(os.environ.get("GENERATION_QUEUE_TIMEOUT", "2"))
+GENERATION_TIMEOUT = float(os.environ.get("GENERATION_TIMEOUT", "30"))
+GENERATION_RETRIES = int(os.environ.get("GENERATION_RETRIES", "2"))
+GENERATION_STUB_LATENCY = float(os.environ.get("GENERATION_STUB_LATENCY", "0.5"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# ProjectIdea fields a model has to fill in; the rest default from the request
+REQUIRED_IDEA_FIELDS = ("title", "description", "category")
+
+# Returns (version, components) for the catalog currently being served
+CatalogLoader = Callable[[], Awaitable[Tuple[str, List[Dict[str, Any]]]]]
+
+
+class GenerationError(Exception):
+    """Upstream generation failed"""
+
+
+class GenerationOverloaded(GenerationError):
+    """Every upstream slot is busy; the caller should retry later"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Project generation is at capacity, please retry shortly")
+        self.retry_after = retry_after
+
+
+class GenerationTimeout(GenerationError):
+    """Upstream generation did not finish within the request timeout"""
+
+
+def build_prompt(request) -> str:
+    components = ", ".join(request.components or []) or "any common hobby electronics"
+    categories = ", ".join(request.categories or []) or "any STEM category"
+    return (
+        "Suggest 3 hands-on STEM electronics project ideas for a student.\n"
+        f"Skill level: {request.skill or 'beginner'}\n"
+        f"Time budget: {request.time or '2-5h'}\n"
+        f"Categories: {categories}\n"
+        f"Components the student owns: {components}\n"
+        f"Notes: {request.notes or 'none'}\n\n"
+        "Respond with JSON only, shaped as "
+        '{"ideas": [{"title": str, "description": str, "difficulty": str, '
+        '"estimatedTime": str, "components": [str], "category": str, '
+        '"instructions": [str]}]}'
+    )
+
+
+def parse_ideas(text: str, request) -> List[Dict[str, Any]]:
+    """Turn model output into ProjectIdea dicts"""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end == -1:
+        raise GenerationError("Model response did not contain JSON")
+    try:
+        payload = json.loads(text[start:end + 1])
+    except ValueError as e:
+        raise GenerationError(f"Model response was not valid JSON: {e}")
+    ideas = payload.get("ideas") if isinstance(payload, dict) else None
+    if not isinstance(ideas, list):
+        ideas = []
+    valid = [finalize_idea(idea, request) for idea in ideas if is_valid_idea(idea)]
+    # Raising keeps an unusable reply out of the generation cache
+    if not valid:
+        raise GenerationError("Model response contained no complete project ideas")
+    return valid
+
+
+def is_valid_idea(idea: Any) -> bool:
+    """Whether one idea from the model can be served as a ProjectIdea"""
+    if not isinstance(idea, dict):
+        return False
+    for field in REQUIRED_IDEA_FIELDS:
+        value = idea.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return False
+    for field in ("difficulty", "estimatedTime"):
+        if not isinstance(idea.get(field) or "", str):
+            return False
+    for field in ("components", "instructions"):
+        value = idea.get(field) or []
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            return False
+    return True
+
+
+class IdeaStreamParser:
+    """Incrementally extracts complete idea objects from streamed JSON text"""
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        self._buffer += text
+        ideas = []
+        while self._position < len(self._buffer):
+            char = self._buffer[self._position]
+            if not self._in_array:
+                # Wait for the ideas array to open
+                marker = self._buffer.find('"ideas"', 0, self._position + 1)
+                if char == "[" and marker != -1:
+                    self._in_array = True
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = self._position
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    try:
+                        ideas.append(json.loads(self._buffer[self._object_start:self._position + 1]))
+                    except ValueError:
+                        pass
+                    self._object_start = None
+            elif char == "]" and self._depth == 0:
+                self._in_array = False
+            self._position += 1
+        return ideas
+
+
+def finalize_idea(idea: Dict[str, Any], request) -> Dict[str, Any]:
+    # Nulls from the model fall back to the request's defaults like missing fields
+    idea = {field: value for field, value in idea.items() if value is not None}
+    idea.setdefault("difficulty", request.skill or "beginner")
+    idea.setdefault("estimatedTime", request.time or "2-5h")
+    idea.setdefault("components", list(request.components or []))
+    idea.setdefault("instructions", [])
+    idea["id"] = str(uuid.uuid4())
+    idea["created_at"] = datetime.now()
+    return idea
+
+
+class GenerationProvider:
+    """Base class for idea generation backends"""
+
+    name = "base"
+
+    async def start(self, http: httpx.AsyncClient) -> None:
+        self.http = http
+
+    async def generate(self, request) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def stream(self, request) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield ideas as they complete; providers without streaming emit them at the end"""
+        for idea in await self.generate(request):
+            yield "idea", idea
+
+
+class StubProvider(GenerationProvider):
+    """Deterministic offline provider for development and load tests"""
+
+    name = "stub"
+
+    def __init__(self, latency: float = GENERATION_STUB_LATENCY):
+        self.latency = latency
+
+    async def generate(self, request) -> List[Dict[str, Any]]:
+        await asyncio.sleep(self.latency)
+        return [finalize_idea(idea, request) for idea in self._ideas(request)]
+
+    async def stream(self, request) -> AsyncIterator[Tuple[str, Any]]:
+        ideas = self._ideas(request)
+        for idea in ideas:
+            await asyncio.sleep(self.latency / len(ideas))
+            yield "partial", idea["title"]
+            yield "idea", finalize_idea(idea, request)
+
+    def _ideas(self, request) -> List[Dict[str, Any]]:
+        components = request.components or ["ESP32", "DHT22", "Servo Motor"]
+        categories = request.categories or ["IoT", "Automation", "Environmental"]
+
+        ideas = [
+            {
+                "title": "Smart Home Air Quality Monitor",
+                "description": "Build a connected monitor that tracks temperature and humidity, displays status, and sends alerts when thresholds are exceeded.",
+                "components": components + ["OLED Display"],
+                "category": categories[0] if categories else "IoT",
+                "instructions": [
+                    "Wire the sensor to the microcontroller and verify readings via serial monitor.",
+                    "Display live metrics on the OLED with color-coded thresholds.",
+                    "Push readings to a cloud endpoint and configure alert rules.",
+                    "Enclose the device and test in different rooms."
+                ],
+            },
+            {
+                "title": "Automated Plant Watering System",
+                "description": "Create a soil-moisture-based watering setup that irrigates plants automatically and logs activity.",
+                "components": components + ["Soil Moisture Sensor", "Relay Module", "Pump"],
+                "category": "Automation",
+                "instructions": [
+                    "Calibrate the moisture sensor to determine dry thresholds.",
+                    "Control a pump using a relay and implement safety delays.",
+                    "Log watering events and moisture trends for analysis.",
+                    "Add a manual override and status LED."
+                ],
+            },
+            {
+                "title": "Obstacle-Avoiding Robot",
+                "description": "Assemble a simple robot that navigates autonomously by detecting obstacles and adjusting its path.",
+                "components": components + ["Ultrasonic Sensor", "Motor Driver"],
+                "category": "Robotics",
+                "instructions": [
+                    "Mount motors and connect the driver to the controller.",
+                    "Integrate the ultrasonic sensor and read distance values.",
+                    "Implement basic avoidance logic with turn-and-forward behavior.",
+                    "Tune speed and sensitivity; test in a small course."
+                ],
+            },
+        ]
+        return ideas
+
+
+class TemplateProvider(GenerationProvider):
+    """Ranks precomputed project templates against the user's components; no model call"""
+
+    name = "templates"
+
+    def __init__(self, catalog: Optional[CatalogLoader] = None, index: Optional[CompatibilityIndex] = None):
+        self.catalog = catalog
+        self.index = index or CompatibilityIndex()
+        self._rebuild_lock = asyncio.Lock()
+
+    async def _refresh(self, components: List[Dict[str, Any]], version: str) -> None:
+        """Build an index for a new catalog version off the event loop, then swap it in"""
+        async with self._rebuild_lock:
+            # Requests that waited on the lock find the index already current
+            if version == self.index.version:
+                return
+            index = CompatibilityIndex(self.index.templates)
+            await asyncio.to_thread(index.rebuild, components, version)
+            self.index = index
+
+    async def generate(self, request) -> List[Dict[str, Any]]:
+        if self.catalog is not None:
+            version, components = await self.catalog()
+            if version != self.index.version:
+                await self._refresh(components, version)
+        ideas = self.index.rank(request.components or [], request.skill, request.time, request.categories or [])
+        return [finalize_idea(idea, request) for idea in ideas]
+
+
+class OpenAIProvider(GenerationProvider):
+    """Chat Completions API over the shared HTTP pool"""
+
+    name = "openai"
+    url = "https://api.openai.com/v1/chat/completions"
+
+    def __init__(self, api_key: str, model: str = GENERATION_MODEL or "gpt-4o-mini"):
+        self.api_key = api_key
+        self.model = model
+
+    async def generate(self, request) -> List[Dict[str, Any]]:
+        response = await self.http.post(
+            self.url,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={
+                "model": self.model,
+                "messages": [{"role": "user", "content": build_prompt(request)}],
+                "response_format": {"type": "json_object"},
+            },
+        )
+        response.raise_for_status()
+        text = response.json()["choices"][0]["message"]["content"]
+        return parse_ideas(text, request)
+
+    async def stream(self, request) -> AsyncIterator[Tuple[str, Any]]:
+        parser = IdeaStreamParser()
+        async with self.http.stream(
+            "POST",
+            self.url,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={
+                "model": self.model,
+                "messages": [{"role": "user", "content": build_prompt(request)}],
+                "response_format": {"type": "json_object"},
+                "stream": True,
+            },
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                delta = json.loads(line[6:])["choices"][0]["delta"].get("content")
+                if not delta:
+                    continue
+                yield "partial", delta
+                for idea in parser.feed(delta):
+                    if is_valid_idea(idea):
+                        yield "idea", finalize_idea(idea, request)
+
+
+class AnthropicProvider(GenerationProvider):
+    """Messages API over the shared HTTP pool"""
+
+    name = "anthropic"
+    url = "https://api.anthropic.com/v1/messages"
+
+    def __init__(self, api_key: str, model: str = GENERATION_MODEL or "claude-3-haiku-20240307"):
+        self.api_key = api_key
+        self.model = model
+
+    async def generate(self, request) -> List[Dict[str, Any]]:
+        response = await self.http.post(
+            self.url,
+            headers={"x-api-key": self.api_key, "anthropic-version": "2023-06-01"},
+            json={
+                "model": self.model,
+                "max_tokens": 2048,
+                "messages": [{"role": "user", "content": build_prompt(request)}],
+            },
+        )
+        response.raise_for_status()
+        text = "".join(block.get("text", "") for block in response.json()["content"])
+        return parse_ideas(text, request)
+
+    async def stream(self, request) -> AsyncIterator[Tuple[str, Any]]:
+        parser = IdeaStreamParser()
+        async with self.http.stream(
+            "POST",
+            self.url,
+            headers={"x-api-key": self.api_key, "anthropic-version": "2023-06-01"},
+            json={
+                "model": self.model,
+                "max_tokens": 2048,
+                "messages": [{"role": "user", "content": build_prompt(request)}],
+                "stream": True,
+            },
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[6:])
+                if event.get("type") != "content_block_delta":
+                    continue
+                delta = event["delta"].get("text", "")
+                if not delta:
+                    continue
+                yield "partial", delta
+                for idea in parser.feed(delta):
+                    if is_valid_idea(idea):
+                        yield "idea", finalize_idea(idea, request)
+
+
+def create_provider(name: str = GENERATION_PROVIDER, catalog: Optional[CatalogLoader] = None) -> GenerationProvider:
+    """Build the configured provider, falling back to templates without an API key"""
+    if name == "openai" and os.environ.get("OPENAI_API_KEY"):
+        return OpenAIProvider(os.environ["OPENAI_API_KEY"])
+    if name == "anthropic" and os.environ.get("ANTHROPIC_API_KEY"):
+        return AnthropicProvider(os.environ["ANTHROPIC_API_KEY"])
+    if name == "stub":
+        return StubProvider()
+    if name != "templates":
+        print(f"Generation provider '{name}' is not configured, using template provider")
+    return TemplateProvider(catalog)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+class GenerationService:
+    """Bounded, timed, retrying front end for a generation provider"""
+
+    def __init__(
+        self,
+        provider: GenerationProvider,
+        max_concurrency: int = GENERATION_MAX_CONCURRENCY,
+        queue_timeout: float = GENERATION_QUEUE_TIMEOUT,
+        timeout: float = GENERATION_TIMEOUT,
+        retries: int = GENERATION_RETRIES,
+    ):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.retries = retries
+        self.in_flight = 0
+        self.rejected = 0
+        # Called with (provider, seconds, outcome) once per generation
+        self.observer: Optional[Callable[[str, float, str], None]] = None
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.http: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        """Create the shared connection pool"""
+        if self.http is None:
+            self.http = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency * 2,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+        await self.provider.start(self.http)
+
+    async def close(self) -> None:
+        if self.http is not None:
+            await self.http.aclose()
+            self.http = None
+
+    def _observe(self, start: float, outcome: str) -> None:
+        if self.observer is not None:
+            self.observer(self.provider.name, time.perf_counter() - start, outcome)
+
+    async def _acquire(self, shed: bool = True) -> None:
+        if not shed:
+            await self._slots.acquire()
+            return
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            if self.observer is not None:
+                self.observer(self.provider.name, self.queue_timeout, "overloaded")
+            raise GenerationOverloaded(retry_after=max(1.0, self.timeout / 4))
+
+    async def generate(self, request, shed: bool = True) -> List[Dict[str, Any]]:
+        """Generate ideas, shedding load once every upstream slot is busy
+
+        Background callers that already queue their work (generation jobs) pass
+        shed=False to wait for a slot for as long as it takes.
+        """
+        await self._acquire(shed)
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    ideas = await asyncio.wait_for(self.provider.generate(request), timeout=self.timeout)
+                    self._observe(start, "ok")
+                    return ideas
+                except Exception as e:
+                    if attempt == self.retries or not _is_retryable(e):
+                        if isinstance(e, asyncio.TimeoutError):
+                            self._observe(start, "timeout")
+                            raise GenerationTimeout("Project generation timed out")
+                        self._observe(start, "error")
+                        raise
+                    # Exponential backoff with full jitter
+                    await asyncio.sleep(random.uniform(0, 0.25 * 2 ** attempt))
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def stream(self, request) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream provider events under the same slot limit and overall deadline"""
+        await self._acquire()
+        self.in_flight += 1
+        events = self.provider.stream(request).__aiter__()
+        deadline = asyncio.get_running_loop().time() + self.timeout
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            while True:
+                remaining = deadline - asyncio.get_running_loop().time()
+                try:
+                    yield await asyncio.wait_for(events.__anext__(), timeout=max(0.0, remaining))
+                except StopAsyncIteration:
+                    outcome = "ok"
+                    return
+                except asyncio.TimeoutError:
+                    outcome = "timeout"
+                    raise GenerationTimeout("Project generation timed out")
+        finally:
+            self._observe(start, outcome)
+            await events.aclose()
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider.name,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "rejected": self.rejected,
+        }
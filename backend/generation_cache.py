@@ -0,0 +1,172 @@
+"""
+Result cache and request coalescing for project generation
+Requests are keyed on a normalized fingerprint, so payloads that differ only in
+ordering or letter case share one entry, and concurrent identical requests
+share one upstream call. Keys also carry the catalog version, so ideas built
+from an older catalog are not served after it changes.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from shared_state import SharedState
+
+GENERATION_CACHE_SIZE = int(os.environ.get("GENERATION_CACHE_SIZE", "1024"))
+GENERATION_CACHE_TTL = float(os.environ.get("GENERATION_CACHE_TTL", "3600"))
+
+# Key prefix for entries shared with other workers
+SHARED_PREFIX = "generation:"
+
+
+def _normalize(value: Optional[str]) -> str:
+    return " ".join((value or "").split()).casefold()
+
+
+def _normalize_list(values: Optional[List[str]]) -> List[str]:
+    return sorted({_normalize(value) for value in values or [] if _normalize(value)})
+
+
+def fingerprint(request, catalog_version: Optional[str] = None) -> str:
+    """Stable key for a GenerateProjectRequest against a catalog version"""
+    key = {
+        "catalog": catalog_version,
+        "skill": _normalize(request.skill),
+        "time": _normalize(request.time),
+        "categories": _normalize_list(request.categories),
+        "components": _normalize_list(request.components),
+        "notes": _normalize(request.notes),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+class GenerationCache:
+    """LRU + TTL cache with single-flight generation per key
+
+    With a shared-state backend, a local miss is looked up in the shared
+    store before generating, and new results are published to it.
+    """
+
+    def __init__(self, maxsize: int = GENERATION_CACHE_SIZE, ttl: float = GENERATION_CACHE_TTL, shared: Optional[SharedState] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        # Local misses answered by another worker's result
+        self.shared_hits = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+        # key -> (expires_at, generation_seconds, ideas)
+        self._entries: "OrderedDict[str, Tuple[float, float, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def _lookup(self, key: str) -> Optional[Tuple[float, float, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, elapsed: float, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, elapsed, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _shared_lookup(self, key: str) -> Optional[Any]:
+        if self.shared is None:
+            return None
+        entry = await self.shared.get(SHARED_PREFIX + key)
+        if entry is None:
+            return None
+        self.shared_hits += 1
+        self.saved_seconds += entry["elapsed"]
+        self._store(key, entry["elapsed"], entry["value"])
+        return entry["value"]
+
+    def _share(self, key: str, elapsed: float, value: Any) -> None:
+        if self.shared is not None:
+            self.shared.set(SHARED_PREFIX + key, {"elapsed": elapsed, "value": value}, self.ttl)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Cached value for key, counting a hit or miss"""
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            self.saved_seconds += entry[1]
+            return entry[2]
+        self.misses += 1
+        return await self._shared_lookup(key)
+
+    def put(self, key: str, value: Any, elapsed: float = 0.0) -> None:
+        """Store a value produced outside get_or_generate, such as a finished stream"""
+        self._store(key, elapsed, value)
+        self._share(key, elapsed, value)
+
+    async def _run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        start = time.monotonic()
+        try:
+            value = await self._shared_lookup(key)
+            if value is not None:
+                return value
+            value = await factory()
+            elapsed = time.monotonic() - start
+            self._store(key, elapsed, value)
+            self._share(key, elapsed, value)
+            return value
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def get_or_generate(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value for key, generating it at most once across concurrent callers"""
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            self.saved_seconds += entry[1]
+            return entry[2]
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            started = time.monotonic()
+            value = await asyncio.shield(task)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.saved_seconds += max(0.0, entry[1] - (time.monotonic() - started))
+            return value
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._run(key, factory))
+        self._in_flight[key] = task
+        # Shield so one caller disconnecting does not cancel the shared generation
+        return await asyncio.shield(task)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        hits = self.hits + self.shared_hits + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_size": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "in_flight": len(self._in_flight),
+        }
@@ -0,0 +1,295 @@
+"""
+Asynchronous project generation jobs
+Submitting a job returns its id at once; a bounded pool of async workers runs
+queued jobs in priority order, and clients poll, or long-poll, for the result.
+Finished jobs are retained for GENERATION_JOB_TTL seconds. A job runs in the
+worker process that accepted it; with a shared-state backend every status
+change is published, so any process can answer status requests and forward
+cancellations to the owner.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from generation import GenerationOverloaded
+from shared_state import SharedState
+
+GENERATION_JOB_WORKERS = int(os.environ.get("GENERATION_JOB_WORKERS", "4"))
+GENERATION_JOB_MAX_QUEUED = int(os.environ.get("GENERATION_JOB_MAX_QUEUED", "1000"))
+GENERATION_JOB_TTL = float(os.environ.get("GENERATION_JOB_TTL", "900"))
+# Longest a status request may be held open waiting for a job to finish
+GENERATION_JOB_MAX_WAIT = float(os.environ.get("GENERATION_JOB_MAX_WAIT", "30"))
+# How long a cancel request waits for the job to stop before answering that it is pending
+GENERATION_JOB_CANCEL_WAIT = float(os.environ.get("GENERATION_JOB_CANCEL_WAIT", "2"))
+
+# Shared-state keys and channel for jobs owned by other processes
+SHARED_PREFIX = "generation-job:"
+JOB_CHANNEL = "generation-jobs"
+REMOTE_POLL_INTERVAL = 0.5
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+FINISHED = ("succeeded", "failed", "cancelled")
+
+# Called with (status, previous status, seconds spent in the previous status) on every change
+JobObserver = Callable[[str, Optional[str], float], None]
+
+
+class GenerationJob:
+    """One queued generation request and, once finished, its outcome"""
+
+    def __init__(self, request, priority: str):
+        self.id = str(uuid.uuid4())
+        self.request = request
+        self.priority = priority
+        self.status = "queued"
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.ideas: Optional[List[Dict[str, Any]]] = None
+        self.error: Optional[str] = None
+        self.changed_at = time.monotonic()
+        self.expires_at: Optional[float] = None
+        self.cancel_requested = False
+        self.task: Optional[asyncio.Task] = None
+        self.done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "ideas": self.ideas,
+            "error": self.error,
+        }
+
+
+class GenerationJobQueue:
+    """Priority queue of generation jobs drained by a fixed pool of workers"""
+
+    def __init__(
+        self,
+        run: Callable[[Any], Awaitable[List[Dict[str, Any]]]],
+        workers: int = GENERATION_JOB_WORKERS,
+        max_queued: int = GENERATION_JOB_MAX_QUEUED,
+        ttl: float = GENERATION_JOB_TTL,
+        shared: Optional[SharedState] = None,
+    ):
+        self.run = run
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.shared = shared
+        self.observer: Optional[JobObserver] = None
+        self.queued = 0
+        self.submitted = 0
+        self.started = 0
+        self.rejected = 0
+        self.expired = 0
+        self.outcomes = dict.fromkeys(FINISHED, 0)
+        self.wait_seconds = 0.0
+        self.busy_seconds = 0.0
+        self._jobs: Dict[str, GenerationJob] = {}
+        # Finished jobs in finishing order, which is also expiry order
+        self._finished: "OrderedDict[str, GenerationJob]" = OrderedDict()
+        # job id -> perf_counter when it started running
+        self._running: Dict[str, float] = {}
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._workers: List[asyncio.Task] = []
+        self._started_at = time.monotonic()
+        if shared is not None:
+            shared.subscribe(JOB_CHANNEL, self._on_remote)
+
+    # Lifecycle
+
+    def start(self) -> None:
+        if not self._workers:
+            self._started_at = time.monotonic()
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self) -> None:
+        """Stop the workers; jobs still queued or running fail"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for job in list(self._jobs.values()):
+            if job.status == "queued":
+                job.error = "Server shut down before the job ran"
+                self._finish(job, "failed")
+
+    # State changes
+
+    def _transition(self, job: GenerationJob, status: str) -> None:
+        now = time.monotonic()
+        previous, seconds = job.status, now - job.changed_at
+        job.status, job.changed_at = status, now
+        if previous == "queued":
+            self.queued -= 1
+        if self.observer is not None:
+            self.observer(status, previous, seconds)
+        if self.shared is not None:
+            self.shared.set(SHARED_PREFIX + job.id, job.snapshot(), self.ttl)
+
+    def _finish(self, job: GenerationJob, status: str) -> None:
+        job.finished_at = datetime.now()
+        job.expires_at = time.monotonic() + self.ttl
+        self._transition(job, status)
+        self.outcomes[status] += 1
+        self._finished[job.id] = job
+        job.done.set()
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        while self._finished:
+            job = next(iter(self._finished.values()))
+            if job.expires_at > now:
+                return
+            del self._finished[job.id]
+            del self._jobs[job.id]
+            self.expired += 1
+
+    # Workers
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            if job.status != "queued":
+                # Cancelled while it waited
+                continue
+            job.started_at = datetime.now()
+            self.started += 1
+            self.wait_seconds += time.monotonic() - job.changed_at
+            self._transition(job, "running")
+            self._running[job.id] = time.perf_counter()
+            job.task = asyncio.create_task(self.run(job.request))
+            try:
+                job.ideas = await job.task
+                self._finish(job, "succeeded")
+            except asyncio.CancelledError:
+                if job.cancel_requested:
+                    self._finish(job, "cancelled")
+                    continue
+                # The worker itself is being stopped
+                job.task.cancel()
+                job.error = "Server shut down while the job was running"
+                self._finish(job, "failed")
+                raise
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                self._finish(job, "failed")
+            finally:
+                self.busy_seconds += time.perf_counter() - self._running.pop(job.id)
+                job.task = None
+
+    # Public interface
+
+    def submit(self, request, priority: str = "normal") -> Dict[str, Any]:
+        """Queue a job; raises GenerationOverloaded once max_queued jobs are waiting"""
+        self._purge()
+        if self.queued >= self.max_queued:
+            self.rejected += 1
+            raise GenerationOverloaded(retry_after=self.retry_after())
+        job = GenerationJob(request, priority)
+        self._jobs[job.id] = job
+        self.queued += 1
+        self.submitted += 1
+        self._queue.put_nowait((PRIORITIES[priority], next(self._sequence), job))
+        if self.observer is not None:
+            self.observer("queued", None, 0.0)
+        if self.shared is not None:
+            self.shared.set(SHARED_PREFIX + job.id, job.snapshot(), self.ttl)
+        return job.snapshot()
+
+    async def status(self, job_id: str, wait: float = 0.0) -> Optional[Dict[str, Any]]:
+        """Snapshot of a job, waiting up to `wait` seconds for it to finish; None if unknown"""
+        self._purge()
+        wait = min(wait, GENERATION_JOB_MAX_WAIT)
+        job = self._jobs.get(job_id)
+        if job is None:
+            return await self._remote_status(job_id, wait)
+        if wait > 0 and not job.finished:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+        return job.snapshot()
+
+    async def _remote_status(self, job_id: str, wait: float) -> Optional[Dict[str, Any]]:
+        if self.shared is None:
+            return None
+        deadline = time.monotonic() + wait
+        while True:
+            snapshot = await self.shared.get(SHARED_PREFIX + job_id)
+            remaining = deadline - time.monotonic()
+            if snapshot is None or snapshot["status"] in FINISHED or remaining <= 0:
+                return snapshot
+            await asyncio.sleep(min(REMOTE_POLL_INTERVAL, remaining))
+
+    async def cancel(self, job_id: str, wait: float = GENERATION_JOB_CANCEL_WAIT) -> Optional[Dict[str, Any]]:
+        """Cancel a queued or running job; finished jobs are returned unchanged
+
+        Waits up to `wait` seconds for the job to stop, here or in the process
+        that owns it. A snapshot that is still queued or running means the
+        cancel was requested but has not taken effect yet.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            snapshot = await self._remote_status(job_id, 0.0)
+            if snapshot is None or snapshot["status"] in FINISHED:
+                return snapshot
+            self.shared.publish(JOB_CHANNEL, {"op": "cancel", "id": job_id})
+            return await self._remote_status(job_id, wait) or snapshot
+        if job.status == "queued":
+            self._finish(job, "cancelled")
+        elif job.status == "running":
+            job.cancel_requested = True
+            job.task.cancel()
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+        return job.snapshot()
+
+    def _on_remote(self, message: Dict[str, Any]) -> None:
+        if message.get("op") == "cancel" and message.get("id") in self._jobs:
+            # The requester polls the shared status; nothing here needs to wait
+            asyncio.get_running_loop().create_task(self.cancel(message["id"], wait=0.0))
+
+    def retry_after(self) -> float:
+        """Rough seconds until a worker frees up, from the mean run time so far"""
+        finished = sum(self.outcomes.values())
+        mean_run = self.busy_seconds / finished if finished else 1.0
+        return max(1.0, mean_run * self.queued / max(1, self.workers))
+
+    def stats(self) -> Dict[str, Any]:
+        self._purge()
+        now = time.perf_counter()
+        busy_seconds = self.busy_seconds + sum(now - start for start in self._running.values())
+        uptime = max(time.monotonic() - self._started_at, 1e-9)
+        return {
+            "workers": self.workers,
+            "busy": len(self._running),
+            "utilization": round(busy_seconds / (self.workers * uptime), 4) if self.workers else 0.0,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "retained": len(self._jobs),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            **self.outcomes,
+            "mean_wait": round(self.wait_seconds / self.started, 4) if self.started else 0.0,
+        }
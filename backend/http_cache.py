@@ -0,0 +1,95 @@
+"""
+HTTP conditional caching for read endpoints
+Strong ETags come from document ids and `updated_at` (or a content hash when a
+document has no timestamp); matching If-None-Match / If-Modified-Since requests
+get a bodiless 304 before the response model is serialized.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import Request, Response
+
+CATALOG_MAX_AGE = int(os.environ.get("CATALOG_MAX_AGE", "60"))
+CATALOG_CACHE_CONTROL = f"public, max-age={CATALOG_MAX_AGE}"
+# Per-user data may be cached by the client but must be revalidated each time
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def _as_datetime(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return None
+
+
+def _version(doc: Dict[str, Any]) -> str:
+    updated_at = _as_datetime(doc.get('updated_at'))
+    if updated_at is not None:
+        return updated_at.isoformat()
+    return hashlib.sha1(json.dumps(doc, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def compute_etag(docs: Iterable[Dict[str, Any]], salt: str = "") -> str:
+    """Strong ETag for an ordered list of documents"""
+    digest = hashlib.sha1(salt.encode())
+    for doc in docs:
+        digest.update(f"{doc.get('id')}@{_version(doc)};".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def last_modified(docs: Iterable[Dict[str, Any]]) -> Optional[datetime]:
+    stamps = [
+        stamp for stamp in (
+            _as_datetime(doc.get('updated_at') or doc.get('created_at')) for doc in docs
+        ) if stamp is not None
+    ]
+    return max(stamps) if stamps else None
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    # If-None-Match uses weak comparison
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def is_not_modified(request: Request, etag: str, modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return modified.replace(microsecond=0) <= since
+    return False
+
+
+def conditional(
+    request: Request,
+    response: Response,
+    etag: str,
+    modified: Optional[datetime] = None,
+    cache_control: str = PRIVATE_CACHE_CONTROL,
+) -> Optional[Response]:
+    """Set validators on the response; returns a 304 response when the client copy is current"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(modified.astimezone(timezone.utc), usegmt=True)
+    if is_not_modified(request, etag, modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
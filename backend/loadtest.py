@@ -0,0 +1,223 @@
+"""
+Endpoint load test
+Drives every API endpoint with concurrent httpx requests and reports throughput
+and p50/p95/p99 latency per endpoint. By default the app runs in process on
+the in-memory Firestore stand-in, so results are repeatable offline:
+
+    python loadtest.py --requests 500 --concurrency 32 --latency 0.005
+    python loadtest.py --url http://localhost:8000 --only components
+    DATA_BACKEND=sqlite SQLITE_PATH=/tmp/load.db python loadtest.py
+
+Not covered: DELETE /api/projects/generate/jobs/{id} (cancelling the seeded
+jobs once would leave nothing to poll) and /metrics/profiles/{id}, which only
+serves profiles captured with X-Profile.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks import percentiles, synthetic_project
+
+# (name, request factory); a factory returns (method, path, kwargs) for one call
+Scenario = Tuple[str, Callable[["LoadContext"], Tuple[str, str, Dict[str, Any]]]]
+
+
+class LoadContext:
+    """Ids created during setup, shared by the scenarios"""
+
+    def __init__(self):
+        self.component_ids: List[str] = []
+        self.project_ids: List[str] = []
+        self.user_ids: List[str] = []
+        self.job_ids: List[str] = []
+        # Seeded components for the delete scenario, consumed one per request
+        self.disposable_component_ids: List[str] = []
+        self.catalog_etag: Optional[str] = None
+        self.counter = 0
+
+    def next(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+def _component(i: int) -> Dict[str, Any]:
+    return {
+        "name": f"Load Sensor {i}",
+        "description": "Synthetic component created by the load test",
+        "category": "Sensors",
+        "price_range": "$1-5",
+        "specifications": {"operating_voltage": "3.3V", "interface": "I2C"},
+    }
+
+
+def _disposable_component(ctx: LoadContext) -> str:
+    if ctx.disposable_component_ids:
+        return ctx.disposable_component_ids.pop()
+    return f"missing-{ctx.next()}"
+
+
+GENERATE_BODY = {"skill": "beginner", "components": ["Arduino Uno"]}
+
+
+SCENARIOS: List[Scenario] = [
+    ("GET /", lambda ctx: ("GET", "/", {})),
+    ("GET /api/components", lambda ctx: ("GET", "/api/components", {})),
+    ("GET /api/components (304)", lambda ctx: ("GET", "/api/components", {"headers": {"If-None-Match": ctx.catalog_etag or "*"}})),
+    ("GET /api/components?search", lambda ctx: ("GET", "/api/components", {"params": {"search": random.choice(["sensor", "arduino", "motor", "led"])}})),
+    ("GET /api/components?category", lambda ctx: ("GET", "/api/components", {"params": {"category": "Sensors"}})),
+    ("GET /api/components/spec-keys", lambda ctx: ("GET", "/api/components/spec-keys", {})),
+    ("GET /api/components/{id}", lambda ctx: ("GET", f"/api/components/{random.choice(ctx.component_ids)}", {})),
+    ("GET /api/components/{id}/related", lambda ctx: ("GET", f"/api/components/{random.choice(ctx.component_ids)}/related", {})),
+    ("POST /api/components/batch-get", lambda ctx: ("POST", "/api/components/batch-get", {"json": {"ids": random.sample(ctx.component_ids, min(10, len(ctx.component_ids)))}})),
+    ("POST /api/components", lambda ctx: ("POST", "/api/components", {"json": _component(ctx.next())})),
+    ("PUT /api/components/{id}", lambda ctx: ("PUT", f"/api/components/{random.choice(ctx.component_ids)}", {"json": _component(ctx.next())})),
+    ("DELETE /api/components/{id}", lambda ctx: ("DELETE", f"/api/components/{_disposable_component(ctx)}", {})),
+    ("POST /api/components/bulk", lambda ctx: ("POST", "/api/components/bulk", {"json": {"create": [_component(ctx.next()) for _ in range(10)]}})),
+    ("GET /api/projects", lambda ctx: ("GET", "/api/projects", {"params": {"user_id": "bench-user", "limit": 50}})),
+    ("POST /api/projects", lambda ctx: ("POST", "/api/projects", {"json": synthetic_project(ctx.next())})),
+    ("PUT /api/projects/{id}", lambda ctx: ("PUT", f"/api/projects/{random.choice(ctx.project_ids)}", {"json": synthetic_project(ctx.next())})),
+    ("POST /api/projects/bulk", lambda ctx: ("POST", "/api/projects/bulk", {"json": {
+        "create": [synthetic_project(ctx.next()) for _ in range(5)],
+        "update": [{**synthetic_project(ctx.next()), "id": project_id} for project_id in random.sample(ctx.project_ids, min(5, len(ctx.project_ids)))],
+    }})),
+    ("GET /api/projects/{id}/similar", lambda ctx: ("GET", f"/api/projects/{random.choice(ctx.project_ids)}/similar", {})),
+    ("POST /api/projects/batch-get", lambda ctx: ("POST", "/api/projects/batch-get", {"json": {"ids": random.sample(ctx.project_ids, min(20, len(ctx.project_ids)))}})),
+    ("DELETE /api/projects/{id}", lambda ctx: ("DELETE", f"/api/projects/missing-{ctx.next()}", {})),
+    ("POST /api/projects/generate", lambda ctx: ("POST", "/api/projects/generate", {"json": {**GENERATE_BODY, "categories": [random.choice(["IoT", "Robotics", "Weather"])]}})),
+    ("POST /api/projects/generate/stream", lambda ctx: ("POST", "/api/projects/generate/stream", {"json": {**GENERATE_BODY, "categories": [random.choice(["IoT", "Robotics", "Weather"])]}})),
+    ("POST /api/projects/generate/jobs", lambda ctx: ("POST", "/api/projects/generate/jobs", {"json": {"skill": "beginner", "components": ["ESP32"], "notes": str(ctx.next() % 50), "priority": random.choice(["high", "normal", "low"])}})),
+    ("GET /api/projects/generate/jobs/{id}", lambda ctx: ("GET", f"/api/projects/generate/jobs/{random.choice(ctx.job_ids)}", {})),
+    ("POST /api/users", lambda ctx: ("POST", "/api/users", {"json": {"name": "Load User", "email": f"load{ctx.next()}@example.com"}})),
+    ("POST /api/users/bulk", lambda ctx: ("POST", "/api/users/bulk", {"json": {"create": [
+        {"name": "Load User", "email": f"load{ctx.next()}@example.com"} for _ in range(10)
+    ]}})),
+    ("POST /api/users/batch-get", lambda ctx: ("POST", "/api/users/batch-get", {"json": {"ids": random.sample(ctx.user_ids, min(10, len(ctx.user_ids)))}})),
+    ("GET /api/users/{id}/stats", lambda ctx: ("GET", "/api/users/bench-user/stats", {})),
+    ("POST /api/users/{id}/stats/rebuild", lambda ctx: ("POST", "/api/users/bench-user/stats/rebuild", {})),
+    ("GET /api/users/{id}", lambda ctx: ("GET", f"/api/users/{random.choice(ctx.user_ids)}", {})),
+    ("GET /api/cache/stats", lambda ctx: ("GET", "/api/cache/stats", {})),
+    ("GET /api/limits/stats", lambda ctx: ("GET", "/api/limits/stats", {})),
+    ("GET /metrics", lambda ctx: ("GET", "/metrics", {})),
+]
+
+
+async def setup(client: httpx.AsyncClient, ctx: LoadContext, projects: int = 200, users: int = 20, disposable: int = 0) -> None:
+    """Seed projects, users and components to delete, and collect ids for the scenarios"""
+    for start in range(0, disposable, 500):
+        response = await client.post("/api/components/bulk", json={"create": [
+            _component(-i) for i in range(start + 1, min(start + 500, disposable) + 1)
+        ]})
+        response.raise_for_status()
+        ctx.disposable_component_ids += [result["id"] for result in response.json()["results"] if result["status"] == "ok"]
+
+    response = await client.get("/api/components")
+    response.raise_for_status()
+    disposable_ids = set(ctx.disposable_component_ids)
+    ctx.component_ids = [component["id"] for component in response.json() if component["id"] not in disposable_ids]
+    ctx.catalog_etag = response.headers.get("etag")
+
+    response = await client.post("/api/projects/bulk", json={"create": [synthetic_project(i) for i in range(projects)]})
+    response.raise_for_status()
+    ctx.project_ids = [result["id"] for result in response.json()["results"] if result["status"] == "ok"]
+
+    response = await client.post("/api/users/bulk", json={"create": [
+        {"name": f"User {i}", "email": f"user{i}@example.com"} for i in range(users)
+    ]})
+    response.raise_for_status()
+    ctx.user_ids = [result["id"] for result in response.json()["results"] if result["status"] == "ok"]
+
+    for i in range(10):
+        response = await client.post("/api/projects/generate/jobs", json={"skill": "beginner", "notes": f"setup {i}"})
+        response.raise_for_status()
+        ctx.job_ids.append(response.json()["id"])
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: LoadContext, scenario: Scenario, requests: int, concurrency: int) -> Dict[str, Any]:
+    name, factory = scenario
+    samples: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for _ in remaining:
+            method, path, kwargs = factory(ctx)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"name": name, "rps": len(samples) / elapsed, "errors": errors, **percentiles(samples)}
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print(f"{'endpoint':<36} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+    for result in results:
+        print(
+            f"{result['name']:<36} {result['rps']:9.1f} {result['p50']:8.2f}ms "
+            f"{result['p95']:8.2f}ms {result['p99']:8.2f}ms {result['errors']:7d}"
+        )
+
+
+async def _with_client(url: Optional[str], body: Callable[[httpx.AsyncClient], Awaitable[None]]) -> None:
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+            await body(client)
+        return
+
+    import main
+    await main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            await body(client)
+    finally:
+        await main.app.router.shutdown()
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    ctx = LoadContext()
+    scenarios = [scenario for scenario in SCENARIOS if not args.only or any(part in scenario[0] for part in args.only)]
+
+    async def body(client: httpx.AsyncClient) -> None:
+        deletes = any(name == "DELETE /api/components/{id}" for name, _ in scenarios)
+        await setup(client, ctx, disposable=args.requests if deletes else 0)
+        results = []
+        for scenario in scenarios:
+            results.append(await run_scenario(client, ctx, scenario, args.requests, args.concurrency))
+        print_results(results)
+
+    await _with_client(args.url, body)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.0, help="Injected in-memory store latency in seconds")
+    parser.add_argument("--only", nargs="*", help="Run endpoints whose name contains any of these strings")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    if not args.url:
+        os.environ.setdefault("DATA_BACKEND", "memory")
+        os.environ.setdefault("MEMORY_STORE_LATENCY", str(args.latency))
+        # Every simulated request comes from one client; measure endpoints, not the rate limiter
+        for budget in ("GENERATION_RATE", "GENERATION_BURST", "CRUD_RATE", "CRUD_BURST", "POLL_RATE", "POLL_BURST"):
+            os.environ.setdefault(budget, "1e9")
+    asyncio.run(main_async(args))
@@ -1,22 +1,47 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-import firebase_admin
-from firebase_admin import credentials, firestore
+from pydantic import BaseModel, BeforeValidator, Field, model_validator
+from typing import Annotated, List, Literal, Optional, Dict, Any
 import json
 import os
 from datetime import datetime
 import uuid
+import time
 import asyncio
 import httpx
 
+from firebase_config import create_repository
+from compression import CompressionMiddleware, FastJSONResponse
+from catalog_cache import ComponentCatalog, COMPONENT_CACHE_LISTEN
+from search_index import ComponentSearchIndex
+from similarity import component_index, project_index
+from spec_registry import COMMON_SPEC_KEYS, SPEC_KEYS_BY_CATEGORY, check_category_keys, normalize_specs, read_specs
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, InvalidCursor,
+    decode_cursor, encode_cursor, paginate_by_id, paginate_ranked,
+)
+from streaming import stream_documents, stream_events, stream_media_type
+from generation import GenerationOverloaded, GenerationService, GenerationTimeout, create_provider
+from generation_cache import GenerationCache, fingerprint
+from generation_jobs import FINISHED as JOB_FINISHED, GENERATION_JOB_MAX_WAIT, GenerationJobQueue
+from http_cache import CATALOG_CACHE_CONTROL, compute_etag, conditional, last_modified
+from shared_state import create_shared_state
+from write_behind import WriteBehindBuffer, write_behind_enabled
+from user_stats import LibraryAggregates
+from rate_limit import (
+    CRUD_BURST, CRUD_RATE, GENERATION_BURST, GENERATION_RATE, POLL_BURST, POLL_RATE,
+    AdmissionControlMiddleware, AdmissionController, RateLimiter, rate_limited,
+)
+from metrics import MetricsMiddleware, observe_firestore, observe_generation, observe_generation_job, profiles, registry
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Atal Idea Generator API",
     description="AI-powered STEM project generator API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware
@@ -26,93 +51,89 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],
 )
 
+# gzip/brotli for larger bodies
+app.add_middleware(CompressionMiddleware)
+
+# Shed load with 429 once the process is saturated
+admission = AdmissionController()
+app.add_middleware(AdmissionControlMiddleware, controller=admission)
+
+# Outermost, so latency and response sizes cover everything below it
+app.add_middleware(MetricsMiddleware)
+
 # Security
-security = HTTPBearer()
-
-# Firebase initialization
-# TODO: Replace with your Firebase service account key
-FIREBASE_CONFIG = {
-    # Add your Firebase service account key here
-    "type": "service_account",
-    "project_id": "your-project-id",
-    "private_key_id": "your-private-key-id",
-    "private_key": "your-private-key",
-    "client_email": "your-client-email",
-    "client_id": "your-client-id",
-    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-    "token_uri": "https://oauth2.googleapis.com/token",
-    "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-    "client_x509_cert_url": "your-client-cert-url"
-}
-
-# Initialize Firebase (only if not already initialized)
-try:
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(FIREBASE_CONFIG)
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    print("Firebase initialized successfully")
-except Exception as e:
-    print(f"Firebase initialization failed: {e}")
-    print("Running in development mode without Firebase")
-    db = None
+# Bearer tokens are optional and not verified; the rate limiters use them to tell clients behind one address apart
+security = HTTPBearer(auto_error=False)
+
+# Per-client budgets: generation is expensive, writes spend Firestore quota
+generation_limiter = RateLimiter("generation", GENERATION_RATE, GENERATION_BURST)
+write_limiter = RateLimiter("write", CRUD_RATE, CRUD_BURST)
+limit_generation = Depends(rate_limited(generation_limiter, security))
+limit_writes = Depends(rate_limited(write_limiter, security))
+# A bulk request may carry thousands of writes
+limit_bulk_writes = Depends(rate_limited(write_limiter, security, cost=10))
+# Job status polls, long or short
+poll_limiter = RateLimiter("poll", POLL_RATE, POLL_BURST)
+limit_polls = Depends(rate_limited(poll_limiter, security))
+
+# Non-blocking data access layer shared by all routes
+# Firestore, or local SQLite with DATA_BACKEND=sqlite; the client is created lazily on startup
+repo = create_repository()
+repo.observer = observe_firestore
+
+# Cache entries and invalidations shared with the other workers (see serve.py)
+shared_state = create_shared_state()
+
+# Rate-limit budgets are per client across all workers, not per worker
+generation_limiter.attach(shared_state)
+write_limiter.attach(shared_state)
+poll_limiter.attach(shared_state)
+
+# Memory-resident components catalog
+catalog = ComponentCatalog(repo)
+catalog.attach(shared_state)
+
+# Per-user library counts, updated in the same transaction as each project write
+library_stats = LibraryAggregates(repo)
+
+# Coalescing write queue for project saves and edits (PROJECT_WRITE_BEHIND=1, single worker only)
+project_writes = WriteBehindBuffer(repo, 'projects', enabled=write_behind_enabled(shared_state), derive=library_stats.derive)
+
+# Feature vectors of saved projects for similar-project lookups, loaded after startup
+project_vectors = project_index()
+project_vectors.attach(shared_state, "project-vectors")
+project_vectors_load: Optional[asyncio.Task] = None
+
+# Project idea generation backend
+async def generation_catalog():
+    """Catalog snapshot the template provider indexes"""
+    return await catalog_etag(), await list_components()
+
+generator = GenerationService(create_provider(catalog=generation_catalog))
+generator.observer = observe_generation
+generation_cache = GenerationCache(shared=shared_state)
+
+async def generation_key(request) -> str:
+    """Cache key for a request against the catalog currently being served"""
+    return fingerprint(request, await catalog_etag())
+
+async def run_generation_job(request):
+    """Jobs share cached and in-flight results with the synchronous endpoints"""
+    # Jobs already wait in their own queue, so they wait for a slot rather than being shed
+    return await generation_cache.get_or_generate(await generation_key(request), lambda: generator.generate(request, shed=False))
+
+# Background generation for clients that submit a job and poll for the result
+generation_jobs = GenerationJobQueue(run_generation_job, shared=shared_state)
+generation_jobs.observer = observe_generation_job
 
 # Pydantic Models
-class ComponentSpec(BaseModel):
-    microcontroller: Optional[str] = None
-    operating_voltage: Optional[str] = None
-    input_voltage: Optional[str] = None
-    digital_io_pins: Optional[str] = None
-    analog_input_pins: Optional[str] = None
-    flash_memory: Optional[str] = None
-    processor: Optional[str] = None
-    frequency: Optional[str] = None
-    sram: Optional[str] = None
-    wifi: Optional[str] = None
-    bluetooth: Optional[str] = None
-    ram: Optional[str] = None
-    connectivity: Optional[str] = None
-    usb_ports: Optional[str] = None
-    hdmi: Optional[str] = None
-    measuring_range: Optional[str] = None
-    measuring_angle: Optional[str] = None
-    trigger_pulse: Optional[str] = None
-    echo_pulse: Optional[str] = None
-    temperature_range: Optional[str] = None
-    humidity_range: Optional[str] = None
-    accuracy_temperature: Optional[str] = None
-    accuracy_humidity: Optional[str] = None
-    torque: Optional[str] = None
-    speed: Optional[str] = None
-    rotation: Optional[str] = None
-    weight: Optional[str] = None
-    power_consumption: Optional[str] = None
-    color_depth: Optional[str] = None
-    data_transmission: Optional[str] = None
-    pixels_per_meter: Optional[str] = None
-    trigger_current: Optional[str] = None
-    contact_voltage: Optional[str] = None
-    contact_type: Optional[str] = None
-    response_time: Optional[str] = None
-    size: Optional[str] = None
-    resolution: Optional[str] = None
-    interface: Optional[str] = None
-    colors: Optional[str] = None
-    detection_range: Optional[str] = None
-    detection_angle: Optional[str] = None
-    delay_time: Optional[str] = None
-    block_time: Optional[str] = None
-    current: Optional[str] = None
-    sound_level: Optional[str] = None
-    step_angle: Optional[str] = None
-    steps_per_revolution: Optional[str] = None
-    gear_ratio: Optional[str] = None
-    resistance_light: Optional[str] = None
-    resistance_dark: Optional[str] = None
-    peak_wavelength: Optional[str] = None
-    probe_length: Optional[str] = None
+# Sparse key -> value specifications, validated against spec_registry
+ComponentSpec = Annotated[Dict[str, str], BeforeValidator(normalize_specs)]
+# Responses accept what is already stored, including keys from before the registry
+StoredComponentSpec = Annotated[Dict[str, str], BeforeValidator(read_specs)]
 
 class Component(BaseModel):
     id: Optional[str] = None
@@ -121,7 +142,7 @@ class Component(BaseModel):
     category: str
     price_range: str
     availability: str = "Available"
-    specifications: Optional[ComponentSpec] = None
+    specifications: Optional[StoredComponentSpec] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -130,7 +151,12 @@ class ComponentCreate(BaseModel):
     description: str
     category: str
     price_range: str
-    specifications: Optional[Dict[str, str]] = None
+    specifications: Optional[ComponentSpec] = None
+
+    @model_validator(mode='after')
+    def check_specification_keys(self):
+        check_category_keys(self.category, self.specifications)
+        return self
 
 class ProjectIdea(BaseModel):
     id: Optional[str] = None
@@ -150,6 +176,19 @@ class GenerateProjectRequest(BaseModel):
     time: Optional[str] = "2-5h"
     notes: Optional[str] = ""
 
+class GenerationJobRequest(GenerateProjectRequest):
+    priority: Literal["high", "normal", "low"] = "normal"
+
+class GenerationJob(BaseModel):
+    id: str
+    status: str  # queued, running, succeeded, failed, cancelled
+    priority: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    ideas: Optional[List[ProjectIdea]] = None
+    error: Optional[str] = None
+
 class Project(BaseModel):
     id: Optional[str] = None
     title: str
@@ -163,6 +202,30 @@ class Project(BaseModel):
     notes: Optional[str] = ""
     user_id: Optional[str] = None
 
+class RelatedComponent(Component):
+    score: float
+
+class SimilarProject(Project):
+    score: float
+
+class ProjectSummary(BaseModel):
+    id: str
+    title: Optional[str] = None
+    status: Optional[str] = None
+    category: Optional[str] = None
+    difficulty: Optional[str] = None
+    dateSaved: Optional[str] = None
+
+class UserStats(BaseModel):
+    user_id: str
+    total: int
+    status: Dict[str, int]
+    difficulty: Dict[str, int]
+    category: Dict[str, int]
+    tags: Dict[str, int]
+    recent: List[ProjectSummary]
+    updated_at: Optional[datetime] = None
+
 class User(BaseModel):
     id: Optional[str] = None
     name: str
@@ -170,6 +233,51 @@ class User(BaseModel):
     avatar_url: Optional[str] = None
     created_at: Optional[datetime] = None
 
+# Bulk request/response models
+MAX_BULK_ITEMS = 2000
+
+class ComponentUpdateItem(ComponentCreate):
+    id: str
+
+class ComponentBulkRequest(BaseModel):
+    create: List[ComponentCreate] = Field(default_factory=list, max_length=MAX_BULK_ITEMS)
+    update: List[ComponentUpdateItem] = Field(default_factory=list, max_length=MAX_BULK_ITEMS)
+    delete: List[str] = Field(default_factory=list, max_length=MAX_BULK_ITEMS)
+
+class ProjectBulkRequest(BaseModel):
+    create: List[Project] = Field(default_factory=list, max_length=MAX_BULK_ITEMS)
+    update: List[Project] = Field(default_factory=list, max_length=MAX_BULK_ITEMS)
+    delete: List[str] = Field(default_factory=list, max_length=MAX_BULK_ITEMS)
+
+class UserBulkRequest(BaseModel):
+    create: List[User] = Field(default_factory=list, max_length=MAX_BULK_ITEMS)
+
+class BulkItemResult(BaseModel):
+    id: Optional[str] = None
+    op: str  # create, update, delete
+    status: str  # ok, not_found, error
+    detail: Optional[str] = None
+
+class BulkResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+class BatchGetRequest(BaseModel):
+    ids: List[str] = Field(max_length=MAX_BULK_ITEMS)
+
+class ComponentBatch(BaseModel):
+    items: List[Component]
+    missing: List[str]
+
+class ProjectBatch(BaseModel):
+    items: List[Project]
+    missing: List[str]
+
+class UserBatch(BaseModel):
+    items: List[User]
+    missing: List[str]
+
 # Default components data
 DEFAULT_COMPONENTS = [
     {
@@ -236,81 +344,257 @@ DEFAULT_COMPONENTS = [
     }
 ]
 
+# Search index over the built-in components for when Firebase is unavailable
+default_component_index = ComponentSearchIndex(DEFAULT_COMPONENTS)
+default_component_etag = compute_etag(DEFAULT_COMPONENTS)
+default_component_vectors = component_index()
+default_component_vectors.rebuild(DEFAULT_COMPONENTS)
+
 # Helper Functions
 async def initialize_default_data():
     """Initialize default components if collection is empty"""
     try:
-        if db is None:
+        if not repo.available:
             print("Firebase not initialized, skipping default data initialization")
             return
             
-        components_ref = db.collection('components')
-        docs = components_ref.limit(1).stream()
-        
         # Check if collection is empty
-        if not any(docs):
+        if await repo.is_empty('components'):
             print("Initializing default components...")
-            for comp_data in DEFAULT_COMPONENTS:
-                comp_data['created_at'] = datetime.now()
-                comp_data['updated_at'] = datetime.now()
-                components_ref.document(comp_data['id']).set(comp_data)
+            now = datetime.now()
+            # Fixed ids make the seed idempotent when several workers start at once
+            writes = [
+                ('set', 'components', comp_data['id'], {**comp_data, 'created_at': now, 'updated_at': now})
+                for comp_data in DEFAULT_COMPONENTS
+            ]
+            errors = [error for error in await repo.commit(writes) if error]
+            if errors:
+                raise RuntimeError(errors[0])
+            catalog.invalidate()
             print(f"Added {len(DEFAULT_COMPONENTS)} default components")
     except Exception as e:
         print(f"Error initializing default data: {e}")
 
+async def bulk_write(collection: str, creates=(), updates=(), deletes=(), existing=None):
+    """Apply many writes in chunked WriteBatch commits and report a result per item
+
+    creates and updates are (id, data) pairs, deletes are ids. existing may pass
+    in the current update and delete targets when the caller already read them.
+    Returns the results plus the documents as written, keyed by id (None for deletes).
+    """
+    creates, updates, deletes = list(creates), list(updates), list(deletes)
+    
+    # One get_all round trip tells us which updates and deletes target missing docs
+    if existing is None:
+        existing = await repo.get_many(collection, [doc_id for doc_id, _ in updates] + deletes)
+    
+    results = []
+    writes = []
+    written = []
+    for doc_id, data in creates:
+        results.append(BulkItemResult(id=doc_id, op='create', status='ok'))
+        writes.append(('set', collection, doc_id, data))
+        written.append((len(results) - 1, doc_id, data))
+    for doc_id, data in updates:
+        if doc_id not in existing:
+            results.append(BulkItemResult(id=doc_id, op='update', status='not_found'))
+            continue
+        results.append(BulkItemResult(id=doc_id, op='update', status='ok'))
+        writes.append(('update', collection, doc_id, data))
+        written.append((len(results) - 1, doc_id, {**existing[doc_id], **data}))
+    for doc_id in deletes:
+        if doc_id not in existing:
+            results.append(BulkItemResult(id=doc_id, op='delete', status='not_found'))
+            continue
+        results.append(BulkItemResult(id=doc_id, op='delete', status='ok'))
+        writes.append(('delete', collection, doc_id, None))
+        written.append((len(results) - 1, doc_id, None))
+    
+    documents = {}
+    for (position, doc_id, data), error in zip(written, await repo.commit(writes)):
+        if error:
+            results[position].status = 'error'
+            results[position].detail = error
+        else:
+            documents[doc_id] = data
+    
+    succeeded = sum(1 for result in results if result.status == 'ok')
+    return BulkResponse(succeeded=succeeded, failed=len(results) - succeeded, results=results), documents
+
+async def load_project_vectors():
+    """Index every saved project; writes made meanwhile are applied once it finishes"""
+    project_vectors.start_load()
+    try:
+        # Vectors are built batch by batch as documents stream in; only the final swap takes the index lock
+        builder = project_vectors.builder()
+        async for doc in repo.stream('projects'):
+            builder.add(doc)
+        await asyncio.to_thread(project_vectors.install, builder)
+        print(f"Indexed {len(builder)} projects for similarity")
+    except Exception as e:
+        project_vectors.cancel_load()
+        print(f"Error indexing projects for similarity: {e}")
+
 # API Endpoints
 
 @app.on_event("startup")
 async def startup_event():
+    global project_vectors_load
+    await shared_state.start()
+    await repo.connect()
     await initialize_default_data()
+    project_writes.start()
+    await generator.start()
+    generation_jobs.start()
+    if repo.available:
+        # Warm the catalog and build the search index before serving traffic
+        await catalog.all()
+    if COMPONENT_CACHE_LISTEN:
+        catalog.start_listener()
+    if repo.available and project_vectors.available:
+        project_vectors_load = asyncio.create_task(load_project_vectors())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    catalog.stop_listener()
+    if project_vectors_load is not None:
+        project_vectors_load.cancel()
+    # Commit buffered project writes before the process goes away
+    await project_writes.close()
+    await generation_jobs.close()
+    await generator.close()
+    await shared_state.close()
+    repo.shutdown()
 
 @app.get("/")
 async def root():
     return {"message": "Atal Idea Generator API", "version": "1.0.0"}
 
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters for the in-process caches"""
+    return {
+        "components": catalog.stats(),
+        "generation": generation_cache.stats(),
+        "shared_state": shared_state.stats(),
+        "project_writes": project_writes.stats(),
+        "related_components": catalog.related_index.stats(),
+        "similar_projects": project_vectors.stats(),
+        "user_stats": library_stats.stats(),
+    }
+
+@app.get("/api/limits/stats")
+async def get_limit_stats():
+    """Rate limiter, admission control and generation capacity counters for this worker"""
+    return {
+        "admission": admission.stats(),
+        "generation": generation_limiter.stats(),
+        "write": write_limiter.stats(),
+        "poll": poll_limiter.stats(),
+        "generator": generator.stats(),
+        "generation_jobs": generation_jobs.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Request, Firestore and generation metrics in Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str):
+    """Collapsed stacks sampled while serving a request sent with X-Profile"""
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile)
+
+async def list_components() -> List[Dict[str, Any]]:
+    """The full catalog, or the built-in components when Firebase is not available"""
+    if not repo.available:
+        return DEFAULT_COMPONENTS
+    return await catalog.all()
+
+async def catalog_etag() -> str:
+    """ETag for the catalog currently being served"""
+    if not repo.available:
+        return default_component_etag
+    return await catalog.etag()
+
+async def search_components(search: str, limit: Optional[int] = None, predicate=None) -> List[Dict[str, Any]]:
+    """Ranked search over the whole catalog"""
+    if not repo.available:
+        return default_component_index.search(search, limit=limit, predicate=predicate)
+    return await catalog.search(search, limit=limit, predicate=predicate)
+
+async def related_components(component_id: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+    """Nearest components by feature similarity, or None if the id is unknown"""
+    if not repo.available:
+        if component_id not in default_component_vectors:
+            return None
+        by_id = {component['id']: component for component in DEFAULT_COMPONENTS}
+        return [{**by_id[doc_id], 'score': score} for doc_id, score in default_component_vectors.similar(component_id, limit)]
+    related = await catalog.related(component_id, limit)
+    if related is None:
+        return None
+    return [{**component, 'score': score} for component, score in related]
+
 @app.get("/api/components", response_model=List[Component])
 async def get_components(
+    request: Request,
+    response: Response,
     category: Optional[str] = None,
     search: Optional[str] = None,
-    limit: Optional[int] = 100
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False
 ):
     """Get all components with optional filtering"""
     try:
-        if db is None:
-            # Return default components when Firebase is not available
-            components = DEFAULT_COMPONENTS.copy()
+        position = decode_cursor(cursor)
+        
+        predicate = None
+        if category and category.lower() != 'all':
+            predicate = lambda comp: comp['category'] == category
+        
+        # Streaming mode writes every match without paging
+        media_type = stream_media_type(request, stream)
+        if media_type:
+            if search:
+                components = await search_components(search, predicate=predicate)
+            else:
+                components = [comp for comp in await list_components() if not predicate or predicate(comp)]
+            return stream_documents(components, Component, media_type)
+        
+        # The body depends only on the catalog contents and the query string.
+        # Lists carry no Last-Modified: a deletion would not advance it.
+        etag = compute_etag([], salt=f"{await catalog_etag()}?{request.url.query}")
+        not_modified = conditional(request, response, etag, cache_control=CATALOG_CACHE_CONTROL)
+        if not_modified:
+            return not_modified
+        
+        # Rank search hits over the whole catalog before paging
+        if search:
+            depth = position.get('offset', 0) + limit + 1
+            hits = await search_components(search, limit=depth, predicate=predicate)
+            components, next_cursor = paginate_ranked(hits, position, limit)
         else:
-            components_ref = db.collection('components')
-            query = components_ref.limit(limit)
+            components = await list_components()
             
             # Apply category filter
-            if category and category.lower() != 'all':
-                query = query.where('category', '==', category)
+            if predicate:
+                components = [comp for comp in components if predicate(comp)]
             
-            docs = query.stream()
-            components = []
-            
-            for doc in docs:
-                data = doc.to_dict()
-                data['id'] = doc.id
-                components.append(data)
-        
-        # Apply search filter
-        if search:
-            search_term = search.lower()
-            filtered_components = []
-            for comp in components:
-                if (search_term in comp['name'].lower() or 
-                    search_term in comp['description'].lower() or 
-                    search_term in comp['category'].lower()):
-                    filtered_components.append(comp)
-            components = filtered_components
+            components, next_cursor = paginate_by_id(components, position, limit)
         
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         return components
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch components: {str(e)}")
 
-@app.post("/api/components", response_model=Component)
+@app.post("/api/components", response_model=Component, dependencies=[limit_writes])
 async def create_component(component: ComponentCreate):
     """Create a new component"""
     try:
@@ -323,161 +607,300 @@ async def create_component(component: ComponentCreate):
             'updated_at': datetime.now()
         })
         
-        db.collection('components').document(component_id).set(component_data)
+        await repo.set('components', component_id, component_data)
+        catalog.store(component_data)
         return component_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create component: {str(e)}")
 
+@app.post("/api/components/bulk", response_model=BulkResponse, dependencies=[limit_bulk_writes])
+async def bulk_components(request: ComponentBulkRequest):
+    """Create, update and delete many components in batched commits"""
+    try:
+        now = datetime.now()
+        creates = []
+        for component in request.create:
+            component_id = str(uuid.uuid4())
+            component_data = component.dict()
+            component_data.update({
+                'id': component_id,
+                'availability': 'Available',
+                'created_at': now,
+                'updated_at': now
+            })
+            creates.append((component_id, component_data))
+        updates = []
+        for component in request.update:
+            component_data = component.dict(exclude={'id'})
+            component_data['updated_at'] = now
+            updates.append((component.id, component_data))
+        
+        response, documents = await bulk_write('components', creates, updates, request.delete)
+        for component_id, data in documents.items():
+            if data is None:
+                catalog.evict(component_id)
+            else:
+                catalog.store({**data, 'id': component_id})
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to apply component batch: {str(e)}")
+
+@app.post("/api/components/batch-get", response_model=ComponentBatch)
+async def batch_get_components(request: BatchGetRequest):
+    """Get many components by ID"""
+    try:
+        found = await catalog.get_many(request.ids)
+        ids = list(dict.fromkeys(request.ids))
+        return {
+            "items": [found[component_id] for component_id in ids if component_id in found],
+            "missing": [component_id for component_id in ids if component_id not in found]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch components: {str(e)}")
+
+@app.get("/api/components/spec-keys")
+async def get_spec_keys():
+    """Known specification keys, common and per category"""
+    return {
+        "common": sorted(COMMON_SPEC_KEYS),
+        "categories": {category: sorted(keys) for category, keys in SPEC_KEYS_BY_CATEGORY.items()}
+    }
+
 @app.get("/api/components/{component_id}", response_model=Component)
-async def get_component(component_id: str):
+async def get_component(component_id: str, request: Request, response: Response):
     """Get a specific component by ID"""
     try:
-        doc = db.collection('components').document(component_id).get()
-        if not doc.exists:
+        data = await catalog.get(component_id)
+        if data is None:
             raise HTTPException(status_code=404, detail="Component not found")
         
-        data = doc.to_dict()
-        data['id'] = doc.id
+        not_modified = conditional(request, response, compute_etag([data]), last_modified([data]), CATALOG_CACHE_CONTROL)
+        if not_modified:
+            return not_modified
         return data
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"Failed to fetch component: {str(e)}")
 
-@app.put("/api/components/{component_id}", response_model=Component)
+@app.get("/api/components/{component_id}/related", response_model=List[RelatedComponent])
+async def get_related_components(component_id: str, limit: int = Query(10, ge=1, le=50)):
+    """Components most similar to this one by name, description and specifications"""
+    try:
+        if not catalog.related_index.available:
+            raise HTTPException(status_code=503, detail="Similarity search is not available")
+        related = await related_components(component_id, limit)
+        if related is None:
+            raise HTTPException(status_code=404, detail="Component not found")
+        return related
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Failed to fetch related components: {str(e)}")
+
+@app.put("/api/components/{component_id}", response_model=Component, dependencies=[limit_writes])
 async def update_component(component_id: str, component: ComponentCreate):
     """Update a component"""
     try:
-        doc_ref = db.collection('components').document(component_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="Component not found")
-        
         component_data = component.dict()
         component_data['updated_at'] = datetime.now()
         
-        doc_ref.update(component_data)
+        if not await repo.update('components', component_id, component_data):
+            raise HTTPException(status_code=404, detail="Component not found")
         
-        # Return updated component
-        updated_doc = doc_ref.get()
-        data = updated_doc.to_dict()
-        data['id'] = updated_doc.id
+        # Merge onto the cached copy instead of re-reading the document
+        existing = await catalog.get(component_id)
+        if existing is not None:
+            data = {**existing, **component_data}
+        else:
+            data = await repo.get('components', component_id)
+        catalog.store(data)
         return data
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"Failed to update component: {str(e)}")
 
-@app.delete("/api/components/{component_id}")
+@app.delete("/api/components/{component_id}", dependencies=[limit_writes])
 async def delete_component(component_id: str):
     """Delete a component"""
     try:
-        doc_ref = db.collection('components').document(component_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
+        if not await repo.delete('components', component_id):
             raise HTTPException(status_code=404, detail="Component not found")
         
-        doc_ref.delete()
+        catalog.evict(component_id)
         return {"message": "Component deleted successfully"}
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"Failed to delete component: {str(e)}")
 
-@app.post("/api/projects/generate", response_model=List[ProjectIdea])
+@app.post("/api/projects/generate", response_model=List[ProjectIdea], dependencies=[limit_generation])
 async def generate_project_ideas(request: GenerateProjectRequest):
     """Generate AI project ideas based on user preferences"""
     try:
-        # Mock AI generation for now - replace with actual AI service
-        await asyncio.sleep(0.5)  # Simulate API delay
-        
-        components = request.components or ["ESP32", "DHT22", "Servo Motor"]
-        categories = request.categories or ["IoT", "Automation", "Environmental"]
-        difficulty = request.skill or "beginner"
-        time = request.time or "2-5h"
-        
-        # Generate mock ideas
-        ideas = [
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Smart Home Air Quality Monitor",
-                "description": "Build a connected monitor that tracks temperature and humidity, displays status, and sends alerts when thresholds are exceeded.",
-                "difficulty": difficulty,
-                "estimatedTime": time,
-                "components": components + ["OLED Display"],
-                "category": categories[0] if categories else "IoT",
-                "instructions": [
-                    "Wire the sensor to the microcontroller and verify readings via serial monitor.",
-                    "Display live metrics on the OLED with color-coded thresholds.",
-                    "Push readings to a cloud endpoint and configure alert rules.",
-                    "Enclose the device and test in different rooms."
-                ],
-                "created_at": datetime.now()
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Automated Plant Watering System",
-                "description": "Create a soil-moisture-based watering setup that irrigates plants automatically and logs activity.",
-                "difficulty": difficulty,
-                "estimatedTime": time,
-                "components": components + ["Soil Moisture Sensor", "Relay Module", "Pump"],
-                "category": "Automation",
-                "instructions": [
-                    "Calibrate the moisture sensor to determine dry thresholds.",
-                    "Control a pump using a relay and implement safety delays.",
-                    "Log watering events and moisture trends for analysis.",
-                    "Add a manual override and status LED."
-                ],
-                "created_at": datetime.now()
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Obstacle-Avoiding Robot",
-                "description": "Assemble a simple robot that navigates autonomously by detecting obstacles and adjusting its path.",
-                "difficulty": difficulty,
-                "estimatedTime": time,
-                "components": components + ["Ultrasonic Sensor", "Motor Driver"],
-                "category": "Robotics",
-                "instructions": [
-                    "Mount motors and connect the driver to the controller.",
-                    "Integrate the ultrasonic sensor and read distance values.",
-                    "Implement basic avoidance logic with turn-and-forward behavior.",
-                    "Tune speed and sensitivity; test in a small course."
-                ],
-                "created_at": datetime.now()
-            }
-        ]
-        
-        return ideas
+        # Identical requests share one cached or in-flight generation
+        return await generation_cache.get_or_generate(
+            await generation_key(request),
+            lambda: generator.generate(request)
+        )
+    except GenerationOverloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    except GenerationTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate project ideas: {str(e)}")
+
+@app.post("/api/projects/generate/stream", dependencies=[limit_generation])
+async def stream_project_ideas(http_request: Request, request: GenerateProjectRequest, partial: bool = False):
+    """Stream each generated project idea as soon as it is complete"""
+    media_type = stream_media_type(http_request, stream=True)
+    key = await generation_key(request)
+    
+    cached = await generation_cache.get(key)
+    if cached is not None:
+        async def replay():
+            for idea in cached:
+                yield "idea", ProjectIdea.model_validate(idea).model_dump_json()
+        return stream_events(replay(), media_type)
+    
+    events = generator.stream(request)
+    started = time.monotonic()
+    try:
+        # Pull the first event before responding so overload surfaces as a status code
+        first = await events.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except GenerationOverloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    except GenerationTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate project ideas: {str(e)}")
+    
+    async def relay():
+        ideas = []
+        event = first
+        while event is not None:
+            kind, payload = event
+            if kind == "idea":
+                ideas.append(payload)
+                yield "idea", ProjectIdea.model_validate(payload).model_dump_json()
+            elif partial:
+                yield "partial", json.dumps({"partial": payload})
+            try:
+                event = await events.__anext__()
+            except StopAsyncIteration:
+                event = None
+        # Reached only when the stream ran to completion; an empty result would poison /generate too
+        if ideas:
+            generation_cache.put(key, ideas, time.monotonic() - started)
+    
+    return stream_events(relay(), media_type)
+
+@app.post("/api/projects/generate/jobs", response_model=GenerationJob, status_code=status.HTTP_202_ACCEPTED, dependencies=[limit_generation])
+async def submit_generation_job(request: GenerationJobRequest, response: Response):
+    """Queue project generation and return the job id without waiting for the ideas"""
+    try:
+        job = generation_jobs.submit(request, request.priority)
+    except GenerationOverloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many generation jobs queued, please retry shortly",
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    response.headers["Location"] = f"/api/projects/generate/jobs/{job['id']}"
+    return job
+
+@app.get("/api/projects/generate/jobs/{job_id}", response_model=GenerationJob, dependencies=[limit_polls])
+async def get_generation_job(request: Request, job_id: str, wait: float = Query(0, ge=0, le=GENERATION_JOB_MAX_WAIT)):
+    """Job status and, once it succeeded, its ideas; wait long-polls for up to that many seconds"""
+    # A parked long-poll does not count against admission control
+    with admission.park(request.scope):
+        job = await generation_jobs.status(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return job
+
+@app.delete("/api/projects/generate/jobs/{job_id}", response_model=GenerationJob)
+async def cancel_generation_job(job_id: str, response: Response):
+    """Cancel a queued or running generation job
+
+    200 once the job is cancelled; 202 if it has not stopped within
+    GENERATION_JOB_CANCEL_WAIT seconds and the cancel is still pending.
+    """
+    job = await generation_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    if job['status'] in ('succeeded', 'failed'):
+        raise HTTPException(status_code=409, detail=f"Generation job already {job['status']}")
+    if job['status'] not in JOB_FINISHED:
+        response.status_code = status.HTTP_202_ACCEPTED
+    return job
 
 @app.get("/api/projects", response_model=List[Project])
-async def get_projects(user_id: Optional[str] = None):
-    """Get all saved projects for a user"""
+async def get_projects(
+    request: Request,
+    response: Response,
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    category: Optional[str] = None,
+    tags: Optional[List[str]] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False
+):
+    """Get saved projects for a user, one page at a time"""
     try:
-        projects_ref = db.collection('projects')
+        position = decode_cursor(cursor)
+        filters = []
         
         if user_id:
-            query = projects_ref.where('user_id', '==', user_id)
-        else:
-            query = projects_ref
+            filters.append(('user_id', '==', user_id))
+        if status:
+            filters.append(('status', '==', status))
+        if difficulty:
+            filters.append(('difficulty', '==', difficulty))
+        if category:
+            filters.append(('category', '==', category))
+        if tags:
+            if len(tags) > 10:
+                raise HTTPException(status_code=400, detail="At most 10 tags can be filtered at once")
+            filters.append(('tags', 'array_contains_any', tags))
+        
+        # Read-your-writes: commit this user's buffered writes before querying
+        await project_writes.flush_owner(user_id)
         
-        docs = query.stream()
-        projects = []
+        # Streaming mode yields every match as it arrives from Firestore
+        media_type = stream_media_type(request, stream)
+        if media_type:
+            return stream_documents(repo.stream('projects', filters), Project, media_type)
         
-        for doc in docs:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            projects.append(data)
+        projects, last_id = await repo.page('projects', filters, limit=limit, start_after=position.get('after'))
         
+        not_modified = conditional(request, response, compute_etag(projects, salt=request.url.query))
+        if not_modified:
+            return not_modified
+        if last_id:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor({'after': last_id})
         return projects
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=f"Failed to fetch projects: {str(e)}")
 
-@app.post("/api/projects", response_model=Project)
+@app.post("/api/projects", response_model=Project, dependencies=[limit_writes])
 async def save_project(project: Project):
     """Save a new project"""
     try:
@@ -488,52 +911,114 @@ async def save_project(project: Project):
             'dateSaved': datetime.now().isoformat()
         })
         
-        db.collection('projects').document(project_id).set(project_data)
+        await project_writes.set(project_id, project_data)
+        project_vectors.add(project_data)
         return project_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save project: {str(e)}")
 
-@app.put("/api/projects/{project_id}", response_model=Project)
-async def update_project(project_id: str, project: Project):
-    """Update a project"""
+@app.post("/api/projects/bulk", response_model=BulkResponse, dependencies=[limit_bulk_writes])
+async def bulk_projects(request: ProjectBulkRequest):
+    """Save, update and delete many projects in batched commits"""
     try:
-        doc_ref = db.collection('projects').document(project_id)
-        doc = doc_ref.get()
+        now = datetime.now().isoformat()
+        creates = []
+        for project in request.create:
+            project_id = str(uuid.uuid4())
+            project_data = project.dict()
+            project_data.update({
+                'id': project_id,
+                'dateSaved': now
+            })
+            creates.append((project_id, project_data))
+        updates = [(project.id, project.dict(exclude={'id'})) for project in request.update if project.id]
         
-        if not doc.exists:
+        # Buffered writes to these projects must land before the batch, not after it
+        await project_writes.flush([project_id for project_id, _ in updates] + request.delete)
+        # Batches skip the per-write aggregate transaction; owners before and after are repaired below
+        previous = await repo.get_many('projects', [project_id for project_id, _ in updates] + request.delete)
+        response, documents = await bulk_write('projects', creates, updates, request.delete, existing=previous)
+        for project_id, data in documents.items():
+            if data is None:
+                project_vectors.remove(project_id)
+            else:
+                project_vectors.add({**data, 'id': project_id})
+        owners = {doc.get('user_id') for doc in [*previous.values(), *documents.values()] if doc and doc.get('user_id')}
+        await asyncio.gather(*(library_stats.repair(user_id) for user_id in owners))
+        
+        # Updates without an id cannot be applied
+        for project in request.update:
+            if not project.id:
+                response.results.append(BulkItemResult(op='update', status='error', detail='Missing project id'))
+                response.failed += 1
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to apply project batch: {str(e)}")
+
+@app.post("/api/projects/batch-get", response_model=ProjectBatch)
+async def batch_get_projects(request: BatchGetRequest):
+    """Get many projects by ID in one round trip"""
+    try:
+        await project_writes.flush(request.ids)
+        found = await repo.get_many('projects', request.ids)
+        ids = list(dict.fromkeys(request.ids))
+        return {
+            "items": [found[project_id] for project_id in ids if project_id in found],
+            "missing": [project_id for project_id in ids if project_id not in found]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch projects: {str(e)}")
+
+@app.get("/api/projects/{project_id}/similar", response_model=List[SimilarProject])
+async def get_similar_projects(project_id: str, limit: int = Query(10, ge=1, le=50)):
+    """Saved projects most similar to this one by title, tags and requirements"""
+    try:
+        if not project_vectors.available or not project_vectors.ready:
+            raise HTTPException(status_code=503, detail="Similarity search is not available yet")
+        if project_id not in project_vectors:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        project_data = project.dict()
-        doc_ref.update(project_data)
+        neighbours = project_vectors.similar(project_id, limit)
+        ids = [doc_id for doc_id, _ in neighbours]
+        await project_writes.flush(ids)
+        found = await repo.get_many('projects', ids)
+        return [{**found[doc_id], 'score': score} for doc_id, score in neighbours if doc_id in found]
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Failed to fetch similar projects: {str(e)}")
+
+@app.put("/api/projects/{project_id}", response_model=Project, dependencies=[limit_writes])
+async def update_project(project_id: str, project: Project):
+    """Update a project"""
+    try:
+        project_data = project.dict(exclude={'id'})
+        if not await project_writes.update(project_id, project_data):
+            raise HTTPException(status_code=404, detail="Project not found")
         
-        # Return updated project
-        updated_doc = doc_ref.get()
-        data = updated_doc.to_dict()
-        data['id'] = updated_doc.id
-        return data
+        # Every Project field was written, so the update is the new document
+        project_data['id'] = project_id
+        project_vectors.add(project_data)
+        return project_data
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"Failed to update project: {str(e)}")
 
-@app.delete("/api/projects/{project_id}")
+@app.delete("/api/projects/{project_id}", dependencies=[limit_writes])
 async def delete_project(project_id: str):
     """Delete a project"""
     try:
-        doc_ref = db.collection('projects').document(project_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
+        if not await project_writes.delete(project_id):
             raise HTTPException(status_code=404, detail="Project not found")
-        
-        doc_ref.delete()
+        project_vectors.remove(project_id)
         return {"message": "Project deleted successfully"}
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"Failed to delete project: {str(e)}")
 
-@app.post("/api/users", response_model=User)
+@app.post("/api/users", response_model=User, dependencies=[limit_writes])
 async def create_user(user: User):
     """Create a new user"""
     try:
@@ -544,21 +1029,74 @@ async def create_user(user: User):
             'created_at': datetime.now()
         })
         
-        db.collection('users').document(user_id).set(user_data)
+        await repo.set('users', user_id, user_data)
         return user_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create user: {str(e)}")
 
+@app.post("/api/users/bulk", response_model=BulkResponse, dependencies=[limit_bulk_writes])
+async def bulk_users(request: UserBulkRequest):
+    """Create many users in batched commits"""
+    try:
+        now = datetime.now()
+        creates = []
+        for user in request.create:
+            user_id = str(uuid.uuid4())
+            user_data = user.dict()
+            user_data.update({
+                'id': user_id,
+                'created_at': now
+            })
+            creates.append((user_id, user_data))
+        
+        response, _ = await bulk_write('users', creates)
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create users: {str(e)}")
+
+@app.post("/api/users/batch-get", response_model=UserBatch)
+async def batch_get_users(request: BatchGetRequest):
+    """Get many users by ID in one round trip"""
+    try:
+        found = await repo.get_many('users', request.ids)
+        ids = list(dict.fromkeys(request.ids))
+        return {
+            "items": [found[user_id] for user_id in ids if user_id in found],
+            "missing": [user_id for user_id in ids if user_id not in found]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch users: {str(e)}")
+
+@app.get("/api/users/{user_id}/stats", response_model=UserStats)
+async def get_user_stats(user_id: str):
+    """Project counts by status, difficulty, category and tag, and the most recent projects"""
+    try:
+        # Read-your-writes, as in get_projects
+        await project_writes.flush_owner(user_id)
+        return await library_stats.get(user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch user stats: {str(e)}")
+
+@app.post("/api/users/{user_id}/stats/rebuild", response_model=UserStats, dependencies=[limit_writes])
+async def rebuild_user_stats(user_id: str):
+    """Recompute a user's aggregates from their projects"""
+    try:
+        await project_writes.flush_owner(user_id)
+        return await library_stats.repair(user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild user stats: {str(e)}")
+
 @app.get("/api/users/{user_id}", response_model=User)
-async def get_user(user_id: str):
+async def get_user(user_id: str, request: Request, response: Response):
     """Get user by ID"""
     try:
-        doc = db.collection('users').document(user_id).get()
-        if not doc.exists:
+        data = await repo.get('users', user_id)
+        if data is None:
             raise HTTPException(status_code=404, detail="User not found")
         
-        data = doc.to_dict()
-        data['id'] = doc.id
+        not_modified = conditional(request, response, compute_etag([data]), last_modified([data]))
+        if not_modified:
+            return not_modified
         return data
     except Exception as e:
         if isinstance(e, HTTPException):
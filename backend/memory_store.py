@@ -0,0 +1,362 @@
+"""
+In-memory Firestore stand-in
+Implements the subset of the google-cloud-firestore client the repository uses
+(collections, documents, where/order_by/limit/start_after queries, batches,
+get_all, write options and snapshot listeners) with configurable injected
+latency, so the API can be run, load-tested and benchmarked offline.
+Select it with DATA_BACKEND=memory.
+"""
+
+import copy
+import enum
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from repository import DOCUMENT_ID, NotFound
+
+# Simulated round-trip latency in seconds, plus up to MEMORY_STORE_JITTER extra
+MEMORY_STORE_LATENCY = float(os.environ.get("MEMORY_STORE_LATENCY", "0"))
+MEMORY_STORE_JITTER = float(os.environ.get("MEMORY_STORE_JITTER", "0"))
+
+_MISSING = object()
+
+
+def _get_field(data: Dict[str, Any], path: str) -> Any:
+    value = data
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set_field(data: Dict[str, Any], path: str, value: Any) -> None:
+    *parents, leaf = path.split(".")
+    for part in parents:
+        data = data.setdefault(part, {})
+    data[leaf] = value
+
+
+def _matches(value: Any, op: str, operand: Any) -> bool:
+    if op == "array_contains":
+        return isinstance(value, list) and operand in value
+    if op == "array_contains_any":
+        return isinstance(value, list) and any(item in value for item in operand)
+    if op == "in":
+        return value is not _MISSING and value in operand
+    if op == "not-in":
+        return value is not _MISSING and value not in operand
+    if value is _MISSING:
+        return False
+    try:
+        if op == "==":
+            return value == operand
+        if op == "!=":
+            return value != operand
+        if op == "<":
+            return value < operand
+        if op == "<=":
+            return value <= operand
+        if op == ">":
+            return value > operand
+        if op == ">=":
+            return value >= operand
+    except TypeError:
+        # Firestore never matches across types
+        return False
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+class ChangeType(enum.Enum):
+    ADDED = 1
+    MODIFIED = 2
+    REMOVED = 3
+
+
+class DocumentSnapshot:
+    def __init__(self, reference: "DocumentReference", data: Optional[Dict[str, Any]], update_time: Optional[datetime] = None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self.update_time = update_time
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field: str) -> Any:
+        value = _get_field(self._data or {}, field)
+        return None if value is _MISSING else copy.deepcopy(value)
+
+
+class DocumentReference:
+    def __init__(self, collection: "CollectionReference", doc_id: str):
+        self.parent = collection
+        self.id = doc_id
+        self.path = f"{collection.id}/{doc_id}"
+
+    @property
+    def _store(self) -> "MemoryFirestore":
+        return self.parent.client
+
+    def get(self, **kwargs) -> DocumentSnapshot:
+        self._store.delay()
+        return self._store.snapshot(self)
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        self._store.delay()
+        self._store.apply([("set", self, data, merge)])
+
+    def update(self, data: Dict[str, Any]) -> None:
+        self._store.delay()
+        self._store.apply([("update", self, data, None)])
+
+    def delete(self, option: Any = None) -> None:
+        self._store.delay()
+        self._store.apply([("delete", self, None, option)])
+
+
+class Query:
+    def __init__(self, collection: "CollectionReference", filters=(), orders=(), limit=None, start_after=None):
+        self._collection = collection
+        self._filters: Tuple = tuple(filters)
+        self._orders: Tuple = tuple(orders)
+        self._limit: Optional[int] = limit
+        self._start_after: Optional[Dict[str, Any]] = start_after
+
+    def _copy(self, **changes) -> "Query":
+        state = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit": self._limit,
+            "start_after": self._start_after,
+        }
+        state.update(changes)
+        return Query(self._collection, **state)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value: Any = None, filter=None) -> "Query":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = "ASCENDING") -> "Query":
+        return self._copy(orders=self._orders + ((field_path, direction == "DESCENDING"),))
+
+    def limit(self, count: int) -> "Query":
+        return self._copy(limit=count)
+
+    def start_after(self, values: Dict[str, Any]) -> "Query":
+        return self._copy(start_after=dict(values))
+
+    def _ordering(self) -> Tuple:
+        # Firestore breaks ties on the document id
+        if any(field == DOCUMENT_ID for field, _ in self._orders):
+            return self._orders
+        return self._orders + ((DOCUMENT_ID, False),)
+
+    def _after_cursor(self, doc_id: str, data: Dict[str, Any]) -> bool:
+        for field, descending in self._ordering():
+            if field not in self._start_after:
+                continue
+            value = doc_id if field == DOCUMENT_ID else _get_field(data, field)
+            cursor = self._start_after[field]
+            if value == cursor:
+                continue
+            return (value < cursor) if descending else (value > cursor)
+        return False
+
+    def _results(self) -> List[Tuple[str, Dict[str, Any]]]:
+        docs = self._collection.client.documents(self._collection.id)
+        matched = [
+            (doc_id, data) for doc_id, data in docs.items()
+            if all(_matches(_get_field(data, field), op, value) for field, op, value in self._filters)
+        ]
+        # Ordering on a field also filters out documents that do not have it
+        for field, _ in self._orders:
+            if field != DOCUMENT_ID:
+                matched = [(doc_id, data) for doc_id, data in matched if _get_field(data, field) is not _MISSING]
+        for field, descending in reversed(self._ordering()):
+            matched.sort(
+                key=lambda item: item[0] if field == DOCUMENT_ID else _get_field(item[1], field),
+                reverse=descending,
+            )
+        if self._start_after is not None:
+            matched = [(doc_id, data) for doc_id, data in matched if self._after_cursor(doc_id, data)]
+        if self._limit is not None:
+            matched = matched[:self._limit]
+        return matched
+
+    def _snapshots(self) -> List[DocumentSnapshot]:
+        store = self._collection.client
+        with store.lock:
+            stamps = store.update_times.get(self._collection.id, {})
+            return [
+                DocumentSnapshot(self._collection.document(doc_id), copy.deepcopy(data), stamps.get(doc_id))
+                for doc_id, data in self._results()
+            ]
+
+    def stream(self, **kwargs) -> Iterator[DocumentSnapshot]:
+        self._collection.client.delay()
+        return iter(self._snapshots())
+
+    def get(self, **kwargs) -> List[DocumentSnapshot]:
+        return list(self.stream())
+
+
+class CollectionReference(Query):
+    def __init__(self, client: "MemoryFirestore", collection_id: str):
+        self.client = client
+        self.id = collection_id
+        super().__init__(self)
+
+    def document(self, document_id: Optional[str] = None) -> DocumentReference:
+        return DocumentReference(self, document_id or uuid.uuid4().hex[:20])
+
+    def on_snapshot(self, callback: Callable) -> "Watch":
+        return self.client.watch(self, callback)
+
+
+class WriteBatch:
+    def __init__(self, client: "MemoryFirestore"):
+        self._client = client
+        self._writes: List[Tuple] = []
+
+    def set(self, reference: DocumentReference, data: Dict[str, Any], merge: bool = False) -> None:
+        self._writes.append(("set", reference, data, merge))
+
+    def update(self, reference: DocumentReference, data: Dict[str, Any]) -> None:
+        self._writes.append(("update", reference, data, None))
+
+    def delete(self, reference: DocumentReference, option: Any = None) -> None:
+        self._writes.append(("delete", reference, None, option))
+
+    def commit(self) -> None:
+        self._client.delay()
+        self._client.apply(self._writes)
+        self._writes = []
+
+
+class Watch:
+    def __init__(self, client: "MemoryFirestore", collection: CollectionReference, callback: Callable):
+        self._client = client
+        self.collection = collection
+        self.callback = callback
+
+    def unsubscribe(self) -> None:
+        self._client.unwatch(self)
+
+
+class MemoryFirestore:
+    """Thread-safe in-process document store with the Firestore client surface"""
+
+    def __init__(self, latency: float = MEMORY_STORE_LATENCY, jitter: float = MEMORY_STORE_JITTER):
+        self.latency = latency
+        self.jitter = jitter
+        self.lock = threading.RLock()
+        self.round_trips = 0
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.update_times: Dict[str, Dict[str, datetime]] = {}
+        self._watches: List[Watch] = []
+
+    def delay(self) -> None:
+        """Account for one simulated round trip"""
+        self.round_trips += 1
+        latency = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if latency > 0:
+            time.sleep(latency)
+
+    def collection(self, name: str) -> CollectionReference:
+        return CollectionReference(self, name)
+
+    def documents(self, collection: str) -> Dict[str, Dict[str, Any]]:
+        return self._collections.setdefault(collection, {})
+
+    def snapshot(self, reference: DocumentReference) -> DocumentSnapshot:
+        with self.lock:
+            data = self.documents(reference.parent.id).get(reference.id)
+            update_time = self.update_times.get(reference.parent.id, {}).get(reference.id)
+            return DocumentSnapshot(reference, copy.deepcopy(data), update_time)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def get_all(self, references: List[DocumentReference], **kwargs) -> Iterator[DocumentSnapshot]:
+        self.delay()
+        return iter([self.snapshot(reference) for reference in references])
+
+    def write_option(self, exists: Optional[bool] = None, **kwargs) -> SimpleNamespace:
+        return SimpleNamespace(exists=exists)
+
+    def apply(self, writes: List[Tuple]) -> None:
+        """Apply writes atomically: preconditions are checked before anything changes"""
+        with self.lock:
+            for operation, reference, _, option in writes:
+                docs = self.documents(reference.parent.id)
+                if operation == "update" and reference.id not in docs:
+                    raise NotFound(f"No document to update: {reference.path}")
+                if operation == "delete" and getattr(option, "exists", None) and reference.id not in docs:
+                    raise NotFound(f"No document to delete: {reference.path}")
+
+            now = datetime.now(timezone.utc)
+            changes: Dict[str, List[SimpleNamespace]] = {}
+            for operation, reference, data, option in writes:
+                collection = reference.parent.id
+                docs = self.documents(collection)
+                stamps = self.update_times.setdefault(collection, {})
+                existed = reference.id in docs
+                if operation == "delete":
+                    if not existed:
+                        continue
+                    removed = docs.pop(reference.id)
+                    stamps.pop(reference.id, None)
+                    change_type, snapshot_data = ChangeType.REMOVED, removed
+                else:
+                    if operation == "set" and not option:
+                        docs[reference.id] = copy.deepcopy(data)
+                    else:
+                        target = docs.setdefault(reference.id, {})
+                        for field, value in data.items():
+                            if operation == "update":
+                                _set_field(target, field, copy.deepcopy(value))
+                            else:
+                                target[field] = copy.deepcopy(value)
+                    stamps[reference.id] = now
+                    change_type = ChangeType.MODIFIED if existed else ChangeType.ADDED
+                    snapshot_data = docs[reference.id]
+                changes.setdefault(collection, []).append(SimpleNamespace(
+                    type=change_type,
+                    document=DocumentSnapshot(reference, copy.deepcopy(snapshot_data), now),
+                ))
+            watches = [watch for watch in self._watches if watch.collection.id in changes]
+
+        for watch in watches:
+            self._notify(watch, changes[watch.collection.id])
+
+    def _notify(self, watch: Watch, changes: List[SimpleNamespace]) -> None:
+        watch.callback(watch.collection._snapshots(), changes, datetime.now(timezone.utc))
+
+    def watch(self, collection: CollectionReference, callback: Callable) -> Watch:
+        watch = Watch(self, collection, callback)
+        with self.lock:
+            self._watches.append(watch)
+        # Like Firestore, the first snapshot carries every document as ADDED
+        docs = collection._snapshots()
+        callback(docs, [SimpleNamespace(type=ChangeType.ADDED, document=doc) for doc in docs], datetime.now(timezone.utc))
+        return watch
+
+    def unwatch(self, watch: Watch) -> None:
+        with self.lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def reset(self) -> None:
+        """Drop every collection"""
+        with self.lock:
+            self._collections.clear()
+            self.update_times.clear()
@@ -0,0 +1,279 @@
+"""
+Request metrics and hot-path instrumentation
+Counters, gauges and histograms are kept in process and rendered in the
+Prometheus text format at /metrics. A sampling profiler can be attached to a
+single request with the X-Profile header when PROFILING_ENABLED=1.
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as TallyCounter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+PROFILE_HEADER = "x-profile"
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.005"))
+PROFILES_KEPT = 20
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, labels)} {value}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labels, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.labels, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status", ("method", "route", "status")))
+http_errors = registry.register(Counter(
+    "http_request_errors_total", "HTTP requests that failed with a 5xx or an exception", ("method", "route")))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"))
+http_request_size = registry.register(Histogram(
+    "http_request_size_bytes", "HTTP request body size", ("method", "route"), SIZE_BUCKETS))
+http_response_size = registry.register(Histogram(
+    "http_response_size_bytes", "HTTP response body size", ("method", "route"), SIZE_BUCKETS))
+firestore_calls = registry.register(Counter(
+    "firestore_calls_total", "Firestore calls by operation and outcome", ("operation", "outcome")))
+firestore_latency = registry.register(Histogram(
+    "firestore_call_duration_seconds", "Firestore call latency", ("operation",)))
+generation_calls = registry.register(Counter(
+    "generation_requests_total", "Project generation calls by provider and outcome", ("provider", "outcome")))
+generation_latency = registry.register(Histogram(
+    "generation_duration_seconds", "Project generation latency", ("provider",)))
+
+generation_jobs = registry.register(Counter(
+    "generation_jobs_total", "Generation jobs by final status", ("status",)))
+generation_job_wait = registry.register(Histogram(
+    "generation_job_wait_seconds", "Time generation jobs spent queued before a worker took them"))
+generation_jobs_queued = registry.register(Gauge(
+    "generation_jobs_queued", "Generation jobs waiting for a worker"))
+generation_job_workers_busy = registry.register(Gauge(
+    "generation_job_workers_busy", "Generation job workers currently running a job"))
+
+
+def observe_firestore(operation: str, seconds: float, ok: bool) -> None:
+    firestore_calls.inc(operation, "ok" if ok else "error")
+    firestore_latency.observe(seconds, operation)
+
+
+def observe_generation(provider: str, seconds: float, outcome: str) -> None:
+    generation_calls.inc(provider, outcome)
+    generation_latency.observe(seconds, provider)
+
+
+def observe_generation_job(status: str, previous: Optional[str], seconds: float) -> None:
+    for gauge, state in ((generation_jobs_queued, "queued"), (generation_job_workers_busy, "running")):
+        if previous == state:
+            gauge.dec()
+        if status == state:
+            gauge.inc()
+    if status == "running":
+        generation_job_wait.observe(seconds)
+    elif status != "queued":
+        generation_jobs.inc(status)
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval and tallies collapsed stacks"""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: TallyCounter = TallyCounter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Stop sampling and return collapsed stacks, one `stack count` per line"""
+        self._stop.set()
+        self._thread.join()
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+
+# Most recent request profiles, by id
+profiles: "OrderedDict[str, str]" = OrderedDict()
+
+
+def _route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Record latency, status, sizes and in-flight count for every HTTP request"""
+
+    def __init__(self, app: ASGIApp, profiling: bool = PROFILING_ENABLED):
+        self.app = app
+        self.profiling = profiling
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        try:
+            request_size = max(0, int(headers.get("content-length") or 0))
+        except ValueError:
+            # A malformed length is the application's to reject, not a reason to fail here
+            request_size = 0
+        status = 500
+        response_size = 0
+        profiler: Optional[SamplingProfiler] = None
+        profile_id = None
+        if self.profiling and headers.get(PROFILE_HEADER):
+            profiler = SamplingProfiler(threading.get_ident())
+            profile_id = uuid.uuid4().hex
+            profiler.start()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, response_size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile_id:
+                    MutableHeaders(raw=message["headers"])["X-Profile-Id"] = profile_id
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            method, route = scope["method"], _route_template(scope)
+            http_requests.inc(method, route, str(status))
+            http_latency.observe(elapsed, method, route)
+            http_request_size.observe(request_size, method, route)
+            http_response_size.observe(response_size, method, route)
+            if status >= 500:
+                http_errors.inc(method, route)
+            if profiler is not None:
+                profiles[profile_id] = profiler.stop()
+                while len(profiles) > PROFILES_KEPT:
+                    profiles.popitem(last=False)
@@ -0,0 +1,67 @@
+"""
+Opaque cursor tokens and page-size limits for list endpoints
+The next-page cursor is returned in the X-Next-Cursor response header so list
+bodies keep their existing shape.
+"""
+
+import base64
+import bisect
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor this server did not issue"""
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    raw = json.dumps(position, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> Dict[str, Any]:
+    """Position from a cursor token; fields are type-checked so routes can use them directly"""
+    if not token:
+        return {}
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if not isinstance(position, dict):
+        raise InvalidCursor("Malformed cursor")
+    offset = position.get('offset', 0)
+    # bool is an int subclass, but never a valid offset
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        raise InvalidCursor("Malformed cursor")
+    if 'after' in position and not isinstance(position['after'], str):
+        raise InvalidCursor("Malformed cursor")
+    return position
+
+
+def paginate_by_id(items: List[Dict[str, Any]], cursor: Dict[str, Any], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Keyset pagination over in-memory documents ordered by id"""
+    ordered = sorted(items, key=lambda item: item['id'])
+    start = 0
+    after = cursor.get('after')
+    if after is not None:
+        start = bisect.bisect_right([item['id'] for item in ordered], after)
+    page = ordered[start:start + limit]
+    next_cursor = None
+    if start + limit < len(ordered):
+        next_cursor = encode_cursor({'after': page[-1]['id']})
+    return page, next_cursor
+
+
+def paginate_ranked(items: List[Dict[str, Any]], cursor: Dict[str, Any], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Offset pagination over an already ranked result list"""
+    offset = cursor.get('offset', 0)
+    page = items[offset:offset + limit]
+    next_cursor = None
+    if offset + limit < len(items):
+        next_cursor = encode_cursor({'offset': offset + limit})
+    return page, next_cursor
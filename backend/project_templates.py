@@ -0,0 +1,451 @@
+"""
+Project templates and the component compatibility index
+Each template lists required and optional part slots. A slot accepts specific
+component ids and/or whole catalog categories. The index gives every catalog
+component a bit, precomputes one bitmask per slot, and ranks templates for a
+request by intersecting those masks with the user's owned components, then
+adjusting for skill and time budget. No model call is involved, so results are
+instant and deterministic.
+
+With numpy, coverage for every template is one bincount over the matched slots;
+without it the same scores come from a loop over those slots.
+"""
+
+import bisect
+import heapq
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # ranking falls back to the pure-Python loop
+    np = None
+
+SKILL_LEVELS = ("beginner", "intermediate", "advanced")
+TIME_BUDGETS = ("lt-2h", "2-5h", "5-10h", "10h-plus")
+
+REQUIRED_WEIGHT = 3.0
+OPTIONAL_WEIGHT = 1.0
+CATEGORY_BONUS = 1.0
+SKILL_PENALTY = 1.5
+TIME_PENALTY = 1.0
+
+
+def slot(label: str, *component_ids: str, categories: Sequence[str] = ()) -> Dict[str, Any]:
+    return {"label": label, "ids": list(component_ids), "categories": list(categories)}
+
+
+MICROCONTROLLER = slot("Microcontroller", categories=["Microcontrollers"])
+WIFI_BOARD = slot("Wi-Fi microcontroller", "esp32", "esp8266", "raspberry-pi", "raspberry-pi-pico-w")
+TEMPERATURE_SENSOR = slot("Temperature sensor", "dht22", "dht11", "ds18b20", "bme280")
+DISTANCE_SENSOR = slot("Distance sensor", "hc-sr04", "vl53l0x")
+DISPLAY = slot("Display", "oled-ssd1306", "lcd-16x2", categories=["Displays"])
+MOTOR_DRIVER = slot("Motor driver", "l298n", "tb6612fng")
+
+TEMPLATES: List[Dict[str, Any]] = [
+    {
+        "id": "weather-station",
+        "title": "Connected Weather Station",
+        "description": "Log temperature and humidity to the cloud and chart the readings over days.",
+        "category": "IoT",
+        "difficulty": "beginner",
+        "time": "2-5h",
+        "required": [WIFI_BOARD, TEMPERATURE_SENSOR],
+        "optional": [DISPLAY, slot("Pressure sensor", "bme280", "bmp180")],
+        "instructions": [
+            "Wire the sensor to the board and print readings over serial.",
+            "Connect to Wi-Fi and post readings to a cloud dashboard every minute.",
+            "Show the latest values on a display, if you have one.",
+            "Place the station outdoors in a ventilated enclosure.",
+        ],
+    },
+    {
+        "id": "air-quality-monitor",
+        "title": "Smart Home Air Quality Monitor",
+        "description": "Track temperature, humidity and air quality, and alert when thresholds are exceeded.",
+        "category": "Environmental",
+        "difficulty": "intermediate",
+        "time": "5-10h",
+        "required": [WIFI_BOARD, TEMPERATURE_SENSOR, slot("Gas sensor", "mq135", "ccs811", "sgp30")],
+        "optional": [DISPLAY, slot("Buzzer", "buzzer")],
+        "instructions": [
+            "Calibrate the gas sensor in clean air.",
+            "Read all sensors on a fixed interval and smooth the values.",
+            "Display status with color-coded thresholds.",
+            "Send alerts when air quality degrades.",
+        ],
+    },
+    {
+        "id": "plant-watering",
+        "title": "Automated Plant Watering System",
+        "description": "Water plants automatically when the soil dries out and log every watering.",
+        "category": "Automation",
+        "difficulty": "beginner",
+        "time": "2-5h",
+        "required": [MICROCONTROLLER, slot("Soil moisture sensor", "soil-moisture-sensor", "capacitive-soil-sensor"), slot("Relay or pump driver", "relay-module", "mosfet-module")],
+        "optional": [slot("Water pump", "water-pump"), TEMPERATURE_SENSOR],
+        "instructions": [
+            "Calibrate the moisture sensor for dry and wet soil.",
+            "Switch the pump through the relay with a safety timeout.",
+            "Log watering events and moisture trends.",
+            "Add a manual override button and status LED.",
+        ],
+    },
+    {
+        "id": "obstacle-robot",
+        "title": "Obstacle-Avoiding Robot",
+        "description": "A small rover that navigates on its own by detecting obstacles and turning away.",
+        "category": "Robotics",
+        "difficulty": "intermediate",
+        "time": "5-10h",
+        "required": [MICROCONTROLLER, DISTANCE_SENSOR, MOTOR_DRIVER, slot("DC motors", "dc-motor", "gear-motor")],
+        "optional": [slot("Servo", "sg90-servo", "servo-motor")],
+        "instructions": [
+            "Mount the motors and connect them through the driver.",
+            "Read distances and print them to verify the sensor.",
+            "Implement turn-and-forward avoidance logic.",
+            "Tune speed and thresholds on a small course.",
+        ],
+    },
+    {
+        "id": "parking-sensor",
+        "title": "Garage Parking Assistant",
+        "description": "Measure the distance to a parked car and signal when to stop.",
+        "category": "Home",
+        "difficulty": "beginner",
+        "time": "lt-2h",
+        "required": [MICROCONTROLLER, DISTANCE_SENSOR],
+        "optional": [slot("LEDs", "led", "rgb-led", "ws2812b"), slot("Buzzer", "buzzer")],
+        "instructions": [
+            "Mount the distance sensor facing the car.",
+            "Map distance ranges to green, yellow and red.",
+            "Beep faster as the car gets closer.",
+        ],
+    },
+    {
+        "id": "smart-thermostat",
+        "title": "Smart Thermostat",
+        "description": "Control a heater or fan from temperature readings with a schedule and a phone dashboard.",
+        "category": "Home",
+        "difficulty": "advanced",
+        "time": "10h-plus",
+        "required": [WIFI_BOARD, TEMPERATURE_SENSOR, slot("Relay", "relay-module")],
+        "optional": [DISPLAY, slot("Rotary encoder", "rotary-encoder")],
+        "instructions": [
+            "Read the temperature and implement hysteresis control.",
+            "Switch the load through the relay with minimum on/off times.",
+            "Serve a small web dashboard for schedules.",
+            "Add a local display and encoder for manual changes.",
+        ],
+    },
+    {
+        "id": "step-counter",
+        "title": "Wearable Step Counter",
+        "description": "Count steps with an accelerometer and show daily totals on a tiny display.",
+        "category": "Wearables",
+        "difficulty": "intermediate",
+        "time": "5-10h",
+        "required": [MICROCONTROLLER, slot("Accelerometer", "mpu6050", "adxl345")],
+        "optional": [DISPLAY, slot("Battery", "lipo-battery")],
+        "instructions": [
+            "Sample the accelerometer and compute the magnitude.",
+            "Detect steps with a peak detector and debounce.",
+            "Display daily totals and reset at midnight.",
+        ],
+    },
+    {
+        "id": "solar-logger",
+        "title": "Solar Panel Energy Logger",
+        "description": "Measure the voltage and current from a small solar panel and chart the energy harvested.",
+        "category": "Energy",
+        "difficulty": "intermediate",
+        "time": "5-10h",
+        "required": [MICROCONTROLLER, slot("Current sensor", "ina219", "acs712"), slot("Solar panel", "solar-panel")],
+        "optional": [WIFI_BOARD, DISPLAY],
+        "instructions": [
+            "Wire the current sensor in series with the panel load.",
+            "Sample voltage and current and integrate energy.",
+            "Log or upload the daily energy curve.",
+        ],
+    },
+    {
+        "id": "gesture-classifier",
+        "title": "Gesture Recognition Wand",
+        "description": "Train a tiny model to recognize motion gestures from an IMU and trigger actions.",
+        "category": "AI/ML",
+        "difficulty": "advanced",
+        "time": "10h-plus",
+        "required": [slot("ML-capable board", "esp32", "arduino-nano-33-ble", "raspberry-pi"), slot("Accelerometer", "mpu6050", "adxl345")],
+        "optional": [slot("LEDs", "led", "rgb-led", "ws2812b")],
+        "instructions": [
+            "Record labeled motion samples for each gesture.",
+            "Train a small classifier and export it for the board.",
+            "Run inference on-device and map gestures to actions.",
+        ],
+    },
+    {
+        "id": "intruder-alarm",
+        "title": "Motion-Triggered Intruder Alarm",
+        "description": "Detect motion in a room and sound an alarm or send a phone notification.",
+        "category": "Home",
+        "difficulty": "beginner",
+        "time": "lt-2h",
+        "required": [MICROCONTROLLER, slot("Motion sensor", "pir-sensor", "hc-sr501")],
+        "optional": [slot("Buzzer", "buzzer"), WIFI_BOARD],
+        "instructions": [
+            "Wire the motion sensor and read its output pin.",
+            "Arm and disarm with a button; sound the buzzer on motion.",
+            "Send a notification over Wi-Fi if available.",
+        ],
+    },
+    {
+        "id": "temperature-display",
+        "title": "Desk Temperature Display",
+        "description": "Show the room temperature and humidity on a small screen.",
+        "category": "Environmental",
+        "difficulty": "beginner",
+        "time": "lt-2h",
+        "required": [MICROCONTROLLER, TEMPERATURE_SENSOR],
+        "optional": [DISPLAY],
+        "instructions": [
+            "Read the sensor and print values over serial.",
+            "Render the values on the display with units.",
+            "Add min/max tracking since power-on.",
+        ],
+    },
+    {
+        "id": "robot-arm",
+        "title": "Servo Robot Arm",
+        "description": "Build a three-joint arm driven by servos and control it with potentiometers.",
+        "category": "Robotics",
+        "difficulty": "advanced",
+        "time": "10h-plus",
+        "required": [MICROCONTROLLER, slot("Servos", "sg90-servo", "mg996r-servo", "servo-motor"), slot("Potentiometers", "potentiometer")],
+        "optional": [slot("Servo driver", "pca9685")],
+        "instructions": [
+            "Assemble the arm and center every servo.",
+            "Map each potentiometer to one joint angle.",
+            "Record and replay movement sequences.",
+        ],
+    },
+]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.replace("-", " ").replace("_", " ").split()).casefold()
+
+
+def _level(values: Sequence[str], value: Optional[str]) -> Optional[int]:
+    try:
+        return values.index((value or "").strip().lower())
+    except ValueError:
+        return None
+
+
+def _each_bit(mask: int) -> Iterable[int]:
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
+
+
+class CompatibilityIndex:
+    """Bitset index from catalog components to the template slots they can fill"""
+
+    def __init__(self, templates: Iterable[Dict[str, Any]] = TEMPLATES):
+        self.templates = list(templates)
+        self.version: Optional[str] = None
+        self._bits: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+        self._aliases: Dict[str, str] = {}
+        self._sorted_names: List[Tuple[str, str]] = []
+        # Per slot: (template position, score weight, required, mask)
+        self._slots: List[Tuple[int, float, bool, int]] = []
+        # The same template positions and weights as flat lists, for the ranking loop
+        self._slot_templates: List[int] = []
+        self._slot_weights: List[float] = []
+        # Per template: its [start, end) range in _slots
+        self._ranges: List[Tuple[int, int]] = []
+        # Component bit -> slots it can fill
+        self._postings: Dict[int, List[int]] = {}
+        # numpy copies of the slot columns and postings, when numpy is installed
+        self._slot_template_array = None
+        self._slot_weight_array = None
+        self._posting_arrays: Dict[int, Any] = {}
+        # Distinct (casefolded category, skill level, time level) combinations, and each template's index into them
+        self._trait_keys: List[Tuple[str, int, int]] = []
+        self._traits: List[int] = []
+        positions: Dict[Tuple[str, int, int], int] = {}
+        for template in self.templates:
+            trait = (template['category'].casefold(), _level(SKILL_LEVELS, template['difficulty']) or 0,
+                     _level(TIME_BUDGETS, template['time']) or 0)
+            if trait not in positions:
+                positions[trait] = len(self._trait_keys)
+                self._trait_keys.append(trait)
+            self._traits.append(positions[trait])
+        self._trait_array = np.array(self._traits, dtype=np.intp) if np is not None else None
+        self.rebuild([])
+
+    def rebuild(self, components: Iterable[Dict[str, Any]], version: Optional[str] = None) -> None:
+        """Assign component bits and precompute slot masks for a catalog snapshot"""
+        components = sorted(components, key=lambda component: component['id'])
+        bits: Dict[str, int] = {}
+        by_category: Dict[str, int] = {}
+        names: Dict[int, str] = {}
+        aliases: Dict[str, str] = {}
+        for position, component in enumerate(components):
+            component_id = component['id']
+            bit = 1 << position
+            bits[component_id] = bit
+            category = component.get('category', '')
+            by_category[category] = by_category.get(category, 0) | bit
+            name = component.get('name') or component_id
+            names[bit] = name
+            aliases[_normalize(component_id)] = component_id
+            aliases[_normalize(name)] = component_id
+            # Model numbers such as "DHT22" or "ESP32" are how people usually name parts
+            first = _normalize(name).split(" ")[0]
+            if any(char.isdigit() for char in first):
+                aliases.setdefault(first, component_id)
+
+        def slot_mask(spec: Dict[str, Any]) -> int:
+            mask = 0
+            for component_id in spec['ids']:
+                mask |= bits.get(component_id, 0)
+            for category in spec['categories']:
+                mask |= by_category.get(category, 0)
+            return mask
+
+        slots = []
+        ranges = []
+        postings: Dict[int, List[int]] = {}
+        for position, template in enumerate(self.templates):
+            start = len(slots)
+            optional = template.get('optional', [])
+            kinds = [(spec, REQUIRED_WEIGHT / len(template['required']), True) for spec in template['required']]
+            kinds += [(spec, OPTIONAL_WEIGHT / len(optional), False) for spec in optional]
+            for spec, weight, required in kinds:
+                mask = slot_mask(spec)
+                for bit in _each_bit(mask):
+                    postings.setdefault(bit, []).append(len(slots))
+                slots.append((position, weight, required, mask))
+            ranges.append((start, len(slots)))
+
+        self._bits, self._names, self._aliases = bits, names, aliases
+        self._sorted_names = sorted((_normalize(names[bit]), component_id) for component_id, bit in bits.items())
+        self._slots, self._ranges, self._postings = slots, ranges, postings
+        self._slot_templates = [slot[0] for slot in slots]
+        self._slot_weights = [slot[1] for slot in slots]
+        if np is not None:
+            self._slot_template_array = np.array(self._slot_templates, dtype=np.intp)
+            self._slot_weight_array = np.array(self._slot_weights, dtype=np.float64)
+            self._posting_arrays = {bit: np.array(positions, dtype=np.intp) for bit, positions in postings.items()}
+        self.version = version
+
+    def resolve(self, owned: Iterable[str]) -> Tuple[int, List[str]]:
+        """Bitmask of the owned parts found in the catalog, plus the names that were not"""
+        mask = 0
+        unknown = []
+        for name in owned:
+            key = _normalize(name)
+            component_id = self._aliases.get(key)
+            if component_id is None and key:
+                # "Arduino Uno" matches "Arduino Uno R3"
+                position = bisect.bisect_left(self._sorted_names, (key,))
+                if position < len(self._sorted_names) and self._sorted_names[position][0].startswith(key + " "):
+                    component_id = self._sorted_names[position][1]
+            if component_id is None:
+                unknown.append(name)
+            else:
+                mask |= self._bits[component_id]
+        return mask, unknown
+
+    def rank(self, owned: Iterable[str], skill: Optional[str] = None, time: Optional[str] = None,
+             categories: Iterable[str] = (), limit: int = 3) -> List[Dict[str, Any]]:
+        """Best-matching templates for the owned parts, as idea dicts"""
+        owned_mask, _ = self.resolve(owned)
+        skill_level = _level(SKILL_LEVELS, skill)
+        time_level = _level(TIME_BUDGETS, time)
+        wanted = {category.casefold() for category in categories}
+
+        # Preference adjustments depend only on a template's traits, of which there are few
+        adjustments = []
+        for category, template_skill, template_time in self._trait_keys:
+            adjustment = CATEGORY_BONUS if category in wanted else 0.0
+            if skill_level is not None and template_skill > skill_level:
+                adjustment -= SKILL_PENALTY * (template_skill - skill_level)
+            if time_level is not None and template_time > time_level:
+                adjustment -= TIME_PENALTY * (template_time - time_level)
+            adjustments.append(adjustment)
+
+        if limit <= 0:
+            return []
+        top = self._top_vectorized if np is not None else self._top
+        return [self._idea(position, owned_mask, score) for score, position in top(owned_mask, adjustments, limit)]
+
+    def _top(self, owned_mask: int, adjustments: List[float], limit: int) -> List[Tuple[float, int]]:
+        """(score, template position) of the best templates, best first"""
+        # Coverage only touches slots an owned part can fill, not every template
+        matched = set()
+        for bit in _each_bit(owned_mask):
+            matched.update(self._postings.get(bit, ()))
+        slot_templates, slot_weights = self._slot_templates, self._slot_weights
+        scores: Dict[int, float] = {}
+        get = scores.get
+        for slot_position in matched:
+            position = slot_templates[slot_position]
+            scores[position] = get(position, 0.0) + slot_weights[slot_position]
+        if not scores:
+            # Nothing owned is in the catalog; rank every template on preferences alone
+            scores = dict.fromkeys(range(len(self.templates)), 0.0)
+
+        traits = self._traits
+        # Plain tuples compare in C; -position breaks ties toward the earlier template, so results are deterministic
+        ranked = [(score + adjustments[traits[position]], -position) for position, score in scores.items()]
+        return [(score, -negated) for score, negated in heapq.nlargest(limit, ranked)]
+
+    def _top_vectorized(self, owned_mask: int, adjustments: List[float], limit: int) -> List[Tuple[float, int]]:
+        """_top over numpy arrays: one bincount for coverage, one partition for the top `limit`"""
+        postings = [self._posting_arrays[bit] for bit in _each_bit(owned_mask) if bit in self._posting_arrays]
+        adjusted = np.asarray(adjustments, dtype=np.float64)[self._trait_array]
+        if postings:
+            # A slot two owned parts can fill still counts once
+            slots = np.unique(np.concatenate(postings))
+            coverage = np.bincount(self._slot_template_array[slots], weights=self._slot_weight_array[slots],
+                                   minlength=len(self.templates))
+            # Slot weights are positive, so covered templates are exactly the non-zero ones
+            candidates = np.flatnonzero(coverage)
+            scores = coverage[candidates] + adjusted[candidates]
+        else:
+            # Nothing owned is in the catalog; rank every template on preferences alone
+            candidates = np.arange(len(self.templates))
+            scores = adjusted
+        if len(candidates) > limit:
+            # Keep everything tied with the limit-th score so the tie-break below sees all of them
+            keep = scores >= np.partition(scores, -limit)[-limit]
+            candidates, scores = candidates[keep], scores[keep]
+        # Highest score first; ties go to the earlier template, so results are deterministic
+        order = np.lexsort((candidates, -scores))[:limit]
+        return [(float(scores[i]), int(candidates[i])) for i in order]
+
+    def _idea(self, position: int, owned_mask: int, score: float) -> Dict[str, Any]:
+        template = self.templates[position]
+        start, end = self._ranges[position]
+        used = 0
+        missing = []
+        for spec, (_, _, required, mask) in zip(template['required'] + template.get('optional', []), self._slots[start:end]):
+            if mask & owned_mask:
+                used |= mask & owned_mask
+            elif required:
+                missing.append(spec['label'])
+        return {
+            "title": template['title'],
+            "description": template['description'],
+            "difficulty": template['difficulty'],
+            "estimatedTime": template['time'],
+            "category": template['category'],
+            "components": [self._names[bit] for bit in _each_bit(used)] + missing,
+            "instructions": list(template['instructions']),
+            "template_id": template['id'],
+            "score": round(score, 3),
+            "missing": missing,
+        }
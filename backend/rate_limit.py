@@ -0,0 +1,276 @@
+"""
+Rate limiting and admission control
+Per-client token buckets with separate budgets for project generation and for
+writes, plus a global admission gate that sheds load with 429 + Retry-After
+once too many requests are in flight or latency climbs past a limit.
+Clients are keyed by address plus bearer token, so users behind one NAT or
+proxy get their own buckets; an address-wide bucket, RATE_LIMIT_ADDRESS_FACTOR
+times larger, caps what minting fresh tokens can buy. With a shared-state backend every worker
+announces what it spends, so a client's budget is shared across workers rather
+than multiplied by their number; admission control stays per process, since it
+protects the process itself.
+"""
+
+import hashlib
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from shared_state import SharedState
+
+# Sustained requests per second per client, and how many may burst above that
+GENERATION_RATE = float(os.environ.get("GENERATION_RATE", "0.2"))
+GENERATION_BURST = float(os.environ.get("GENERATION_BURST", "5"))
+CRUD_RATE = float(os.environ.get("CRUD_RATE", "10"))
+CRUD_BURST = float(os.environ.get("CRUD_BURST", "50"))
+# Job status polls are cheap, but each long-poll may stay open for a while
+POLL_RATE = float(os.environ.get("POLL_RATE", "2"))
+POLL_BURST = float(os.environ.get("POLL_BURST", "20"))
+RATE_LIMIT_MAX_CLIENTS = int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", "100000"))
+# Budget of one address across all its tokens, as a multiple of the per-client budget
+RATE_LIMIT_ADDRESS_FACTOR = float(os.environ.get("RATE_LIMIT_ADDRESS_FACTOR", "20"))
+
+# Global admission limits; latency is an exponentially weighted moving average
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", "512"))
+ADMISSION_MAX_LATENCY = float(os.environ.get("ADMISSION_MAX_LATENCY", "2.0"))
+ADMISSION_RETRY_AFTER = 1
+LATENCY_SMOOTHING = 0.1
+
+# Shared-state channel prefix for tokens spent by other workers
+RATE_LIMIT_CHANNEL = "rate-limit:"
+
+# Never shed these, so the service stays observable while overloaded
+ADMISSION_EXEMPT_PATHS = ("/metrics",)
+# Slow by nature and bounded by the generation service itself; kept out of the latency average
+ADMISSION_LATENCY_EXCLUDED = ("/api/projects/generate",)
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated_at", "scale")
+
+    def __init__(self, tokens: float, now: float, scale: float = 1.0):
+        self.tokens = tokens
+        self.updated_at = now
+        # Multiple of the limiter's rate and burst this bucket gets
+        self.scale = scale
+
+
+class RateLimiter:
+    """Token bucket per client key; the least recently seen keys are dropped past max_keys"""
+
+    def __init__(self, name: str, rate: float, burst: float, max_keys: int = RATE_LIMIT_MAX_CLIENTS):
+        self.name = name
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_keys = max_keys
+        self.allowed = 0
+        self.limited = 0
+        self.remote_spent = 0.0
+        self.shared: Optional[SharedState] = None
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _bucket(self, key: str, scale: float = 1.0) -> TokenBucket:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.burst * scale, now, scale)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket.tokens = min(self.burst * bucket.scale, bucket.tokens + (now - bucket.updated_at) * self.rate * bucket.scale)
+            bucket.updated_at = now
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def check(self, key: str, cost: float = 1.0, scaled: Tuple[Tuple[str, float], ...] = ()) -> float:
+        """Take cost tokens for key and for every (key, scale) in scaled, all or none
+
+        Returns 0 if allowed, else seconds until the emptiest bucket would allow it.
+        """
+        cost = min(cost, self.burst)
+        buckets: List[Tuple[str, TokenBucket]] = [(key, self._bucket(key))]
+        buckets += [(extra, self._bucket(extra, scale)) for extra, scale in scaled]
+        short = [(cost - bucket.tokens) / (self.rate * bucket.scale) if self.rate > 0 else float(ADMISSION_RETRY_AFTER)
+                 for _, bucket in buckets if bucket.tokens < cost]
+        if short:
+            self.limited += 1
+            return max(short)
+        for bucket_key, bucket in buckets:
+            bucket.tokens -= cost
+            if self.shared is not None:
+                self.shared.publish(RATE_LIMIT_CHANNEL + self.name, {'key': bucket_key, 'cost': cost, 'scale': bucket.scale})
+        self.allowed += 1
+        return 0.0
+
+    # Shared state between workers
+
+    def attach(self, shared: SharedState) -> None:
+        """Charge tokens other workers spend against the same buckets here"""
+        self.shared = shared
+        shared.subscribe(RATE_LIMIT_CHANNEL + self.name, self._on_remote_spend)
+
+    def _on_remote_spend(self, spend: Dict[str, Any]) -> None:
+        bucket = self._bucket(spend['key'], spend.get('scale', 1.0))
+        # Concurrent admissions on two workers can overdraw a little; never below empty
+        bucket.tokens = max(0.0, bucket.tokens - spend['cost'])
+        self.remote_spent += spend['cost']
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "clients": len(self._buckets),
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "remote_spent": self.remote_spent,
+        }
+
+
+def client_keys(request: Request, credentials: Optional[HTTPAuthorizationCredentials]) -> Tuple[str, str]:
+    """The caller's bucket key and the key of the bucket shared by its whole address
+
+    The address is the peer uvicorn reports, i.e. the X-Forwarded-For client
+    when the request came through a trusted proxy (serve.py --forwarded-allow-ips).
+    Tokens are not verified, so a token digest only splits an address's budget
+    between its users; the address-wide bucket still bounds the total.
+    """
+    host = request.client.host if request.client else "unknown"
+    if credentials is None or not credentials.credentials:
+        return f"ip:{host}", f"address:{host}"
+    subject = hashlib.sha256(credentials.credentials.encode()).hexdigest()[:32]
+    return f"ip:{host}|token:{subject}", f"address:{host}"
+
+
+def rate_limited(limiter: RateLimiter, scheme: HTTPBearer, cost: float = 1.0,
+                 address_factor: float = RATE_LIMIT_ADDRESS_FACTOR):
+    """Route dependency charging cost tokens against the caller's bucket and its address's
+
+    scheme is the optional bearer scheme (auto_error=False) the token is read from.
+    """
+
+    async def dependency(request: Request, credentials: Optional[HTTPAuthorizationCredentials] = Depends(scheme)) -> None:
+        key, address = client_keys(request, credentials)
+        retry_after = limiter.check(key, cost, ((address, address_factor),))
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded for {limiter.name} requests",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    return dependency
+
+
+class AdmissionController:
+    """Tracks in-flight requests and smoothed time to first byte for the process
+
+    Past max_latency the in-flight limit drops to a quarter, so some requests
+    still complete and the latency average can recover.
+    """
+
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, max_latency: float = ADMISSION_MAX_LATENCY):
+        self.max_in_flight = max_in_flight
+        self.max_latency = max_latency
+        self.in_flight = 0
+        self.parked = 0
+        self.latency = 0.0
+        self.shed = 0
+
+    def admit(self) -> Optional[str]:
+        """Reserve a slot; returns the reason when the request must be shed"""
+        if self.latency > self.max_latency:
+            limit, reason = max(1, self.max_in_flight // 4), "latency"
+        else:
+            limit, reason = self.max_in_flight, "queue depth"
+        if self.in_flight >= limit:
+            self.shed += 1
+            return reason
+        self.in_flight += 1
+        return None
+
+    def observe(self, seconds: float) -> None:
+        self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    @contextmanager
+    def park(self, scope: Scope) -> Iterator[None]:
+        """Hand back an admitted request's slot while it waits on something other than this process
+
+        Long-polls sit idle for up to a minute; holding their slots would let a
+        few hundred of them shed every other route. The slot is taken back
+        unconditionally afterwards, so the middleware's release stays balanced.
+        """
+        if scope.get("admission") is not self:
+            yield
+            return
+        self.in_flight -= 1
+        self.parked += 1
+        try:
+            yield
+        finally:
+            self.parked -= 1
+            self.in_flight += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "parked": self.parked,
+            "max_in_flight": self.max_in_flight,
+            "latency": round(self.latency, 4),
+            "max_latency": self.max_latency,
+            "shed": self.shed,
+        }
+
+
+class AdmissionControlMiddleware:
+    """Reject new requests with 429 + Retry-After while the process is saturated"""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in ADMISSION_EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        reason = self.controller.admit()
+        if reason is not None:
+            body = json.dumps({"detail": f"Server overloaded ({reason}), retry later"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(ADMISSION_RETRY_AFTER).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        # Marks the request as holding a slot, for AdmissionController.park
+        scope["admission"] = self.controller
+        start = time.perf_counter()
+        observed = not scope["path"].startswith(ADMISSION_LATENCY_EXCLUDED)
+
+        async def send_wrapper(message: Message) -> None:
+            # Time to first byte, so long-lived streams do not skew the average
+            if observed and message["type"] == "http.response.start":
+                self.controller.observe(time.perf_counter() - start)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.controller.release()
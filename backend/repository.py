@@ -0,0 +1,339 @@
+"""
+Non-blocking data access layer for Firestore
+The firebase-admin client is synchronous, so every call is dispatched to a
+bounded thread pool instead of running on the event loop.
+"""
+
+import asyncio
+import functools
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Upper bound on concurrent Firestore round trips per process
+FIRESTORE_MAX_WORKERS = int(os.environ.get("FIRESTORE_MAX_WORKERS", "32"))
+
+# Documents pulled from a streaming query per executor hop
+STREAM_BATCH_SIZE = 200
+
+# Firestore rejects write batches with more than 500 operations
+WRITE_BATCH_LIMIT = 500
+
+Filter = Tuple[str, str, Any]
+
+# Called with (operation, seconds, succeeded) after every blocking call
+CallObserver = Callable[[str, float, bool], None]
+
+# (operation, collection, document id, data) where operation is set, update or delete
+Write = Tuple[str, str, str, Optional[Dict[str, Any]]]
+
+# Field path Firestore uses to order by document id
+DOCUMENT_ID = "__name__"
+
+
+class NotFound(Exception):
+    """Raised by local clients for a missing document, like google.api_core's NotFound"""
+
+
+def not_found_errors() -> Tuple[type, ...]:
+    """NotFound of every client in use"""
+    # Not imported here: google.api_core pulls in gRPC, and it is always loaded once a Firestore client can raise it
+    exceptions = sys.modules.get("google.api_core.exceptions")
+    return (NotFound, exceptions.NotFound) if exceptions is not None else (NotFound,)
+
+
+class TransactionReader:
+    """Reads available to a transaction body; every read happens before any write"""
+
+    def __init__(self, get_many: Callable[[str, List[str]], Dict[str, Dict[str, Any]]], query: Callable[[str, List[Filter]], List[Dict[str, Any]]]):
+        self.get_many = get_many
+        self.query = query
+
+    def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        return self.get_many(collection, [doc_id]).get(doc_id)
+
+
+# Called with a reader; returns the writes to commit and the transaction's result.
+# May run more than once when Firestore retries a contended transaction.
+TransactionBody = Callable[[TransactionReader], Tuple[List[Write], Any]]
+
+
+def doc_to_dict(doc) -> Dict[str, Any]:
+    """Convert a Firestore snapshot into a plain dict carrying its id"""
+    data = doc.to_dict() or {}
+    data['id'] = doc.id
+    return data
+
+
+class FirestoreUnavailable(RuntimeError):
+    """Raised when a route needs Firestore but the client failed to initialize"""
+
+
+class FirestoreRepository:
+    """Async facade over a synchronous Firestore client"""
+
+    def __init__(
+        self,
+        client=None,
+        max_workers: int = FIRESTORE_MAX_WORKERS,
+        client_factory: Optional[Callable[[], Any]] = None,
+        fallback: Optional[Callable[[], "FirestoreRepository"]] = None,
+    ):
+        self.client = client
+        self.client_factory = client_factory
+        # Repository to serve from instead when the client factory comes back empty
+        self.fallback = fallback
+        self.replacement: Optional[FirestoreRepository] = None
+        self.max_workers = max_workers
+        self.observer: Optional[CallObserver] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def available(self) -> bool:
+        if self.replacement is not None:
+            return self.replacement.available
+        return self.client is not None
+
+    @property
+    def supports_listeners(self) -> bool:
+        """Whether collection() supports on_snapshot listeners"""
+        if self.replacement is not None:
+            return self.replacement.supports_listeners
+        return True
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="firestore",
+            )
+        return self._executor
+
+    async def connect(self) -> None:
+        """Create the client off the event loop and open its connection pool"""
+        if self.client is None and self.client_factory is not None:
+            self.client = await self.run(self.client_factory)
+        if self.client is None and self.fallback is not None and self.replacement is None:
+            replacement = self.fallback()
+            replacement.observer = self.observer
+            await replacement.connect()
+            self.replacement = replacement
+        if self.client is not None:
+            # The first request pays for channel setup and auth; do it before serving traffic
+            await self.run(self._warm_sync)
+
+    def _warm_sync(self) -> None:
+        try:
+            next(iter(self.client.collection("components").limit(1).stream()), None)
+        except Exception as e:
+            print(f"Firestore warm-up failed: {e}")
+
+    def collection(self, name: str):
+        if self.replacement is not None:
+            return self.replacement.collection(name)
+        if self.client is None:
+            raise FirestoreUnavailable("Firestore is not initialized")
+        return self.client.collection(name)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking Firestore call on the repository thread pool"""
+        if self.replacement is not None:
+            # Same operation, carried out by the fallback's own implementation
+            return await self.replacement.run(getattr(self.replacement, fn.__name__), *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args, **kwargs)
+        if self.observer is not None:
+            call = functools.partial(self._observed, fn.__name__.strip("_").removesuffix("_sync"), call)
+        return await loop.run_in_executor(self.executor, call)
+
+    def _observed(self, operation: str, call):
+        # Timed on the worker thread, so executor queueing is not counted
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = call()
+            ok = True
+            return result
+        finally:
+            self.observer(operation, time.perf_counter() - start, ok)
+
+    # Reads
+
+    def _get_sync(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        doc = self.collection(collection).document(doc_id).get()
+        if not doc.exists:
+            return None
+        return doc_to_dict(doc)
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch a single document, or None if it does not exist"""
+        return await self.run(self._get_sync, collection, doc_id)
+
+    def _get_many_sync(self, collection: str, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        refs = [self.collection(collection).document(doc_id) for doc_id in doc_ids]
+        return {doc.id: doc_to_dict(doc) for doc in self.client.get_all(refs) if doc.exists}
+
+    async def get_many(self, collection: str, doc_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch many documents in one get_all round trip, keyed by id; missing ids are omitted"""
+        doc_ids = list(dict.fromkeys(doc_ids))
+        if not doc_ids:
+            return {}
+        return await self.run(self._get_many_sync, collection, doc_ids)
+
+    def _build_query(self, collection: str, filters: Iterable[Filter] = (), limit: Optional[int] = None):
+        query = self.collection(collection)
+        for field, op, value in filters:
+            query = query.where(field, op, value)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    def _query_sync(self, collection: str, filters: Iterable[Filter] = (), limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        query = self._build_query(collection, filters, limit)
+        return [doc_to_dict(doc) for doc in query.stream()]
+
+    async def query(self, collection: str, filters: Iterable[Filter] = (), limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Run a filtered query and return every matching document"""
+        return await self.run(self._query_sync, collection, list(filters), limit)
+
+    def _page_sync(self, collection: str, filters: Iterable[Filter], limit: int, start_after: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        query = self._build_query(collection, filters).order_by(DOCUMENT_ID)
+        if start_after:
+            query = query.start_after({DOCUMENT_ID: start_after})
+        # Fetch one extra document to learn whether another page exists
+        docs = [doc_to_dict(doc) for doc in query.limit(limit + 1).stream()]
+        if len(docs) > limit:
+            docs = docs[:limit]
+            return docs, docs[-1]['id']
+        return docs, None
+
+    async def page(self, collection: str, filters: Iterable[Filter] = (), limit: int = 100, start_after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of a query ordered by document id, plus the last id if more remain"""
+        return await self.run(self._page_sync, collection, list(filters), limit, start_after)
+
+    def _open_stream_sync(self, collection: str, filters: Iterable[Filter], limit: Optional[int]) -> Iterator:
+        return iter(self._build_query(collection, filters, limit).stream())
+
+    @staticmethod
+    def _next_batch_sync(iterator: Iterator, size: int) -> List[Dict[str, Any]]:
+        return [doc_to_dict(doc) for doc in itertools.islice(iterator, size)]
+
+    async def stream(self, collection: str, filters: Iterable[Filter] = (), limit: Optional[int] = None, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """Yield query results as they arrive, holding at most one batch in memory"""
+        iterator = await self.run(self._open_stream_sync, collection, list(filters), limit)
+        while True:
+            batch = await self.run(self._next_batch_sync, iterator, batch_size)
+            if not batch:
+                return
+            for doc in batch:
+                yield doc
+
+    def _is_empty_sync(self, collection: str) -> bool:
+        return not any(self.collection(collection).limit(1).stream())
+
+    async def is_empty(self, collection: str) -> bool:
+        return await self.run(self._is_empty_sync, collection)
+
+    # Writes
+
+    def _set_sync(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        self.collection(collection).document(doc_id).set(data)
+
+    async def set(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        await self.run(self._set_sync, collection, doc_id, data)
+
+    def _update_sync(self, collection: str, doc_id: str, data: Dict[str, Any]) -> bool:
+        try:
+            # update() carries an implicit exists precondition
+            self.collection(collection).document(doc_id).update(data)
+        except not_found_errors():
+            return False
+        return True
+
+    async def update(self, collection: str, doc_id: str, data: Dict[str, Any]) -> bool:
+        """Update fields of an existing document in one round trip; False if it does not exist"""
+        return await self.run(self._update_sync, collection, doc_id, data)
+
+    def _delete_sync(self, collection: str, doc_id: str) -> bool:
+        try:
+            self.collection(collection).document(doc_id).delete(option=self.client.write_option(exists=True))
+        except not_found_errors():
+            return False
+        return True
+
+    async def delete(self, collection: str, doc_id: str) -> bool:
+        """Delete a document in one round trip; False if it did not exist"""
+        return await self.run(self._delete_sync, collection, doc_id)
+
+    def _stage(self, batch, write: Write) -> None:
+        """Add one write to a WriteBatch or Transaction"""
+        operation, collection, doc_id, data = write
+        ref = self.collection(collection).document(doc_id)
+        if operation == 'set':
+            batch.set(ref, data)
+        elif operation == 'update':
+            batch.update(ref, data)
+        elif operation == 'delete':
+            batch.delete(ref)
+        else:
+            raise ValueError(f"Unknown write operation: {operation}")
+
+    def _commit_chunk_sync(self, writes: List[Write]) -> Optional[str]:
+        batch = self.client.batch()
+        for write in writes:
+            self._stage(batch, write)
+        try:
+            batch.commit()
+        except Exception as e:
+            return str(e)
+        return None
+
+    async def commit(self, writes: List[Write]) -> List[Optional[str]]:
+        """Apply writes in WriteBatch chunks of at most 500; returns an error (or None) per write"""
+        chunks = [writes[i:i + WRITE_BATCH_LIMIT] for i in range(0, len(writes), WRITE_BATCH_LIMIT)]
+        errors = await asyncio.gather(*(self.run(self._commit_chunk_sync, chunk) for chunk in chunks))
+        return [error for chunk, error in zip(chunks, errors) for _ in chunk]
+
+    def _transaction_sync(self, body: TransactionBody) -> Any:
+        if not hasattr(self.client, "transaction"):
+            # Clients without transactions (the in-memory stand-in): read, then commit the writes as one batch
+            writes, result = body(TransactionReader(self._get_many_sync, self._query_sync))
+            error = self._commit_chunk_sync(writes) if writes else None
+            if error:
+                raise RuntimeError(error)
+            return result
+
+        def get_many(collection: str, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+            refs = [self.collection(collection).document(doc_id) for doc_id in doc_ids]
+            return {doc.id: doc_to_dict(doc) for doc in self.client.get_all(refs, transaction=transaction) if doc.exists}
+
+        def query(collection: str, filters: List[Filter]) -> List[Dict[str, Any]]:
+            return [doc_to_dict(doc) for doc in transaction.get(self._build_query(collection, filters))]
+
+        # Only Firestore clients get here; google.cloud.firestore is loaded lazily to keep imports cheap
+        from google.cloud.firestore import transactional
+
+        @transactional
+        def attempt(transaction) -> Any:
+            writes, result = body(TransactionReader(get_many, query))
+            for write in writes:
+                self._stage(transaction, write)
+            return result
+
+        transaction = self.client.transaction()
+        return attempt(transaction)
+
+    async def transaction(self, body: TransactionBody) -> Any:
+        """Run body's reads and commit its writes atomically; returns body's result"""
+        return await self.run(self._transaction_sync, body)
+
+    def shutdown(self) -> None:
+        if self.replacement is not None:
+            self.replacement.shutdown()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,202 @@
+"""
+In-memory inverted index for component search
+Tokens from name, category, description and specification values map to
+weighted postings; queries use exact and prefix matches and return the top N
+ranked components over the whole catalog.
+"""
+
+import bisect
+import heapq
+import re
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+# Relative weight of a token hit in each field
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'category': 2.0,
+    'description': 1.0,
+    'specifications': 1.0,
+}
+
+# Prefix-only matches count for less than whole-token matches
+PREFIX_FACTOR = 0.5
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+def component_terms(component: Dict[str, Any]) -> Dict[str, float]:
+    """Weighted term frequencies for one component"""
+    terms: Dict[str, float] = defaultdict(float)
+    for field in ('name', 'category', 'description'):
+        for token in tokenize(component.get(field)):
+            terms[token] += FIELD_WEIGHTS[field]
+    specs = component.get('specifications') or {}
+    for value in specs.values():
+        for token in tokenize(value if isinstance(value, str) else None):
+            terms[token] += FIELD_WEIGHTS['specifications']
+    return terms
+
+
+class ComponentSearchIndex:
+    """Inverted index with prefix lookups over a sorted vocabulary"""
+
+    def __init__(self, components: Iterable[Dict[str, Any]] = ()):
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        # Posting lists sorted by descending weight, built lazily per token
+        self._impacts: Dict[str, List[Tuple[float, str]]] = {}
+        self.rebuild(components)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def rebuild(self, components: Iterable[Dict[str, Any]]) -> None:
+        """Discard the index and build it from scratch"""
+        postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        doc_terms = {}
+        docs = {}
+        for component in components:
+            terms = component_terms(component)
+            doc_terms[component['id']] = terms
+            docs[component['id']] = component
+            for token, weight in terms.items():
+                postings[token][component['id']] = weight
+        self._postings = dict(postings)
+        self._vocabulary = sorted(self._postings)
+        self._doc_terms = doc_terms
+        self._docs = docs
+        self._impacts = {}
+
+    def add(self, component: Dict[str, Any]) -> None:
+        """Index a new component, or re-index an updated one"""
+        doc_id = component['id']
+        if doc_id in self._docs:
+            self.remove(doc_id)
+        terms = component_terms(component)
+        for token, weight in terms.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+            posting[doc_id] = weight
+            self._impacts.pop(token, None)
+        self._doc_terms[doc_id] = terms
+        self._docs[doc_id] = component
+
+    def remove(self, doc_id: str) -> None:
+        terms = self._doc_terms.pop(doc_id, None)
+        self._docs.pop(doc_id, None)
+        if not terms:
+            return
+        for token in terms:
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            self._impacts.pop(token, None)
+            if not posting:
+                del self._postings[token]
+                position = bisect.bisect_left(self._vocabulary, token)
+                if position < len(self._vocabulary) and self._vocabulary[position] == token:
+                    del self._vocabulary[position]
+
+    def _prefix_tokens(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\uffff")
+        return self._vocabulary[start:end]
+
+    def _impact_list(self, token: str) -> List[Tuple[float, str]]:
+        impacts = self._impacts.get(token)
+        if impacts is None:
+            impacts = sorted(((weight, doc_id) for doc_id, weight in self._postings[token].items()),
+                             key=lambda item: (-item[0], item[1]))
+            self._impacts[token] = impacts
+        return impacts
+
+    def _expansions(self, term: str) -> List[Tuple[str, float]]:
+        """Vocabulary tokens a query term expands to, with their match factor"""
+        return [
+            (token, 1.0 if token == term else PREFIX_FACTOR)
+            for token in self._prefix_tokens(term)
+        ]
+
+    def _score(self, expansions: List[Tuple[str, float]], doc_id: str) -> float:
+        best = 0.0
+        for token, factor in expansions:
+            weight = self._postings[token].get(doc_id)
+            if weight is not None and weight * factor > best:
+                best = weight * factor
+        return best
+
+    def _max_score(self, expansions: List[Tuple[str, float]]) -> float:
+        return max(self._impact_list(token)[0][0] * factor for token, factor in expansions)
+
+    def _ordered_candidates(self, expansions: List[Tuple[str, float]]) -> Iterator[Tuple[float, str]]:
+        """Documents matching one term, highest score first"""
+        streams = [
+            ((weight * factor, doc_id) for weight, doc_id in self._impact_list(token))
+            for token, factor in expansions
+        ]
+        seen = set()
+        for score, doc_id in heapq.merge(*streams, key=lambda item: (-item[0], item[1])):
+            if doc_id not in seen:
+                seen.add(doc_id)
+                yield score, doc_id
+
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        predicate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Top components matching every query term, best first"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        expanded = [self._expansions(term) for term in terms]
+        if not all(expanded):
+            return []
+
+        # Drive the search from the rarest term, visiting its postings by descending score
+        expanded.sort(key=lambda expansions: sum(len(self._postings[token]) for token, _ in expansions))
+        first, rest = expanded[0], expanded[1:]
+        rest_bound = sum(self._max_score(expansions) for expansions in rest)
+
+        results: List[Tuple[float, str]] = []
+        kth_best: List[float] = []
+        for first_score, doc_id in self._ordered_candidates(first):
+            # No remaining document can beat the current top N
+            if limit is not None and len(kth_best) == limit and first_score + rest_bound < kth_best[0]:
+                break
+            total = first_score
+            for expansions in rest:
+                score = self._score(expansions, doc_id)
+                if not score:
+                    break
+                total += score
+            else:
+                if predicate is not None and not predicate(self._docs[doc_id]):
+                    continue
+                results.append((total, doc_id))
+                # Single-term candidates already arrive in final rank order
+                if not rest and limit is not None and len(results) == limit:
+                    break
+                if limit is not None:
+                    if len(kth_best) < limit:
+                        heapq.heappush(kth_best, total)
+                    elif total > kth_best[0]:
+                        heapq.heapreplace(kth_best, total)
+
+        results.sort(key=lambda item: (-item[0], item[1]))
+        if limit is not None:
+            results = results[:limit]
+        return [self._docs[doc_id] for _, doc_id in results]
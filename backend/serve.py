@@ -0,0 +1,84 @@
+"""
+Multi-worker server
+Runs one uvicorn worker process per core, with the shared-state broker in the
+supervisor so catalog and generation caches stay coherent across workers:
+
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 8001] [--forwarded-allow-ips 10.0.0.5]
+
+WEB_CONCURRENCY overrides the worker count. SHARED_STATE=redis uses Redis
+instead of the local broker. PROJECT_WRITE_BEHIND is turned off with more than
+one worker, since a read could not flush the queue of the worker that took the
+write.
+
+Behind a reverse proxy or load balancer, list its addresses in
+--forwarded-allow-ips (or FORWARDED_ALLOW_IPS, "*" to trust any peer) so rate
+limits key on the X-Forwarded-For client rather than on the proxy.
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+
+import uvicorn
+
+from shared_state import SHARED_STATE_SOCKET, SocketBroker
+
+
+def default_workers() -> int:
+    return int(os.environ.get("WEB_CONCURRENCY") or os.cpu_count() or 1)
+
+
+def start_broker(path: str = SHARED_STATE_SOCKET) -> threading.Thread:
+    """Run the socket broker on its own event loop in a daemon thread"""
+    started = threading.Event()
+
+    async def serve() -> None:
+        broker = SocketBroker(path)
+        await broker.start()
+        started.set()
+        await broker.serve_forever()
+
+    thread = threading.Thread(target=lambda: asyncio.run(serve()), name="shared-state-broker", daemon=True)
+    thread.start()
+    if not started.wait(timeout=5):
+        raise RuntimeError(f"Shared state broker failed to start on {path}")
+    return thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the API with one worker per core")
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument(
+        "--forwarded-allow-ips",
+        default=os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        help="Comma-separated proxy addresses whose X-Forwarded-For header is trusted",
+    )
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        if os.environ.get("PROJECT_WRITE_BEHIND") == "1":
+            print("PROJECT_WRITE_BEHIND needs a single worker to keep read-your-writes; writing through instead")
+            os.environ["PROJECT_WRITE_BEHIND"] = "0"
+        # Workers inherit the environment, so they all connect to the same backend
+        os.environ.setdefault("SHARED_STATE", "socket")
+        if os.environ["SHARED_STATE"] == "socket":
+            os.environ["SHARED_STATE_SOCKET"] = SHARED_STATE_SOCKET
+            start_broker(SHARED_STATE_SOCKET)
+            print(f"Shared state broker listening on {SHARED_STATE_SOCKET}")
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+    )
+
+
+if __name__ == "__main__":
+    main()
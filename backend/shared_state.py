@@ -0,0 +1,364 @@
+"""
+Shared state for multi-worker deployments
+Cache entries and invalidation events are exchanged through a pluggable
+backend, so every worker process on a node sees the same generation results
+and catalog changes:
+
+    local   single process, nothing is shared (default)
+    socket  a broker on a Unix socket, started by serve.py next to the workers
+    redis   an optional Redis adapter (needs the `redis` package)
+
+Reads are async; writes and publishes are fire-and-forget so they can be
+issued from synchronous cache code without waiting on the broker.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SHARED_STATE = os.environ.get("SHARED_STATE", "local")
+SHARED_STATE_SOCKET = os.environ.get(
+    "SHARED_STATE_SOCKET", os.path.join(tempfile.gettempdir(), "atal-shared-state.sock"),
+)
+SHARED_STATE_MAX_ENTRIES = int(os.environ.get("SHARED_STATE_MAX_ENTRIES", "10000"))
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+# Generation results are a few KB; leave generous room per line
+LINE_LIMIT = 16 * 2**20
+RECONNECT_DELAY = 1.0
+
+Subscriber = Callable[[Any], None]
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=str, separators=(",", ":"))
+
+
+class SharedState:
+    """Base class; messages a worker publishes are never delivered back to it"""
+
+    name = "local"
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self._subscribers: Dict[str, List[Subscriber]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def get(self, key: str) -> Optional[Any]:
+        return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        pass
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def publish(self, channel: str, message: Any) -> None:
+        pass
+
+    def subscribe(self, channel: str, callback: Subscriber) -> None:
+        self._subscribers.setdefault(channel, []).append(callback)
+
+    def _deliver(self, channel: str, envelope: Dict[str, Any]) -> None:
+        if envelope.get("origin") == self.origin:
+            return
+        for callback in self._subscribers.get(channel, []):
+            try:
+                callback(envelope.get("message"))
+            except Exception as e:
+                print(f"Shared state subscriber for {channel} failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class LocalSharedState(SharedState):
+    """Single-process backend: there are no other workers to share with"""
+
+
+class TTLStore:
+    """Bounded key/value store with per-entry expiry, used by the socket broker"""
+
+    def __init__(self, maxsize: int = SHARED_STATE_MAX_ENTRIES):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SocketBroker:
+    """Node-local broker holding shared entries and fanning out published messages
+
+    Speaks newline-delimited JSON over a Unix socket.
+    """
+
+    def __init__(self, path: str = SHARED_STATE_SOCKET, maxsize: int = SHARED_STATE_MAX_ENTRIES):
+        self.path = path
+        self.store = TTLStore(maxsize)
+        self._channels: Dict[str, List[asyncio.StreamWriter]] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        """Bind the socket; a no-op once listening, so start() then serve_forever() binds once"""
+        if self._server is not None:
+            return
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path, limit=LINE_LIMIT)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                request = json.loads(line)
+                op = request.get("op")
+                if op == "get":
+                    reply = {"id": request["id"], "value": self.store.get(request["key"])}
+                    writer.write(_dumps(reply).encode() + b"\n")
+                elif op == "set":
+                    self.store.set(request["key"], request.get("value"), request.get("ttl"))
+                elif op == "delete":
+                    self.store.delete(request["key"])
+                elif op == "subscribe":
+                    self._channels.setdefault(request["channel"], []).append(writer)
+                elif op == "publish":
+                    push = _dumps({"channel": request["channel"], "envelope": request["envelope"]}).encode() + b"\n"
+                    for subscriber in self._channels.get(request["channel"], []):
+                        if subscriber is not writer:
+                            subscriber.write(push)
+        except (ConnectionError, json.JSONDecodeError, KeyError) as e:
+            print(f"Shared state broker dropped a client: {e}")
+        finally:
+            for writers in self._channels.values():
+                if writer in writers:
+                    writers.remove(writer)
+            writer.close()
+
+
+class SocketSharedState(SharedState):
+    """Client for SocketBroker; reconnects in the background if the broker restarts"""
+
+    name = "socket"
+
+    def __init__(self, path: str = SHARED_STATE_SOCKET):
+        super().__init__()
+        self.path = path
+        self.dropped = 0
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            try:
+                await asyncio.wait_for(self._connected.wait(), timeout=RECONNECT_DELAY * 5)
+            except asyncio.TimeoutError:
+                print(f"Shared state broker not reachable at {self.path}; continuing without it")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=LINE_LIMIT)
+            except OSError:
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            self._writer = writer
+            for channel in self._subscribers:
+                self._send({"op": "subscribe", "channel": channel})
+            self._connected.set()
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    reply = json.loads(line)
+                    if "channel" in reply:
+                        self._deliver(reply["channel"], reply["envelope"])
+                    else:
+                        future = self._pending.pop(reply["id"], None)
+                        if future is not None and not future.done():
+                            future.set_result(reply.get("value"))
+            except (ConnectionError, json.JSONDecodeError) as e:
+                print(f"Shared state connection lost: {e}")
+            finally:
+                self._connected.clear()
+                self._writer = None
+                writer.close()
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_result(None)
+                self._pending.clear()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    def _send(self, request: Dict[str, Any]) -> bool:
+        if self._writer is None:
+            self.dropped += 1
+            return False
+        self._writer.write(_dumps(request).encode() + b"\n")
+        return True
+
+    async def get(self, key: str) -> Optional[Any]:
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        if not self._send({"op": "get", "id": request_id, "key": key}):
+            self._pending.pop(request_id, None)
+            return None
+        return await future
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._send({"op": "set", "key": key, "value": value, "ttl": ttl})
+
+    def delete(self, key: str) -> None:
+        self._send({"op": "delete", "key": key})
+
+    def publish(self, channel: str, message: Any) -> None:
+        self._send({"op": "publish", "channel": channel, "envelope": {"origin": self.origin, "message": message}})
+
+    def subscribe(self, channel: str, callback: Subscriber) -> None:
+        # Subscriptions are (re)sent on every connect; only send now if already connected
+        if channel not in self._subscribers and self._writer is not None:
+            self._send({"op": "subscribe", "channel": channel})
+        super().subscribe(channel, callback)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "connected": self._connected.is_set(),
+            "pending": len(self._pending),
+            "dropped": self.dropped,
+        }
+
+
+class RedisSharedState(SharedState):
+    """Redis adapter; entries and pub/sub go through one Redis instance"""
+
+    name = "redis"
+
+    def __init__(self, url: str = REDIS_URL):
+        super().__init__()
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("SHARED_STATE=redis requires the redis package (pip install redis)")
+        self.client = redis.from_url(url)
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def start(self) -> None:
+        self._pubsub = self.client.pubsub()
+        if self._subscribers:
+            await self._pubsub.subscribe(*self._subscribers)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            if not self._pubsub.subscribed:
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=RECONNECT_DELAY)
+            if message is not None:
+                channel = message["channel"]
+                channel = channel.decode() if isinstance(channel, bytes) else channel
+                self._deliver(channel, json.loads(message["data"]))
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+        await self.client.close()
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._spawn(self.client.set(key, _dumps(value), px=int(ttl * 1000) if ttl else None))
+
+    def delete(self, key: str) -> None:
+        self._spawn(self.client.delete(key))
+
+    def publish(self, channel: str, message: Any) -> None:
+        self._spawn(self.client.publish(channel, _dumps({"origin": self.origin, "message": message})))
+
+    def subscribe(self, channel: str, callback: Subscriber) -> None:
+        if channel not in self._subscribers and self._pubsub is not None:
+            self._spawn(self._pubsub.subscribe(channel))
+        super().subscribe(channel, callback)
+
+
+def create_shared_state(backend: str = SHARED_STATE) -> SharedState:
+    """Build the backend selected by SHARED_STATE"""
+    if backend == "socket":
+        return SocketSharedState()
+    if backend == "redis":
+        return RedisSharedState()
+    return LocalSharedState()
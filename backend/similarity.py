@@ -0,0 +1,319 @@
+"""
+Vector similarity for related components and similar projects
+Documents become L2-normalized hashed TF-IDF vectors, stored as the columns of
+one contiguous float32 matrix laid out dimension-major. A document touches only
+a few dozen of the hashed dimensions, so a query multiplies just the matrix
+rows for its own non-zero dimensions, and top-k for a batch of queries is one
+argpartition over the stacked scores. Writes update columns in place; deleted
+columns are zeroed and reused. IDF weights come from the corpus as it is when
+a document is written, and rebuild() refreshes them all.
+
+numpy is optional: without it the index stays empty and reports unavailable.
+"""
+
+import math
+import os
+import threading
+import zlib
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # similarity endpoints answer 503 without numpy
+    np = None
+
+from search_index import component_terms, tokenize
+from shared_state import SharedState
+
+# Hashed feature dimensions; memory is rows x dimensions x 4 bytes
+SIMILARITY_DIMENSIONS = int(os.environ.get("SIMILARITY_DIMENSIONS", "256"))
+INITIAL_CAPACITY = 1024
+
+PROJECT_FIELD_WEIGHTS = {
+    'title': 3.0,
+    'tags': 2.0,
+    'requirements': 2.0,
+    'category': 1.0,
+}
+
+Features = Callable[[Dict[str, Any]], Dict[str, float]]
+
+
+def project_terms(project: Dict[str, Any]) -> Dict[str, float]:
+    """Weighted term frequencies for one project"""
+    terms: Dict[str, float] = defaultdict(float)
+    for field, weight in PROJECT_FIELD_WEIGHTS.items():
+        value = project.get(field)
+        for text in value if isinstance(value, list) else [value]:
+            for token in tokenize(text if isinstance(text, str) else None):
+                terms[token] += weight
+    return terms
+
+
+class SimilarityIndex:
+    """Cosine top-k over hashed feature vectors of one collection"""
+
+    def __init__(self, features: Features, dimensions: int = SIMILARITY_DIMENSIONS):
+        self.features = features
+        self.dimensions = dimensions
+        self.ready = False
+        self.shared: Optional[SharedState] = None
+        self.channel: Optional[str] = None
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        # Writes that arrive while an initial load is running, replayed after it
+        self._pending: Optional[List[Tuple[str, Any]]] = None
+        self._lock = threading.Lock()
+        if np is not None:
+            # dimensions x capacity, one column per document
+            self._matrix = np.zeros((dimensions, INITIAL_CAPACITY), dtype=np.float32)
+            # Documents with a non-zero value per dimension, for the IDF weights
+            self._df = np.zeros(dimensions, dtype=np.int64)
+
+    @property
+    def available(self) -> bool:
+        return np is not None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    # Vectors
+
+    def _raw(self, doc: Dict[str, Any]):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for term, weight in self.features(doc).items():
+            hashed = zlib.crc32(term.encode())
+            # The sign bit keeps colliding terms from only ever adding up
+            sign = -1.0 if hashed & 0x80000000 else 1.0
+            vector[hashed % self.dimensions] += sign * math.log1p(weight)
+        return vector
+
+    def _idf(self):
+        return np.log((1.0 + len(self._rows)) / (1.0 + self._df)) + 1.0
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _grow(self, columns: int) -> None:
+        capacity = self._matrix.shape[1]
+        if columns <= capacity:
+            return
+        while capacity < columns:
+            capacity *= 2
+        matrix = np.zeros((self.dimensions, capacity), dtype=np.float32)
+        matrix[:, :len(self._ids)] = self._matrix[:, :len(self._ids)]
+        self._matrix = matrix
+
+    # Writes
+
+    def builder(self) -> "VectorBuilder":
+        """Collects the vectors for a rebuild without holding the index lock"""
+        return VectorBuilder(self)
+
+    def install(self, builder: "VectorBuilder") -> None:
+        """Swap in a finished build, then apply writes that arrived during a load"""
+        if np is None:
+            return
+        ids, df, matrix = builder.finish()
+        with self._lock:
+            self._ids = ids
+            self._rows = {doc_id: row for row, doc_id in enumerate(ids)}
+            self._free = []
+            self._df = df
+            self._matrix = matrix
+            pending, self._pending = self._pending or [], None
+            for op, value in pending:
+                if op == 'add':
+                    self._add(value)
+                else:
+                    self._remove(value)
+            self.ready = True
+
+    def rebuild(self, docs: Iterable[Dict[str, Any]]) -> None:
+        """Replace every row"""
+        if np is None:
+            return
+        builder = self.builder()
+        for doc in docs:
+            builder.add(doc)
+        self.install(builder)
+
+    def start_load(self) -> None:
+        """Queue writes until the rebuild that follows has run"""
+        with self._lock:
+            self._pending = []
+
+    def cancel_load(self) -> None:
+        """Stop queueing after a failed load; the index stays not ready"""
+        with self._lock:
+            self._pending = None
+
+    def _add(self, doc: Dict[str, Any]) -> None:
+        doc_id = doc['id']
+        row = self._rows.get(doc_id)
+        if row is not None:
+            self._df -= self._matrix[:, row] != 0
+        elif self._free:
+            row = self._free.pop()
+        else:
+            row = len(self._ids)
+            self._grow(row + 1)
+            self._ids.append(None)
+        raw = self._raw(doc)
+        self._ids[row] = doc_id
+        self._rows[doc_id] = row
+        self._df += raw != 0
+        self._matrix[:, row] = self._normalize(raw * self._idf())
+
+    def _remove(self, doc_id: str) -> None:
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return
+        self._df -= self._matrix[:, row] != 0
+        self._matrix[:, row] = 0.0
+        self._ids[row] = None
+        self._free.append(row)
+
+    def add(self, doc: Dict[str, Any], announce: bool = True) -> None:
+        """Insert or replace the row for a created or updated document"""
+        if np is None:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(('add', doc))
+            else:
+                self._add(doc)
+        if announce:
+            self._announce({'op': 'add', 'doc': doc})
+
+    def remove(self, doc_id: str, announce: bool = True) -> None:
+        """Drop the row of a deleted document"""
+        if np is None:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(('remove', doc_id))
+            else:
+                self._remove(doc_id)
+        if announce:
+            self._announce({'op': 'remove', 'id': doc_id})
+
+    # Shared state between workers
+
+    def attach(self, shared: SharedState, channel: str) -> None:
+        """Apply writes other workers make to the same collection"""
+        self.shared = shared
+        self.channel = channel
+        shared.subscribe(channel, self._on_remote_change)
+
+    def _announce(self, change: Dict[str, Any]) -> None:
+        if self.shared is not None:
+            self.shared.publish(self.channel, change)
+
+    def _on_remote_change(self, change: Dict[str, Any]) -> None:
+        if change.get('op') == 'add':
+            self.add(change['doc'], announce=False)
+        elif change.get('op') == 'remove':
+            self.remove(change['id'], announce=False)
+
+    # Queries
+
+    def similar_many(self, doc_ids: List[str], limit: int = 10) -> List[List[Tuple[str, float]]]:
+        """Top `limit` (id, cosine) neighbours for each id, ranked together in one argpartition"""
+        if np is None:
+            return [[] for _ in doc_ids]
+        with self._lock:
+            count = len(self._ids)
+            rows = [self._rows.get(doc_id) for doc_id in doc_ids]
+            known = [row for row in rows if row is not None]
+            if not known or count < 2:
+                return [[] for _ in doc_ids]
+            scores = np.empty((len(known), count), dtype=np.float32)
+            for position, row in enumerate(known):
+                query = self._matrix[:, row]
+                dims = np.flatnonzero(query)
+                # Deleted columns are all zeros and score 0, which is filtered below
+                np.dot(query[dims], self._matrix[dims, :count], out=scores[position])
+                scores[position, row] = -np.inf
+            ids = list(self._ids)
+        k = min(limit, count - 1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        results, position = [], 0
+        for row in rows:
+            if row is None:
+                results.append([])
+                continue
+            candidates, row_scores = top[position], scores[position]
+            order = candidates[np.argsort(-row_scores[candidates], kind='stable')]
+            results.append([(ids[i], float(row_scores[i])) for i in order if row_scores[i] > 0])
+            position += 1
+        return results
+
+    def similar(self, doc_id: str, limit: int = 10) -> List[Tuple[str, float]]:
+        return self.similar_many([doc_id], limit)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "ready": self.ready,
+            "size": len(self._rows),
+            "dimensions": self.dimensions,
+            "capacity": self._matrix.shape[1] if np is not None else 0,
+        }
+
+
+class VectorBuilder:
+    """Raw vectors for a rebuild, added one document at a time, e.g. from a stream"""
+
+    def __init__(self, index: SimilarityIndex):
+        self.index = index
+        self.ids: List[str] = []
+        self._finished = None
+        if np is not None:
+            self._raw = np.zeros((INITIAL_CAPACITY, index.dimensions), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, doc: Dict[str, Any]) -> None:
+        if np is None:
+            return
+        count = len(self.ids)
+        if count == len(self._raw):
+            raw = np.zeros((count * 2, self.index.dimensions), dtype=np.float32)
+            raw[:count] = self._raw
+            self._raw = raw
+        self._raw[count] = self.index._raw(doc)
+        self.ids.append(doc['id'])
+
+    def finish(self):
+        """(ids, document frequencies, dimension-major matrix) ready to install; computed once"""
+        if self._finished is None:
+            self._finished = self._finish()
+        return self._finished
+
+    def _finish(self):
+        count = len(self.ids)
+        raw = self._raw[:count]
+        df = np.count_nonzero(raw, axis=0).astype(np.int64)
+        idf = np.log((1.0 + count) / (1.0 + df)) + 1.0
+        matrix = np.zeros((self.index.dimensions, max(count, INITIAL_CAPACITY)), dtype=np.float32)
+        matrix[:, :count] = self.index._normalize(raw * idf).T
+        return list(self.ids), df, matrix
+
+
+def component_index() -> SimilarityIndex:
+    return SimilarityIndex(component_terms)
+
+
+def project_index() -> SimilarityIndex:
+    return SimilarityIndex(project_terms)
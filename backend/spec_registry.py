@@ -0,0 +1,132 @@
+"""
+Registry of component specification keys
+Specifications are stored as a compact key -> value mapping instead of a wide
+model of optional fields. Known keys are grouped by category and interned, so
+every component shares one string object per key. Writes to a registered
+category accept only its keys plus the common ones; a new part type (an
+unregistered category) accepts any well-formed key until its keys are
+registered. Stored documents are read leniently, so components saved before
+the registry existed still load.
+"""
+
+import re
+import sys
+from typing import Any, Dict, FrozenSet, Iterable, Optional
+
+MAX_SPEC_ENTRIES = 64
+MAX_SPEC_VALUE_LENGTH = 256
+SPEC_KEY_RE = re.compile(r"^[a-z][a-z0-9_]{0,63}$")
+
+# Keys that apply to parts of any category
+COMMON_SPEC_KEYS = frozenset({
+    "operating_voltage", "input_voltage", "current", "power_consumption",
+    "weight", "size", "interface", "frequency", "response_time",
+})
+
+SPEC_KEYS_BY_CATEGORY: Dict[str, FrozenSet[str]] = {
+    "Microcontrollers": frozenset({
+        "microcontroller", "processor", "digital_io_pins", "analog_input_pins",
+        "flash_memory", "sram", "ram", "wifi", "bluetooth", "connectivity",
+        "usb_ports", "hdmi",
+    }),
+    "Sensors": frozenset({
+        "measuring_range", "measuring_angle", "trigger_pulse", "echo_pulse",
+        "temperature_range", "humidity_range", "accuracy_temperature",
+        "accuracy_humidity", "detection_range", "detection_angle", "delay_time",
+        "block_time", "resistance_light", "resistance_dark", "peak_wavelength",
+        "probe_length",
+    }),
+    "Actuators": frozenset({
+        "torque", "speed", "rotation", "trigger_current", "contact_voltage",
+        "contact_type", "sound_level", "step_angle", "steps_per_revolution",
+        "gear_ratio",
+    }),
+    "Displays": frozenset({
+        "resolution", "colors", "color_depth", "data_transmission",
+        "pixels_per_meter",
+    }),
+}
+
+# Canonical, interned spelling of every known key
+_INTERNED: Dict[str, str] = {}
+
+
+def register_spec_keys(category: str, keys: Iterable[str]) -> None:
+    """Add known keys for a category, e.g. when a new part type is introduced"""
+    keys = frozenset(sys.intern(key) for key in keys)
+    SPEC_KEYS_BY_CATEGORY[category] = SPEC_KEYS_BY_CATEGORY.get(category, frozenset()) | keys
+    for key in keys:
+        _INTERNED[key] = key
+
+
+for _category_keys in (COMMON_SPEC_KEYS, *SPEC_KEYS_BY_CATEGORY.values()):
+    for _key in _category_keys:
+        _INTERNED[_key] = sys.intern(_key)
+
+ALL_SPEC_KEYS = frozenset(_INTERNED)
+
+
+def known_spec_keys(category: Optional[str]) -> FrozenSet[str]:
+    """Keys documented for a category, including the common ones"""
+    return COMMON_SPEC_KEYS | SPEC_KEYS_BY_CATEGORY.get(category or "", frozenset())
+
+
+def canonical_key(key: str) -> str:
+    interned = _INTERNED.get(key)
+    if interned is not None:
+        return interned
+    normalized = re.sub(r"[\s\-]+", "_", key.strip().lower())
+    interned = _INTERNED.get(normalized)
+    if interned is not None:
+        return interned
+    if not SPEC_KEY_RE.match(normalized):
+        raise ValueError(f"Invalid specification key: {key!r}")
+    return normalized
+
+
+def normalize_specs(specs: Any) -> Optional[Dict[str, str]]:
+    """Validate a specification mapping, dropping empty values and canonicalizing keys"""
+    if specs is None:
+        return None
+    if not isinstance(specs, dict):
+        raise ValueError("Specifications must be an object of key -> value")
+    if len(specs) > MAX_SPEC_ENTRIES:
+        raise ValueError(f"At most {MAX_SPEC_ENTRIES} specifications are allowed")
+    normalized = {}
+    for key, value in specs.items():
+        if value is None or value == "":
+            continue
+        if not isinstance(key, str):
+            raise ValueError(f"Invalid specification key: {key!r}")
+        if not isinstance(value, str):
+            value = str(value)
+        if len(value) > MAX_SPEC_VALUE_LENGTH:
+            raise ValueError(f"Specification {key!r} is longer than {MAX_SPEC_VALUE_LENGTH} characters")
+        normalized[canonical_key(key)] = value
+    return normalized
+
+
+def check_category_keys(category: Optional[str], specs: Optional[Dict[str, str]]) -> None:
+    """Reject keys a registered category does not document; unregistered categories accept any"""
+    if not specs or category not in SPEC_KEYS_BY_CATEGORY:
+        return
+    unknown = sorted(set(specs) - known_spec_keys(category))
+    if unknown:
+        raise ValueError(f"Unknown specification keys for {category}: {', '.join(unknown)}")
+
+
+def read_specs(specs: Any) -> Optional[Dict[str, str]]:
+    """Lenient normalization for stored documents: legacy keys are kept as they are"""
+    if not isinstance(specs, dict):
+        return None
+    normalized = {}
+    for key, value in specs.items():
+        if value is None or value == "":
+            continue
+        key = str(key)
+        try:
+            key = canonical_key(key)
+        except ValueError:
+            pass
+        normalized[key] = value if isinstance(value, str) else str(value)
+    return normalized
@@ -0,0 +1,292 @@
+"""
+Local SQLite storage behind the repository interface
+Serves the whole API from one database file in WAL mode, so a single edge node
+or classroom deployment runs offline with no Firestore project. Documents are
+stored as JSON, with category, user_id and status copied into indexed columns
+for the equality filters the routes use. Each executor thread keeps its own
+connection; statements are built from fixed text so the sqlite3 statement
+cache reuses them as prepared statements.
+
+    DATA_BACKEND=sqlite SQLITE_PATH=/var/lib/atal/atal.db uvicorn main:app
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from repository import (
+    FIRESTORE_MAX_WORKERS, Filter, FirestoreRepository, FirestoreUnavailable, TransactionBody, TransactionReader, Write,
+)
+
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "atal.db")
+SQLITE_BUSY_TIMEOUT = int(os.environ.get("SQLITE_BUSY_TIMEOUT", "5000"))
+# Prepared statements kept per connection
+SQLITE_STATEMENT_CACHE = 256
+
+# Fields copied into their own indexed columns
+INDEXED_FIELDS = ("category", "user_id", "status")
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS documents ("
+    " collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL,"
+    + "".join(f" {field} TEXT," for field in INDEXED_FIELDS)
+    + " PRIMARY KEY (collection, id)) WITHOUT ROWID",
+    # Trailing id keeps filtered pages in document order straight off the index
+    *(f"CREATE INDEX IF NOT EXISTS documents_{field} ON documents (collection, {field}, id)" for field in INDEXED_FIELDS),
+]
+
+SQL_GET = "SELECT data FROM documents WHERE collection = ? AND id = ?"
+SQL_GET_MANY = "SELECT id, data FROM documents WHERE collection = ? AND id IN (SELECT value FROM json_each(?))"
+SQL_SET = (
+    f"INSERT OR REPLACE INTO documents (collection, id, data, {', '.join(INDEXED_FIELDS)})"
+    f" VALUES (?, ?, ?{', ?' * len(INDEXED_FIELDS)})"
+)
+SQL_DELETE = "DELETE FROM documents WHERE collection = ? AND id = ?"
+SQL_ANY = "SELECT 1 FROM documents WHERE collection = ? LIMIT 1"
+
+COMPARISONS = {"==": "=", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+
+def _encode(value: Any) -> Any:
+    # Timestamps round-trip as datetimes, as they do through Firestore
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__} values")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "$date" in obj:
+        return datetime.fromisoformat(obj["$date"])
+    return obj
+
+
+def dumps(data: Dict[str, Any]) -> str:
+    return json.dumps(data, default=_encode, separators=(",", ":"))
+
+
+def loads(text: str) -> Dict[str, Any]:
+    return json.loads(text, object_hook=_decode)
+
+
+def _column_value(value: Any) -> Optional[Any]:
+    return value if isinstance(value, (str, int, float)) else None
+
+
+def _row(collection: str, doc_id: str, data: Dict[str, Any]) -> Tuple:
+    return (collection, doc_id, dumps(data), *(_column_value(data.get(field)) for field in INDEXED_FIELDS))
+
+
+def build_where(filters: Iterable[Filter]) -> Tuple[str, List[Any]]:
+    """SQL conditions and parameters for Firestore-style (field, op, value) filters"""
+    clauses, params = [], []
+    for field, op, value in filters:
+        path = f'$."{field}"'
+        if op in ("array_contains", "array_contains_any"):
+            values = [value] if op == "array_contains" else list(value)
+            clauses.append("EXISTS (SELECT 1 FROM json_each(data, ?) WHERE value IN (SELECT value FROM json_each(?)))")
+            params.extend([path, json.dumps(values, default=str)])
+            continue
+        if field in INDEXED_FIELDS:
+            target = field
+        else:
+            target = "json_extract(data, ?)"
+            params.append(path)
+        if op in COMPARISONS:
+            clauses.append(f"{target} {COMPARISONS[op]} ?")
+            params.append(value)
+        elif op in ("in", "not-in"):
+            negate = "NOT " if op == "not-in" else ""
+            clauses.append(f"{target} {negate}IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(value), default=str))
+        else:
+            raise ValueError(f"Unsupported filter for SQLite: {field} {op}")
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+
+class ConnectionPool:
+    """One connection per executor thread, opened on first use and closed together"""
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self.opened = 0
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=SQLITE_STATEMENT_CACHE,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Durable at checkpoints; WAL keeps the database consistent after a crash
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+                self.opened += 1
+        return connection
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class StreamCursor:
+    """Keyset position of an open stream; each batch is its own query"""
+
+    def __init__(self, collection: str, filters: List[Filter], limit: Optional[int]):
+        self.collection = collection
+        self.filters = filters
+        self.remaining = limit
+        self.after = ""
+
+
+class SQLiteRepository(FirestoreRepository):
+    """FirestoreRepository interface over a local SQLite database"""
+
+    supports_listeners = False
+
+    def __init__(self, path: str = SQLITE_PATH, max_workers: int = FIRESTORE_MAX_WORKERS):
+        super().__init__(max_workers=max_workers, client_factory=lambda: ConnectionPool(path))
+        self.path = path
+        # SQLite has one writer at a time; queue writers here rather than spin on SQLITE_BUSY
+        self._write_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self.client is None:
+            raise FirestoreUnavailable("SQLite database is not open")
+        return self.client.connection()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connection()
+        with self._write_lock:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def _warm_sync(self) -> None:
+        with self._transaction() as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    def collection(self, name: str):
+        raise FirestoreUnavailable("The SQLite backend has no Firestore collections")
+
+    # Reads
+
+    def _get_sync(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(SQL_GET, (collection, doc_id)).fetchone()
+        if row is None:
+            return None
+        return {**loads(row[0]), 'id': doc_id}
+
+    def _get_many_sync(self, collection: str, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        rows = self._connection().execute(SQL_GET_MANY, (collection, json.dumps(doc_ids)))
+        return {doc_id: {**loads(data), 'id': doc_id} for doc_id, data in rows}
+
+    def _select_sync(self, collection: str, filters: Iterable[Filter], limit: Optional[int], after: str = "") -> List[Dict[str, Any]]:
+        where, params = build_where(filters)
+        # LIMIT -1 is unbounded; keeping it in the text keeps one statement per filter shape
+        sql = f"SELECT id, data FROM documents WHERE collection = ?{where} AND id > ? ORDER BY id LIMIT ?"
+        rows = self._connection().execute(sql, (collection, *params, after, -1 if limit is None else limit))
+        return [{**loads(data), 'id': doc_id} for doc_id, data in rows]
+
+    def _query_sync(self, collection: str, filters: Iterable[Filter] = (), limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._select_sync(collection, filters, limit)
+
+    def _page_sync(self, collection: str, filters: Iterable[Filter], limit: int, start_after: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        docs = self._select_sync(collection, filters, limit + 1, start_after or "")
+        if len(docs) > limit:
+            docs = docs[:limit]
+            return docs, docs[-1]['id']
+        return docs, None
+
+    def _open_stream_sync(self, collection: str, filters: Iterable[Filter], limit: Optional[int]) -> StreamCursor:
+        return StreamCursor(collection, list(filters), limit)
+
+    def _next_batch_sync(self, cursor: StreamCursor, size: int) -> List[Dict[str, Any]]:
+        if cursor.remaining is not None:
+            size = min(size, cursor.remaining)
+            if size <= 0:
+                return []
+        docs = self._select_sync(cursor.collection, cursor.filters, size, cursor.after)
+        if docs:
+            cursor.after = docs[-1]['id']
+            if cursor.remaining is not None:
+                cursor.remaining -= len(docs)
+        return docs
+
+    def _is_empty_sync(self, collection: str) -> bool:
+        return self._connection().execute(SQL_ANY, (collection,)).fetchone() is None
+
+    # Writes
+
+    def _apply(self, connection: sqlite3.Connection, operation: str, collection: str, doc_id: str, data: Optional[Dict[str, Any]]) -> bool:
+        """Apply one write inside a transaction; False if an update or delete found no document"""
+        if operation == 'set':
+            connection.execute(SQL_SET, _row(collection, doc_id, data))
+            return True
+        if operation == 'update':
+            row = connection.execute(SQL_GET, (collection, doc_id)).fetchone()
+            if row is None:
+                return False
+            connection.execute(SQL_SET, _row(collection, doc_id, {**loads(row[0]), **data}))
+            return True
+        if operation == 'delete':
+            return connection.execute(SQL_DELETE, (collection, doc_id)).rowcount > 0
+        raise ValueError(f"Unknown write operation: {operation}")
+
+    def _set_sync(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        with self._transaction() as connection:
+            self._apply(connection, 'set', collection, doc_id, data)
+
+    def _update_sync(self, collection: str, doc_id: str, data: Dict[str, Any]) -> bool:
+        with self._transaction() as connection:
+            return self._apply(connection, 'update', collection, doc_id, data)
+
+    def _delete_sync(self, collection: str, doc_id: str) -> bool:
+        with self._transaction() as connection:
+            return self._apply(connection, 'delete', collection, doc_id, None)
+
+    def _commit_chunk_sync(self, writes: List[Write]) -> Optional[str]:
+        # All or nothing, like a WriteBatch; a blind delete of a missing document is not an error
+        try:
+            with self._transaction() as connection:
+                for operation, collection, doc_id, data in writes:
+                    if not self._apply(connection, operation, collection, doc_id, data) and operation == 'update':
+                        raise LookupError(f"No document to update: {collection}/{doc_id}")
+        except Exception as e:
+            return str(e)
+        return None
+
+    def _transaction_sync(self, body: TransactionBody) -> Any:
+        # Reads use this thread's connection, so they see the locked snapshot the writes commit over
+        with self._transaction() as connection:
+            writes, result = body(TransactionReader(self._get_many_sync, self._query_sync))
+            for operation, collection, doc_id, data in writes:
+                if not self._apply(connection, operation, collection, doc_id, data) and operation == 'update':
+                    raise LookupError(f"No document to update: {collection}/{doc_id}")
+            return result
+
+    def shutdown(self) -> None:
+        super().shutdown()
+        if self.client is not None:
+            self.client.close()
@@ -0,0 +1,79 @@
+"""
+Streaming response mode for large list endpoints
+Clients opt in with `Accept: application/x-ndjson`, `Accept: text/event-stream`
+or `?stream=1`; documents are validated and written one at a time so memory
+stays bounded regardless of result size.
+"""
+
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Optional, Tuple, Type, Union
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+Documents = Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]]
+
+
+def stream_media_type(request: Request, stream: bool = False) -> Optional[str]:
+    """The streaming format a client asked for, or None for a plain JSON body"""
+    accept = request.headers.get("accept", "")
+    if SSE_MEDIA_TYPE in accept:
+        return SSE_MEDIA_TYPE
+    if NDJSON_MEDIA_TYPE in accept or stream:
+        return NDJSON_MEDIA_TYPE
+    return None
+
+
+def _frame(payload: str, media_type: str, event: Optional[str] = None) -> str:
+    if media_type == SSE_MEDIA_TYPE:
+        prefix = f"event: {event}\n" if event else ""
+        return f"{prefix}data: {payload}\n\n"
+    return payload + "\n"
+
+
+async def _iterate(docs: Documents) -> AsyncIterator[Dict[str, Any]]:
+    if hasattr(docs, "__aiter__"):
+        async for doc in docs:
+            yield doc
+    else:
+        for doc in docs:
+            yield doc
+
+
+async def _encode(docs: Documents, model: Type[BaseModel], media_type: str) -> AsyncIterator[str]:
+    try:
+        async for doc in _iterate(docs):
+            yield _frame(model.model_validate(doc).model_dump_json(), media_type)
+        if media_type == SSE_MEDIA_TYPE:
+            yield _frame("{}", media_type, event="end")
+    except Exception as e:
+        # Headers are already sent, so report the failure in-band
+        yield _frame(json.dumps({"error": str(e)}), media_type, event="error")
+
+
+async def _encode_events(events: AsyncIterable[Tuple[str, str]], media_type: str) -> AsyncIterator[str]:
+    try:
+        async for event, payload in events:
+            yield _frame(payload, media_type, event=event)
+        if media_type == SSE_MEDIA_TYPE:
+            yield _frame("{}", media_type, event="end")
+    except Exception as e:
+        yield _frame(json.dumps({"error": str(e)}), media_type, event="error")
+
+
+def stream_events(events: AsyncIterable[Tuple[str, str]], media_type: str) -> StreamingResponse:
+    """Stream (event name, JSON payload) pairs; SSE carries the name, NDJSON only the payload"""
+    return StreamingResponse(
+        _encode_events(events, media_type),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def stream_documents(docs: Documents, model: Type[BaseModel], media_type: str, headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """Generator-backed response that validates and writes one document at a time"""
+    return StreamingResponse(_encode(docs, model, media_type), media_type=media_type, headers=headers)
@@ -0,0 +1,174 @@
+"""
+Per-user project library aggregates
+One `user_stats` document per user holds project counts by status, difficulty,
+category and tag plus the most recently saved projects, so profile and library
+screens read a single document instead of streaming the whole library. Project
+writes keep it current in the same transaction as the project itself (see
+WriteBehindBuffer.derive); repair rebuilds it from the user's projects.
+
+    python user_stats.py              # backfill or repair every user
+    python user_stats.py USER_ID ...  # repair selected users
+"""
+
+import argparse
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from repository import FirestoreRepository, TransactionReader, Write
+
+USER_STATS_COLLECTION = 'user_stats'
+PROJECTS_COLLECTION = 'projects'
+# Most recently saved projects kept on each aggregate
+USER_STATS_RECENT = int(os.environ.get("USER_STATS_RECENT", "5"))
+
+COUNTED_FIELDS = ('status', 'difficulty', 'category')
+SUMMARY_FIELDS = ('id', 'title', 'status', 'category', 'difficulty', 'dateSaved')
+
+
+def empty_stats(user_id: str) -> Dict[str, Any]:
+    return {
+        'user_id': user_id,
+        'total': 0,
+        'status': {},
+        'difficulty': {},
+        'category': {},
+        'tags': {},
+        'recent': [],
+        'updated_at': None,
+    }
+
+
+def _count(counts: Dict[str, int], key: Any, sign: int) -> None:
+    if not isinstance(key, str) or not key:
+        return
+    value = counts.get(key, 0) + sign
+    if value > 0:
+        counts[key] = value
+    else:
+        counts.pop(key, None)
+
+
+def apply_project(stats: Dict[str, Any], project: Dict[str, Any], sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) one project's contribution to an aggregate"""
+    stats['total'] = max(0, stats['total'] + sign)
+    for field in COUNTED_FIELDS:
+        _count(stats[field], project.get(field), sign)
+    for tag in set(project.get('tags') or []):
+        _count(stats['tags'], tag, sign)
+    # A removed project leaves a gap in the recent list until the next repair
+    recent = [item for item in stats['recent'] if item['id'] != project['id']]
+    if sign > 0:
+        recent.append({field: project.get(field) for field in SUMMARY_FIELDS})
+        recent.sort(key=lambda item: item.get('dateSaved') or '', reverse=True)
+    stats['recent'] = recent[:USER_STATS_RECENT]
+
+
+def build_stats(user_id: str, projects: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate computed from scratch over a user's projects"""
+    stats = empty_stats(user_id)
+    for project in projects:
+        apply_project(stats, project, 1)
+    stats['updated_at'] = datetime.now()
+    return stats
+
+
+def _owner(project: Optional[Dict[str, Any]]) -> Optional[str]:
+    owner = project.get('user_id') if project else None
+    return owner if isinstance(owner, str) and owner else None
+
+
+class LibraryAggregates:
+    """Maintains and serves the `user_stats` aggregates"""
+
+    def __init__(self, repo: FirestoreRepository):
+        self.repo = repo
+        self.reads = 0
+        self.repairs = 0
+
+    def _load(self, reader: TransactionReader, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        existing = reader.get_many(USER_STATS_COLLECTION, user_ids)
+        stats = {}
+        for user_id in user_ids:
+            if user_id in existing:
+                stats[user_id] = {**empty_stats(user_id), **existing[user_id]}
+                stats[user_id].pop('id', None)
+            else:
+                # First write since before aggregates existed: start from the library as it stands
+                stats[user_id] = build_stats(user_id, reader.query(PROJECTS_COLLECTION, [('user_id', '==', user_id)]))
+        return stats
+
+    def derive(self, reader: TransactionReader, changes) -> List[Write]:
+        """Aggregate writes for (id, before, after) project changes, inside their transaction"""
+        user_ids = sorted({owner for _, before, after in changes for owner in (_owner(before), _owner(after)) if owner})
+        if not user_ids:
+            return []
+        stats = self._load(reader, user_ids)
+        for _, before, after in changes:
+            if _owner(before):
+                apply_project(stats[_owner(before)], before, -1)
+            if _owner(after):
+                apply_project(stats[_owner(after)], after, 1)
+        now = datetime.now()
+        return [('set', USER_STATS_COLLECTION, user_id, {**data, 'updated_at': now}) for user_id, data in stats.items()]
+
+    async def get(self, user_id: str) -> Dict[str, Any]:
+        """A user's aggregate in one read, built on first use for libraries that predate it"""
+        self.reads += 1
+        stats = await self.repo.get(USER_STATS_COLLECTION, user_id)
+        if stats is None:
+            return await self.repair(user_id, keep_empty=False)
+        stats.pop('id', None)
+        return {**empty_stats(user_id), **stats}
+
+    async def repair(self, user_id: str, keep_empty: bool = True) -> Dict[str, Any]:
+        """Rebuild one user's aggregate from their projects, atomically with respect to project writes"""
+        def body(reader: TransactionReader):
+            stats = build_stats(user_id, reader.query(PROJECTS_COLLECTION, [('user_id', '==', user_id)]))
+            if not stats['total'] and not keep_empty:
+                return [], stats
+            return [('set', USER_STATS_COLLECTION, user_id, stats)], stats
+
+        self.repairs += 1
+        return await self.repo.transaction(body)
+
+    async def repair_all(self) -> int:
+        """Backfill every user with projects and reset aggregates left without any; returns users repaired"""
+        user_ids = set()
+        async for project in self.repo.stream(PROJECTS_COLLECTION):
+            if _owner(project):
+                user_ids.add(project['user_id'])
+        async for stats in self.repo.stream(USER_STATS_COLLECTION):
+            user_ids.add(stats['id'])
+        # The repository thread pool bounds how many run at once
+        await asyncio.gather(*(self.repair(user_id) for user_id in sorted(user_ids)))
+        return len(user_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"reads": self.reads, "repairs": self.repairs}
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    from firebase_config import create_repository
+
+    repo = create_repository()
+    await repo.connect()
+    if not repo.available:
+        raise SystemExit("No database configured")
+    aggregates = LibraryAggregates(repo)
+    try:
+        if args.users:
+            for user_id in args.users:
+                stats = await aggregates.repair(user_id)
+                print(f"{user_id}: {stats['total']} projects")
+        else:
+            print(f"Repaired aggregates for {await aggregates.repair_all()} users")
+    finally:
+        repo.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill or repair per-user project aggregates")
+    parser.add_argument("users", nargs="*", help="Repair only these user ids")
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,300 @@
+"""
+Write-behind buffering for a collection
+Writes are acknowledged once they are queued, repeated writes to the same
+document are coalesced into one, and the queue is committed in WriteBatch
+chunks on an interval and on shutdown. Reads that could observe a queued write
+flush it first, so a user always reads their own writes. That only holds when
+one process serves every request: buffers are per process and a read cannot
+flush another worker's queue, so write-behind stays off whenever a shared-state
+backend is configured (serve.py with more than one worker). With
+PROJECT_WRITE_BEHIND=0 every write goes straight to Firestore.
+
+A `derive` hook maintains documents computed from the collection, such as
+per-user aggregates: writes then commit in transactions that read each
+document's previous state and add the hook's writes to the same commit.
+"""
+
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from repository import FirestoreRepository, TransactionReader, Write
+from shared_state import SharedState
+
+PROJECT_WRITE_BEHIND = os.environ.get("PROJECT_WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_INTERVAL = float(os.environ.get("WRITE_BEHIND_INTERVAL", "1.0"))
+# Flush early once this many documents are queued
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get("WRITE_BEHIND_MAX_PENDING", "500"))
+WRITE_BEHIND_MAX_ATTEMPTS = 3
+# Documents remembered as existing, so updates can skip the existence read
+KNOWN_IDS_LIMIT = 10000
+# Documents per derive transaction; each may add a few derived writes under the batch limit
+DERIVE_CHUNK_SIZE = 100
+
+# (operation, data) where operation is set, update or delete
+PendingWrite = Tuple[str, Optional[Dict[str, Any]]]
+
+# (document id, document before, document after); None where it does not exist
+Change = Tuple[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+# Extra writes for a set of changes, committed in the same transaction
+Derive = Callable[[TransactionReader, List[Change]], List[Write]]
+
+
+def write_behind_enabled(shared: SharedState, requested: bool = PROJECT_WRITE_BEHIND) -> bool:
+    """Whether buffering can keep read-your-writes for this deployment"""
+    if requested and shared.name != "local":
+        print(f"Write-behind disabled: the {shared.name} shared-state backend means other workers serve reads "
+              "that could not flush this worker's queue")
+        return False
+    return requested
+
+
+def coalesce(older: PendingWrite, newer: PendingWrite) -> PendingWrite:
+    """Combine two queued writes to one document into the single equivalent write"""
+    operation, data = newer
+    if operation != 'update':
+        return newer
+    if older[0] in ('set', 'update'):
+        return older[0], {**older[1], **data}
+    return newer
+
+
+class WriteBehindBuffer:
+    """Coalescing write queue in front of one collection"""
+
+    def __init__(
+        self,
+        repo: FirestoreRepository,
+        collection: str,
+        enabled: bool = PROJECT_WRITE_BEHIND,
+        interval: float = WRITE_BEHIND_INTERVAL,
+        max_pending: int = WRITE_BEHIND_MAX_PENDING,
+        owner_field: str = 'user_id',
+        derive: Optional[Derive] = None,
+    ):
+        self.repo = repo
+        self.collection = collection
+        self.enabled = enabled
+        self.interval = interval
+        self.max_pending = max_pending
+        self.owner_field = owner_field
+        self.derive = derive
+        self.queued = 0
+        self.coalesced = 0
+        self.committed = 0
+        self.commits = 0
+        self.failed = 0
+        self._pending: Dict[str, PendingWrite] = {}
+        self._attempts: Dict[str, int] = {}
+        # id -> owner of documents known to exist
+        self._known: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._commit_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    # Lifecycle
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the flush loop and commit everything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._pending:
+            print(f"Write-behind: {len(self._pending)} {self.collection} writes could not be committed on shutdown")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Write-behind flush of {self.collection} failed: {e}")
+
+    # Bookkeeping
+
+    def _remember(self, doc_id: str, owner: Optional[str]) -> None:
+        self._known[doc_id] = owner
+        self._known.move_to_end(doc_id)
+        while len(self._known) > KNOWN_IDS_LIMIT:
+            self._known.popitem(last=False)
+
+    def _enqueue(self, doc_id: str, write: PendingWrite) -> None:
+        older = self._pending.get(doc_id)
+        if older is not None:
+            self.coalesced += 1
+            write = coalesce(older, write)
+        self._pending[doc_id] = write
+        self.queued += 1
+        if len(self._pending) >= self.max_pending:
+            self._wake.set()
+
+    async def _exists(self, doc_id: str) -> bool:
+        pending = self._pending.get(doc_id)
+        if pending is not None:
+            return pending[0] != 'delete'
+        if doc_id in self._known:
+            return True
+        doc = await self.repo.get(self.collection, doc_id)
+        if doc is None:
+            return False
+        self._remember(doc_id, doc.get(self.owner_field))
+        return True
+
+    # Writes
+
+    async def _transact(self, batch: Dict[str, PendingWrite]) -> Dict[str, bool]:
+        """Commit writes and their derived writes atomically; per id, False if the document was missing"""
+        def body(reader: TransactionReader):
+            existing = reader.get_many(self.collection, list(batch))
+            writes, changes, applied = [], [], {}
+            for doc_id, (operation, data) in batch.items():
+                before = existing.get(doc_id)
+                applied[doc_id] = operation == 'set' or before is not None
+                if not applied[doc_id]:
+                    continue
+                if operation == 'set':
+                    after = {**data, 'id': doc_id}
+                elif operation == 'update':
+                    after = {**before, **data}
+                else:
+                    after = None
+                writes.append((operation, self.collection, doc_id, data))
+                changes.append((doc_id, before, after))
+            return writes + self.derive(reader, changes), applied
+        return await self.repo.transaction(body)
+
+    async def set(self, doc_id: str, data: Dict[str, Any]) -> None:
+        """Create or replace a document"""
+        if not self.enabled:
+            if self.derive is not None:
+                await self._transact({doc_id: ('set', data)})
+                return
+            await self.repo.set(self.collection, doc_id, data)
+            return
+        self._remember(doc_id, data.get(self.owner_field))
+        self._enqueue(doc_id, ('set', data))
+
+    async def update(self, doc_id: str, data: Dict[str, Any]) -> bool:
+        """Update fields of an existing document; False if it does not exist"""
+        if not self.enabled:
+            if self.derive is not None:
+                return (await self._transact({doc_id: ('update', data)}))[doc_id]
+            return await self.repo.update(self.collection, doc_id, data)
+        if not await self._exists(doc_id):
+            return False
+        moved = self.owner_field in data and self._known.get(doc_id) != data[self.owner_field]
+        if self.owner_field in data:
+            self._remember(doc_id, data[self.owner_field])
+        self._enqueue(doc_id, ('update', data))
+        if moved:
+            # flush_owner only finds the new owner, so the previous owner would still read the old state
+            await self.flush([doc_id])
+        return True
+
+    async def delete(self, doc_id: str) -> bool:
+        """Delete a document; False if it does not exist"""
+        if not self.enabled:
+            if self.derive is not None:
+                return (await self._transact({doc_id: ('delete', None)}))[doc_id]
+            return await self.repo.delete(self.collection, doc_id)
+        if not await self._exists(doc_id):
+            return False
+        self._enqueue(doc_id, ('delete', None))
+        return True
+
+    # Flushing
+
+    async def flush(self, doc_ids: Optional[Iterable[str]] = None) -> None:
+        """Commit queued writes, all of them or only those for doc_ids"""
+        # Serialized, so a flush waits for any commit already carrying these documents
+        async with self._commit_lock:
+            if doc_ids is None:
+                batch, self._pending = self._pending, {}
+            else:
+                batch = {doc_id: self._pending.pop(doc_id) for doc_id in doc_ids if doc_id in self._pending}
+            if batch:
+                await self._commit(batch)
+
+    async def flush_owner(self, owner: Optional[str]) -> None:
+        """Make an owner's queued writes visible to queries; None flushes everything"""
+        if not self._pending:
+            return
+        if owner is None:
+            await self.flush()
+            return
+        await self.flush([doc_id for doc_id in self._pending if self._known.get(doc_id) == owner])
+
+    async def _commit_writes(self, batch: Dict[str, PendingWrite]) -> List[Optional[str]]:
+        """Commit queued writes; returns an error (or None) per document"""
+        if self.derive is None:
+            return await self.repo.commit([(operation, self.collection, doc_id, data) for doc_id, (operation, data) in batch.items()])
+        doc_ids = list(batch)
+        errors = []
+        # One chunk at a time: chunks often share derived documents and would only contend
+        for i in range(0, len(doc_ids), DERIVE_CHUNK_SIZE):
+            chunk = doc_ids[i:i + DERIVE_CHUNK_SIZE]
+            try:
+                # An update or delete that finds its document gone has nothing left to do
+                await self._transact({doc_id: batch[doc_id] for doc_id in chunk})
+                errors.extend([None] * len(chunk))
+            except Exception as e:
+                errors.extend([str(e)] * len(chunk))
+        return errors
+
+    async def _commit(self, batch: Dict[str, PendingWrite]) -> None:
+        doc_ids = list(batch)
+        errors = await self._commit_writes(batch)
+        self.commits += 1
+
+        # A chunk fails as a whole; retry its writes one by one so a bad write cannot block the rest
+        failed = [i for i, error in enumerate(errors) if error]
+        if failed:
+            retried = await asyncio.gather(*(self._commit_writes({doc_ids[i]: batch[doc_ids[i]]}) for i in failed))
+            for i, result in zip(failed, retried):
+                errors[i] = result[0]
+
+        for doc_id, error in zip(doc_ids, errors):
+            if error is None:
+                self.committed += 1
+                self._attempts.pop(doc_id, None)
+                if batch[doc_id][0] == 'delete':
+                    self._known.pop(doc_id, None)
+                continue
+            attempts = self._attempts.get(doc_id, 0) + 1
+            if attempts >= WRITE_BEHIND_MAX_ATTEMPTS:
+                self.failed += 1
+                self._attempts.pop(doc_id, None)
+                self._known.pop(doc_id, None)
+                print(f"Write-behind dropped {batch[doc_id][0]} of {self.collection}/{doc_id}: {error}")
+                continue
+            self._attempts[doc_id] = attempts
+            # Requeue under any newer write that arrived meanwhile
+            newer = self._pending.get(doc_id)
+            self._pending[doc_id] = coalesce(batch[doc_id], newer) if newer else batch[doc_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "interval": self.interval,
+            "pending": len(self._pending),
+            "queued": self.queued,
+            "coalesced": self.coalesced,
+            "committed": self.committed,
+            "commits": self.commits,
+            "failed": self.failed,
+        }